@@ -0,0 +1,61 @@
+"""Benchmark django-pgfields' fast date and timestamp typecasters against
+the typecasters provided by psycopg2.
+
+Usage:
+
+    python benchmarks/typecasters.py [--dsn DSN] [--rows ROWS]
+
+This reads the given number of rows of timestamps (with and without time
+zones) and dates from PostgreSQL, once with each set of typecasters, and
+reports the time taken to fetch them.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+import argparse
+import os
+import psycopg2
+import sys
+import time
+
+sys.path.insert(0, os.path.realpath(os.path.dirname(__file__) + '/../'))
+from django_pg.utils.typecasters import register_typecasters
+
+
+SQL = """
+    SELECT now() - (i || ' seconds')::interval,
+           localtimestamp - (i || ' seconds')::interval,
+           current_date - i % 3650
+      FROM generate_series(1, %s) AS i
+"""
+
+
+def fetch(connection, rows):
+    """Fetch the given number of rows, returning the time taken."""
+    cursor = connection.cursor()
+    cursor.execute(SQL, [rows])
+    start = time.time()
+    cursor.fetchall()
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--dsn', default='dbname=django_pg')
+    parser.add_argument('--rows', default=1000000, type=int)
+    parser.add_argument('--repeat', default=3, type=int)
+    args = parser.parse_args()
+
+    results = []
+    for label, fast in (('psycopg2', False), ('django-pgfields', True)):
+        connection = psycopg2.connect(args.dsn)
+        if fast:
+            register_typecasters(connection)
+        best = min([fetch(connection, args.rows)
+                    for i in range(0, args.repeat)])
+        connection.close()
+        results.append(best)
+        print('%-16s %8.3fs (%d rows)' % (label, best, args.rows))
+    print('Speedup: %.2fx' % (results[0] / results[1]))
+
+
+if __name__ == '__main__':
+    main()
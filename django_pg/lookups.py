@@ -1,4 +1,4 @@
-from django.db.models import Lookup
+from django.db.models import Lookup, Transform
 
 
 class ArrayLength(Lookup):
@@ -59,3 +59,79 @@ class ArrayExact(Lookup):
 
         # Return the appropriate SQL.
         return '{0} = %s::{1}'.format(field, db_type), (value,)
+
+
+class CompositeMember(Transform):
+    """A Transform class that sends down the appropriate SQL to access
+    a single member of a PostgreSQL composite type.
+
+    CompositeField subclasses create subclasses of this class which set
+    `member` and `output_field`.
+    """
+    member = None
+
+    def as_sql(self, qn, connection):
+        """Return appropriate SQL for accessing a composite member
+        in PostgreSQL.
+        """
+        lhs, params = qn.compile(self.lhs)
+        member = connection.ops.quote_name(self.member)
+        return '({0}).{1}'.format(lhs, member), params
+
+    def relabeled_clone(self, relabels):
+        return self.__class__(self.lhs.relabeled_clone(relabels),
+                              self.init_lookups)
+
+
+class RangeLookup(Lookup):
+    """A base Lookup class that sends down appropriate SQL for comparing
+    a PostgreSQL range against another range using an operator.
+    """
+    operator = None
+
+    def as_sql(self, qn, connection):
+        """Return appropriate SQL for a range lookup in PostgreSQL."""
+        # Get the name of the field and the value that was sent.
+        field = qn.compile(self.lhs)[0]
+        value = self.rhs
+        db_type = self.get_db_type(connection)
+
+        # Return the appropriate SQL.
+        return '{0} {1} %s::{2}'.format(field, self.operator, db_type), (value,)
+
+    def get_db_type(self, connection):
+        """Return the PostgreSQL type to which the value is typecast."""
+        return self.lhs.output_field.db_type(connection)
+
+
+class RangeAdjacent(RangeLookup):
+    lookup_name = 'adjacent'
+    operator = '-|-'
+
+
+class RangeContainedBy(RangeLookup):
+    lookup_name = 'contained_by'
+    operator = '<@'
+
+
+class RangeContains(RangeLookup):
+    """A Lookup class that sends down appropriate SQL for a containment
+    check against a PostgreSQL range, of either another range or a
+    single value.
+    """
+    lookup_name = 'contains'
+    operator = '@>'
+
+    def get_db_type(self, connection):
+        """Return the PostgreSQL type to which the value is typecast,
+        which is the range's subtype if checking for a single value.
+        """
+        from psycopg2.extras import Range
+        if isinstance(self.rhs, Range):
+            return super(RangeContains, self).get_db_type(connection)
+        return self.lhs.output_field.db_subtype
+
+
+class RangeOverlap(RangeLookup):
+    lookup_name = 'overlap'
+    operator = '&&'
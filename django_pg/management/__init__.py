@@ -0,0 +1,192 @@
+from __future__ import absolute_import, unicode_literals
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.loading import get_app, get_models
+from django.db.models.signals import post_syncdb
+from django.db.utils import DEFAULT_DB_ALIAS
+from django.dispatch import receiver
+from django_pg.models.fields.composite.meta import composite_field_classes
+from django_pg.models.routing import replica_aliases
+from django_pg.utils.cursors import deallocate_prepared
+from django_pg.utils.indexes import (execute_sql, exclusion_constraint_sql,
+                                     index_name)
+from django_pg.utils.partitions import create_partitions_sql, table_names
+from django_pg.utils.south import south_installed
+from django_pg.utils.typecasters import register_typecasters
+from django_pg.utils.utf8 import UnicodeAdapter
+from psycopg2.extensions import adapters, register_adapter
+import django
+
+
+@receiver(connection_created)
+def register_unicode_adapter(sender, connection, **kwargs):
+    register_adapter(str, UnicodeAdapter)
+
+
+@receiver(connection_created)
+def register_fast_typecasters(sender, connection, **kwargs):
+    """If enabled, register the fast date and timestamp typecasters
+    on each new PostgreSQL connection.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    if getattr(settings, 'DJANGOPG_FAST_TYPECASTERS', False):
+        register_typecasters(connection.connection)
+
+
+@receiver(connection_created)
+def register_replica_composites(sender, connection, **kwargs):
+    """Register the caster for every composite type on each new connection
+    to a read replica, which may not share the type OIDs of the database
+    that the casters were registered for.
+    """
+    if connection.alias not in replica_aliases():
+        return
+    for field_class in composite_field_classes:
+        field_class.register_composite(connection, globally=False)
+
+
+# A `pre_syncdb` signal to create the necessary types is desirable,
+#   but only supported on Django >= 1.6.
+# Prior to Django 1.6, the only mechanism is to use the `connection_created`
+#   signal, which will run through all models whenever a new connection is
+#   made and do a brute-force check for type presence.
+if django.VERSION >= (1, 6):
+    from django.db.models.signals import pre_syncdb
+
+    @receiver(pre_syncdb)
+    def before_syncdb(sender, app, create_models, db, **kwargs):
+        """Check the appropriate database and ensure that any
+        fields that the models expect do, in fact, exist.
+        """
+        for model in create_models:
+            connection = connections[db]
+
+            # Iterate over the fields and create any type that does not
+            # already exist.
+            for field in model._meta.fields:
+                if hasattr(field, 'create_type'):
+                    field.create_type(connection)
+
+                    # If we were missing a field type, then the composite
+                    # caster won't be registered with psycopg2 either.
+                    field.register_composite(connection)
+else:
+    @receiver(connection_created)
+    def on_connection_created(sender, connection, **kwargs):
+        """When a connection is created, ensure that required custom
+        database types are created.
+        """
+        for model in get_models():
+            # Iterate over the fields and create any type that does not
+            # already exist.
+            for field in model._meta.fields:
+                if hasattr(field, 'create_type'):
+                    field.create_type(connection)
+
+                    # If we were missing a field type, then the composite
+                    # caster won't be registered with psycopg2 either.
+                    field.register_composite(connection)
+
+
+def create_indexes(models, connection):
+    """Create any additional indexes (such as expression indexes on
+    composite type members) that the given models' fields declare,
+    as well as any column defaults, exclusion constraints, and table
+    partitions that the models declare, if and only if they do not
+    already exist.
+    """
+    tables = table_names(connection)
+    for model in models:
+        # Sanity check: Only models whose tables we manage, and which
+        # have actually been created, can be indexed.
+        opts = model._meta
+        if not opts.managed or opts.proxy or opts.db_table not in tables:
+            continue
+
+        # Iterate over the fields and create any indexes that do not
+        # already exist.
+        for field in opts.local_fields:
+            if hasattr(field, 'create_indexes'):
+                field.create_indexes(connection)
+
+        # Set the default for any columns whose values are generated by
+        # the database. Django does not send defaults to the database on
+        # its own.
+        for field in opts.local_fields:
+            if getattr(field, 'db_default', None):
+                execute_sql(connection, column_default_sql(model, field,
+                                                           connection))
+
+        # Create any exclusion constraints that the model's `Meta`
+        # declares, which also do not already exist.
+        for sql in exclusion_constraints_sql(model, connection,
+                                             only_if_not_exists=True):
+            execute_sql(connection, sql)
+
+        # If the model's table is partitioned, then create any partitions
+        # that it should have and does not yet.
+        if getattr(opts, 'partition_by', None):
+            for sql in create_partitions_sql(model, connection):
+                execute_sql(connection, sql)
+
+
+def column_default_sql(model, field, connection):
+    """Return the SQL to set the database default for the given field's
+    column to its `db_default` expression.
+    """
+    qn = connection.ops.quote_name
+    return 'ALTER TABLE %s ALTER COLUMN %s SET DEFAULT %s\n;' % (
+        qn(model._meta.db_table),
+        qn(field.column),
+        field.db_default,
+    )
+
+
+def exclusion_constraints_sql(model, connection, only_if_not_exists=False):
+    """Return a list of the SQL statements to create each of the
+    exclusion constraints declared in the given model's `Meta`.
+    """
+    opts = model._meta
+    qn = connection.ops.quote_name
+    answer = []
+    for constraint in getattr(opts, 'exclusion_constraints', ()):
+        fields = [(opts.get_field(field_name), operator)
+                  for field_name, operator in constraint]
+        sql = exclusion_constraint_sql(connection, opts.db_table,
+            elements=[(qn(field.column), operator)
+                      for field, operator in fields],
+            name=index_name(connection, opts.db_table,
+                            *([field.column for field, _ in fields] +
+                              ['excl'])),
+            only_if_not_exists=only_if_not_exists,
+        )
+        if sql:
+            answer.append(sql)
+    return answer
+
+
+@receiver(post_syncdb)
+def after_syncdb(sender, app, db=DEFAULT_DB_ALIAS, **kwargs):
+    """Ensure that any additional indexes that the models in the
+    synced application declare exist, and discard any prepared statements
+    which the changes may have invalidated.
+    """
+    create_indexes(get_models(app), connections[db])
+    deallocate_prepared(connections[db])
+
+
+# If South is installed, then migrated applications should get their
+# additional indexes once their migrations have run.
+if south_installed:
+    from south.signals import post_migrate
+
+    @receiver(post_migrate)
+    def after_migrate(sender, app, db=DEFAULT_DB_ALIAS, **kwargs):
+        """Ensure that any additional indexes that the models in the
+        migrated application declare exist, and discard any prepared
+        statements which the migration may have invalidated.
+        """
+        create_indexes(get_models(get_app(app)), connections[db])
+        deallocate_prepared(connections[db])
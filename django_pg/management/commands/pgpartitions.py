@@ -0,0 +1,63 @@
+from __future__ import absolute_import, unicode_literals
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models.loading import get_app, get_models
+from django.db.utils import DEFAULT_DB_ALIAS
+from django_pg.utils.indexes import execute_sql
+from django_pg.utils.partitions import (create_partitions_sql,
+                                        expired_partitions,
+                                        remove_partition_sql)
+from optparse import make_option
+
+
+class Command(BaseCommand):
+    """Maintain the partitions of every model which declares
+    `partition_by`, creating partitions ahead of the current period and
+    detaching (or dropping) those older than the model retains.
+
+    This is intended to be run periodically (for instance, daily).
+    """
+    args = '[appname ...]'
+    help = ('Create upcoming partitions, and detach or drop expired '
+            'partitions, for partitioned models.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--database', action='store', dest='database',
+            default=DEFAULT_DB_ALIAS,
+            help='Nominates a database to maintain partitions on. '
+                 'Defaults to the "default" database.'),
+        make_option('--drop', action='store_true', dest='drop', default=False,
+            help='Drop expired partitions, rather than only detaching '
+                 'them from their tables.'),
+    )
+
+    def handle(self, *app_labels, **options):
+        connection = connections[options.get('database', DEFAULT_DB_ALIAS)]
+        verbosity = int(options.get('verbosity', 1))
+
+        # Determine which models to maintain partitions for.
+        if app_labels:
+            models = []
+            for app_label in app_labels:
+                models += get_models(get_app(app_label))
+        else:
+            models = get_models()
+        models = [i for i in models if getattr(i._meta, 'partition_by', None)]
+
+        for model in models:
+            table = model._meta.db_table
+
+            # Create any partitions which do not yet exist.
+            for sql in create_partitions_sql(model, connection):
+                execute_sql(connection, sql)
+
+            # Detach or drop any partitions which have expired.
+            for name in expired_partitions(model, connection):
+                sql = remove_partition_sql(model, name, connection,
+                                           drop=options.get('drop', False))
+                execute_sql(connection, sql)
+                if verbosity >= 1:
+                    self.stdout.write('%s partition %s of %s.' % (
+                        'Dropped' if options.get('drop') else 'Detached',
+                        name, table,
+                    ))
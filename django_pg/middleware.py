@@ -0,0 +1,72 @@
+from __future__ import absolute_import, unicode_literals
+from django.conf import settings
+from django_pg.models.routing import (clear_writes, latest_write,
+                                      primary_aliases, record_write)
+from django_pg.utils import budget
+from django_pg.utils.budget import QueryBudget
+
+
+class ReadYourWritesMiddleware(object):
+    """Middleware which sends a client's reads to the primary database
+    (rather than to a read replica) for `DJANGOPG_READ_YOUR_WRITES` seconds
+    after any of its requests writes to the database, using a cookie.
+
+    This extends read-your-writes consistency to the requests which follow
+    a write (such as the redirect after a form is submitted), which may be
+    handled by a different thread or process. Each request otherwise starts
+    with no writes recorded for its thread.
+    """
+    cookie_name = 'djangopg_last_write'
+
+    def process_request(self, request):
+        clear_writes()
+        try:
+            written = float(request.COOKIES[self.cookie_name])
+        except (KeyError, ValueError):
+            return
+        for alias in primary_aliases():
+            record_write(alias, written)
+
+    def process_response(self, request, response):
+        written = latest_write()
+        if written is None:
+            return response
+
+        # If this request wrote to the database, then remember when.
+        try:
+            previous = float(request.COOKIES[self.cookie_name])
+        except (KeyError, ValueError):
+            previous = None
+        if previous is None or written > previous:
+            response.set_cookie(self.cookie_name, '%.6f' % written,
+                max_age=getattr(settings, 'DJANGOPG_READ_YOUR_WRITES', 5),
+            )
+        return response
+
+
+class QueryBudgetMiddleware(object):
+    """Middleware which opens a query budget for each request, so that
+    requests which make more than `DJANGOPG_QUERY_BUDGET` queries, or which
+    repeat queries of the same shape more than `DJANGOPG_QUERY_REPEAT_LIMIT`
+    times, are reported.
+
+    By default, such requests are logged; if `DJANGOPG_QUERY_BUDGET_ACTION`
+    is `'raise'`, they fail instead.
+    """
+    def process_request(self, request):
+        # Discard any budgets left open in this thread by an earlier request
+        # whose response was never processed.
+        budget.clear()
+        request._query_budget = QueryBudget(
+            max_queries=getattr(settings, 'DJANGOPG_QUERY_BUDGET', None),
+            max_repeats=getattr(settings, 'DJANGOPG_QUERY_REPEAT_LIMIT', None),
+            action=getattr(settings, 'DJANGOPG_QUERY_BUDGET_ACTION', 'log'),
+        )
+        request._query_budget.__enter__()
+
+    def process_response(self, request, response):
+        query_budget = getattr(request, '_query_budget', None)
+        if query_budget is not None:
+            del request._query_budget
+            query_budget.__exit__(None, None, None)
+        return response
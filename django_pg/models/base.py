@@ -1,18 +1,25 @@
 from __future__ import absolute_import, unicode_literals
 from django.conf import settings
-from django.db import connections, models
+from django.db import connections, models, router
+from django.db.backends.postgresql_psycopg2.creation import DatabaseCreation
 from django.db.models import options
 from django.db.utils import DEFAULT_DB_ALIAS
+from django_pg.models.cache import invalidate_model
+from django_pg.models.fields.mixins import LOADING
+from django_pg.models.routing import record_write, use_primary
+from django_pg.models.sql.bulk import has_db_default
+from django_pg.utils import budget
 from django_pg.utils.gis import gis_backend
+from django_pg.utils.partitions import partitioned_table_sql
 from django_pg.utils.repr import smart_repr
 import importlib
 import six
 
 if gis_backend:
     from django.contrib.gis.db import models as gis_models
-    from django_pg.models.query import QuerySet, GeoQuerySet
+    from django_pg.models.query import QuerySet, QuerySetMixin, GeoQuerySet
 else:
-    from django_pg.models.query import QuerySet
+    from django_pg.models.query import QuerySet, QuerySetMixin
 
 
 # This is a monkey patch on `django.db.models.options.Options`.
@@ -27,6 +34,77 @@ if getattr(settings, 'DJANGOPG_IMPROVED_REPR', False):
 options.DEFAULT_NAMES = options.DEFAULT_NAMES + ('prefetch_related',
                                                  'select_related')
 
+# Similarly, add support for `defer` and `only` as Meta options, so that
+# large columns are not loaded unless they are asked for.
+options.DEFAULT_NAMES = options.DEFAULT_NAMES + ('defer', 'only')
+
+# Add support for PostgreSQL exclusion constraints as a Meta option.
+# Each constraint is a sequence of `(field_name, operator)` pairs, and
+# guarantees that no two rows return true for every operator.
+options.DEFAULT_NAMES = options.DEFAULT_NAMES + ('exclusion_constraints',)
+
+# Add support for declarative table partitioning as a Meta option.
+options.DEFAULT_NAMES = options.DEFAULT_NAMES + (
+    'partition_by', 'partition_count', 'partition_default',
+    'partition_interval', 'partitions_ahead', 'partitions_retained',
+)
+
+
+# Django 1.7 creates tables for migrated applications using a schema
+# editor, rather than `DatabaseCreation`.
+try:
+    from django.db.backends.postgresql_psycopg2.schema import (
+        DatabaseSchemaEditor,
+    )
+except ImportError:  # Django < 1.7
+    DatabaseSchemaEditor = None
+
+
+def patch_table_creation():
+    """Monkey patch PostgreSQL's `DatabaseCreation` class (which the PostGIS
+    backend subclasses) and, on Django 1.7, its `DatabaseSchemaEditor`, so
+    that tables for models which declare `partition_by` are created as
+    partitioned tables.
+
+    This is only done once a model which declares `partition_by` is
+    prepared, and the patched methods leave every other model alone.
+    """
+    if getattr(DatabaseCreation.sql_create_model, 'partitioning', False):
+        return
+
+    _sql_create_model = DatabaseCreation.sql_create_model
+    def sql_create_model(self, model, style, known_models=set()):
+        output, pending = _sql_create_model(self, model, style, known_models)
+        if getattr(model._meta, 'partition_by', None):
+            output[0] = partitioned_table_sql(output[0], model,
+                                              self.connection, style=style)
+        return output, pending
+    sql_create_model.partitioning = True
+    DatabaseCreation.sql_create_model = sql_create_model
+
+    if not DatabaseSchemaEditor:
+        return
+    _create_model = DatabaseSchemaEditor.create_model
+    def create_model(self, model):
+        if not getattr(model._meta, 'partition_by', None):
+            return _create_model(self, model)
+
+        # Modify the CREATE TABLE statement for this model (but not those
+        # for any many-to-many tables) as it is executed.
+        create_table = 'CREATE TABLE %s' % self.quote_name(
+            model._meta.db_table,
+        )
+        def execute(sql, params=[]):
+            if sql.startswith(create_table):
+                sql = partitioned_table_sql(sql, model, self.connection)
+            return DatabaseSchemaEditor.execute(self, sql, params)
+        self.execute = execute
+        try:
+            return _create_model(self, model)
+        finally:
+            del self.execute
+    DatabaseSchemaEditor.create_model = create_model
+
 
 def ManagerFactory(name, superclass, qs=QuerySet):
     """Create a manager class, using the given superclass, and adding
@@ -44,23 +122,69 @@ def ManagerFactory(name, superclass, qs=QuerySet):
     def _get_qs(self):
         queryset = qs(self.model, using=self._db)
 
-        # If the model's `Meta` specifies a `select_related` or
-        # `prefetch_related` value, the queryset should automatically
-        # apply that.
-        for rel_type in ('select_related', 'prefetch_related'):
-            rel = getattr(self.model._meta, rel_type, ())
-            if isinstance(rel, (six.text_type, six.binary_type)):
-                rel = (rel,)
-            if rel:
-                queryset = getattr(queryset, rel_type)(*rel)
+        # If the model's `Meta` specifies a `select_related`,
+        # `prefetch_related`, `defer`, or `only` value, the queryset should
+        # automatically apply that whenever it fetches model instances (but
+        # not for queries such as `count` or `values`, which would not
+        # use it).
+        queryset._meta_options = ('select_related', 'prefetch_related',
+                                  'defer', 'only')
+
+        # If a query budget is open, remember which related object
+        # attribute (if any) this queryset is loading, so that repeated
+        # loads can be reported.
+        if budget.active():
+            queryset.query.related_attribute = budget.related_attribute(self)
 
         # Return the queryset.
         return queryset
 
     if hasattr(superclass, 'get_queryset'):
-        attrs['get_queryset'] = _get_qs
+        get_qs_name = 'get_queryset'
     else:
-        attrs['get_query_set'] = _get_qs
+        get_qs_name = 'get_query_set'
+    attrs[get_qs_name] = _get_qs
+
+    # Make django_pg's own QuerySet methods available on the manager, so
+    # that (for instance) `Model.objects.bulk_upsert` works. Like Django,
+    # don't allow `Model.objects.delete()`.
+    #
+    # The queryset is retrieved through the manager's own `get_queryset`
+    # method, so that any subclass (including the related managers that
+    # Django creates, which filter on the related object) is honored.
+    def proxy(method_name):
+        def method(self, *args, **kwargs):
+            queryset = getattr(self, get_qs_name)()
+            return getattr(queryset, method_name)(*args, **kwargs)
+        method.__name__ = str(method_name)
+        method.__doc__ = getattr(QuerySetMixin, method_name).__doc__
+        return method
+    for method_name, value in vars(QuerySetMixin).items():
+        if (method_name.startswith('_') or method_name == 'delete' or
+                not callable(value)):
+            continue
+        if not hasattr(superclass, method_name):
+            attrs[method_name] = proxy(method_name)
+
+    # Django 1.5 has no `Model._do_insert` hook; new objects are saved
+    # through the base manager's `_insert` method instead, so fields whose
+    # values are generated by the database are set using
+    # INSERT ... RETURNING there.
+    if not hasattr(models.Model, '_do_insert'):
+        def _insert(self, objs, fields, **kwargs):
+            returning = [f for f in fields if has_db_default(f) and
+                         any(getattr(o, f.attname) is None for o in objs)]
+            if not returning:
+                return superclass._insert(self, objs, fields, **kwargs)
+            pk = self.model._meta.pk
+            if kwargs.get('return_id') and pk not in returning:
+                returning.append(pk)
+            queryset = qs(self.model, using=kwargs.get('using') or self._db)
+            queryset._insert_returning(objs, fields, returning,
+                                       raw=kwargs.get('raw', False))
+            if kwargs.get('return_id'):
+                return getattr(objs[0], pk.attname)
+        attrs['_insert'] = _insert
 
     # Instantiate and return the Manager.
     #
@@ -155,10 +279,21 @@ class ModelBase(models.base.ModelBase):
                     field.primary_key = True
                     opts.setup_pk(field)
                 else:
+                    # If the setting is a string, it is an SQL expression
+                    # (such as `gen_random_uuid()`) which the database uses
+                    # to generate the UUID.
                     from django_pg.models.fields.uuid import UUIDField
-                    auto = UUIDField(auto_add=True, primary_key=True)
+                    setting = settings.DJANGOPG_DEFAULT_UUID_PK
+                    if isinstance(setting, six.string_types):
+                        auto = UUIDField(db_default=setting, primary_key=True)
+                    else:
+                        auto = UUIDField(auto_add=True, primary_key=True)
                     cls.add_to_class('id', auto)
 
+        # Tables for partitioned models are created differently.
+        if getattr(opts, 'partition_by', None):
+            patch_table_creation()
+
         # Run the superclass method.
         # Note: We can't use `super` effectively here, because of some
         # subtleties of how six.with_metaclass works on Python 2.
@@ -174,6 +309,74 @@ class Model(six.with_metaclass(ModelBase, models.Model)):
     class Meta:
         abstract = True
 
+    def __init__(self, *args, **kwargs):
+        """Instantiate the model.
+
+        Values sent positionally (or to a class with deferred fields) come
+        from a database row, so django_pg's fields convert them only when
+        they are first accessed.
+        """
+        if not ((args and not kwargs) or self._deferred):
+            return super(Model, self).__init__(*args, **kwargs)
+        self.__dict__[LOADING] = True
+        try:
+            super(Model, self).__init__(*args, **kwargs)
+        finally:
+            del self.__dict__[LOADING]
+
+    def save_base(self, *args, **kwargs):
+        """Save this object, and invalidate any cached QuerySets that read
+        from this model's tables.
+
+        Any reads made while saving are sent to the primary database,
+        rather than to a replica.
+        """
+        with use_primary():
+            super(Model, self).save_base(*args, **kwargs)
+        invalidate_model(self.__class__, using=self._state.db)
+        record_write(self._state.db)
+    save_base.alters_data = True
+
+    def delete(self, using=None):
+        """Delete this object, and invalidate any cached QuerySets that read
+        from this model's tables, or from those of any objects deleted
+        along with it.
+        """
+        using = using or router.db_for_write(self.__class__, instance=self)
+        with use_primary():
+            super(Model, self).delete(using=using)
+        invalidate_model(self.__class__, using=using, delete=True)
+        record_write(using)
+    delete.alters_data = True
+
+    def _do_insert(self, manager, using, fields, update_pk, raw):
+        """Insert this object into the database, and return the new
+        primary key if `update_pk` is set.
+
+        If any fields have no value, and their values are generated by the
+        database, then INSERT ... RETURNING is used to set them. (Django 1.5
+        has no such hook, so the manager's `_insert` method does this
+        instead.)
+        """
+        # If there are no fields with values generated by the database,
+        # then Django's stock implementation is fine.
+        returning = [f for f in fields if has_db_default(f) and
+                     getattr(self, f.attname) is None]
+        if not returning:
+            return super(Model, self)._do_insert(manager, using, fields,
+                                                 update_pk, raw)
+
+        # Insert the object, returning the fields generated by the database
+        # (and the primary key, if Django wants it).
+        pk = self._meta.pk
+        if update_pk and pk not in returning:
+            returning.append(pk)
+        QuerySet(self.__class__, using=using)._insert_returning(
+            [self], fields, returning, raw=raw,
+        )
+        if update_pk:
+            return getattr(self, pk.attname)
+
     def __repr__(self, object_list=None, depth=1):
         """Send down a useful, unambiguous representation of the
         object.
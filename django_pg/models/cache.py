@@ -0,0 +1,192 @@
+from __future__ import absolute_import, unicode_literals
+from django.conf import settings
+from django.db import connections
+from django.db.backends.postgresql_psycopg2.base import DatabaseWrapper
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+from django.utils.encoding import force_bytes
+from django_pg.models.routing import in_transaction
+import functools
+import hashlib
+import threading
+import time
+
+try:
+    from django.core.cache import caches
+except ImportError:  # Django < 1.7
+    from django.core.cache import get_cache
+else:
+    def get_cache(alias):
+        return caches[alias]
+
+
+class CacheStats(object):
+    """Counters of how many cached QuerySets were answered from the cache
+    (hits), and how many had to be sent to the database (misses).
+    """
+    def __init__(self):
+        self.reset()
+
+    def __repr__(self):
+        return '<CacheStats: %d hits, %d misses>' % (self.hits, self.misses)
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+
+stats = CacheStats()
+
+# The tables written to within the transaction open on each database in
+# this thread, which are invalidated again once the transaction ends.
+_local = threading.local()
+
+
+def get_query_cache():
+    """Return the cache in which QuerySet results are stored, which is
+    named by the `DJANGOPG_QUERY_CACHE` setting.
+    """
+    return get_cache(getattr(settings, 'DJANGOPG_QUERY_CACHE', 'default'))
+
+
+def model_tables(model):
+    """Return the tables which the given model's data is stored in,
+    including those of any parent models.
+    """
+    opts = model._meta
+    return [opts.db_table] + [i._meta.db_table for i in opts.get_parent_list()]
+
+
+def _version_key(table):
+    return 'django_pg:table:%s' % table
+
+
+def table_versions(tables):
+    """Return the current version of each of the given tables, as a list.
+
+    A table which does not yet have a version is given one based on the
+    current time, so that if a table's version is evicted from the cache,
+    results cached under an earlier version are never used again.
+    """
+    cache = get_query_cache()
+    keys = [_version_key(i) for i in sorted(set(tables))]
+    versions = cache.get_many(keys)
+    missing = [i for i in keys if i not in versions]
+    if missing:
+        version = int(time.time() * 1000000)
+        for key in missing:
+            cache.add(key, version, None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(i, 0) for i in keys]
+
+
+def delete_tables(model):
+    """Return the tables which deleting objects of the given model may
+    write to: its own, those of its parents, and those of every model whose
+    rows are deleted (or updated) along with it, including many-to-many
+    tables.
+    """
+    answer = set()
+    seen = set()
+    pending = [model]
+    while pending:
+        model = pending.pop()._meta.concrete_model
+        if model in seen:
+            continue
+        seen.add(model)
+        opts = model._meta
+        answer.add(opts.db_table)
+
+        # Rows in many-to-many tables referring to the model's rows are
+        # deleted, as are (or are updated) the rows of related models.
+        for field in opts.many_to_many:
+            answer.add(field.rel.through._meta.db_table)
+        for related in opts.get_all_related_many_to_many_objects():
+            answer.add(related.field.rel.through._meta.db_table)
+        for related in opts.get_all_related_objects(include_hidden=True):
+            pending.append(related.model)
+        pending.extend(opts.get_parent_list())
+    return sorted(answer)
+
+
+def invalidate_tables(tables, using=None):
+    """Invalidate every cached QuerySet which reads from any of the
+    given tables, by incrementing their versions.
+
+    If the write was made to the `using` database within a transaction,
+    the tables are invalidated again when it ends, since until then other
+    connections read (and may cache) the data from before the write.
+    """
+    cache = get_query_cache()
+    tables = set(tables)
+    for table in tables:
+        try:
+            cache.incr(_version_key(table))
+        except ValueError:
+            # The table has no version, so nothing that reads from it
+            # has been cached since its version was last evicted.
+            pass
+
+    if using is not None and in_transaction(connections[using]):
+        if not hasattr(_local, 'pending'):
+            _local.pending = {}
+        _local.pending.setdefault(using, set()).update(tables)
+
+
+def invalidate_model(model, using=None, delete=False):
+    """Invalidate every cached QuerySet which reads from the given
+    model's tables or, if `delete` is set, from any table which deleting
+    objects of the model may write to.
+    """
+    if delete:
+        invalidate_tables(delete_tables(model), using=using)
+    else:
+        invalidate_tables(model_tables(model), using=using)
+
+
+def transaction_ended(using):
+    """Invalidate every cached QuerySet which reads from the tables
+    written to within the transaction which has just been committed or
+    rolled back on the given database.
+    """
+    tables = getattr(_local, 'pending', {}).pop(using, None)
+    if tables:
+        invalidate_tables(tables)
+
+
+def _ends_transaction(method):
+    @functools.wraps(method)
+    def inner(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            transaction_ended(self.alias)
+    return inner
+
+# This is a monkey patch on PostgreSQL's `DatabaseWrapper` class (which the
+# PostGIS backend subclasses), since Django has no signal sent when
+# a transaction is committed or rolled back.
+DatabaseWrapper.commit = _ends_transaction(DatabaseWrapper.commit)
+DatabaseWrapper.rollback = _ends_transaction(DatabaseWrapper.rollback)
+
+
+@receiver(m2m_changed)
+def invalidate_through_table(sender, action, using, **kwargs):
+    """Invalidate every cached QuerySet which reads from a many-to-many
+    table when objects are added to or removed from the relationship.
+    """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_model(sender, using=using)
+
+
+def query_cache_key(using, sql, params, versions, key=None):
+    """Return the cache key for the results of the given query, when the
+    tables it reads from are at the given versions.
+
+    If an explicit `key` is given, it is used in place of the query.
+    """
+    if key is None:
+        key = '%s:%s:%r' % (using, sql, params)
+    return 'django_pg:query:%s:%s' % (
+        hashlib.sha1(force_bytes(key)).hexdigest(),
+        hashlib.sha1(force_bytes(repr(versions))).hexdigest(),
+    )
@@ -3,4 +3,6 @@ from django_pg.models.fields.array import ArrayField
 from django_pg.models.fields.composite import CompositeField
 from django_pg.models.fields.datetime_ import DateTimeField
 from django_pg.models.fields.json import JSONField
+from django_pg.models.fields.range import (BigIntegerRangeField,
+    DateRangeField, DateTimeRangeField, IntegerRangeField, NumericRangeField)
 from django_pg.models.fields.uuid import UUIDField
@@ -5,13 +5,12 @@ try:
     from django_pg import lookups
 except ImportError:  # Django < 1.7
     lookups = None
+from django_pg.models.fields.mixins import LazyConversionMixin
 from django_pg.utils.datatypes import CoerciveList
 from django_pg.utils.south import south_installed
-import six
 
 
-@six.add_metaclass(models.SubfieldBase)
-class ArrayField(models.Field):
+class ArrayField(LazyConversionMixin, models.Field):
     """Field for storing PostgreSQL arrays."""
 
     if lookups:  # Django 1.7
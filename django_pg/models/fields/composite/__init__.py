@@ -1,20 +1,32 @@
 from __future__ import absolute_import, unicode_literals
 from copy import copy
+from django.core.exceptions import FieldError
 from django.core.management.color import no_style
 from django.db import models
+from django.db.models.constants import LOOKUP_SEP
 from django.db.models.fields import NOT_PROVIDED
 from django.db.models.options import Options
+try:
+    from django_pg import lookups
+except ImportError:  # Django < 1.7
+    lookups = None
 from django_pg.models.fields.composite.meta import CompositeMeta
+from django_pg.models.fields.mixins import LazyConversionMixin
+from django_pg.utils.indexes import create_index_sql, execute_sql, index_name
 from django_pg.utils.types import type_exists
 from psycopg2.extras import register_composite
 import six
 
 
 @six.add_metaclass(CompositeMeta)
-class CompositeField(models.Field):
+class CompositeField(LazyConversionMixin, models.Field):
     """Field class for storing PostgreSQL composite types."""
 
     def __init__(self, *args, **kwargs):
+        # Members of the composite type (such as `name`, or `acquired_in__pages`
+        # for nested composites) may be given expression indexes.
+        self.db_index_members = tuple(kwargs.pop('db_index_members', ()))
+
         # With composite fields, we need "null" and "blank"
         # to consistently be set to True.
         kwargs['null'] = True
@@ -95,6 +107,39 @@ class CompositeField(models.Field):
         # Return the answer.
         return ';\n'.join(answer)
 
+    def create_index_sql(self, connection, style=no_style(),
+                               only_if_not_exists=False):
+        """Return the appropriate SQL to create expression indexes on any
+        members of the composite type listed in `db_index_members`.
+        """
+        answer = []
+        qn = connection.ops.quote_name
+        table = self.model._meta.db_table
+        column = '%s.%s' % (qn(table), qn(self.column))
+        for member_path in self.db_index_members:
+            members = member_path.split(LOOKUP_SEP)
+            name = index_name(connection, table, self.column, *members)
+            sql = create_index_sql(connection, table, name,
+                expressions=[self.get_member_expression(column, members, qn)],
+                only_if_not_exists=only_if_not_exists,
+                style=style,
+            )
+            if sql:
+                answer.append(sql)
+        return '\n'.join(answer)
+
+    def create_indexes(self, connection):
+        """Create any expression indexes on members of the composite type,
+        if and only if they do not already exist.
+        """
+        # Sanity check: Are we using a dummy database?
+        if connection.vendor in ('dummy', 'unknown'):
+            return
+
+        # Retrieve and execute the SQL to create the indexes.
+        sql = self.create_index_sql(connection, only_if_not_exists=True)
+        execute_sql(connection, sql)
+
     @classmethod
     def db_type(cls, connection=None):
         """Return the appropriate PostgreSQL type, which
@@ -110,7 +155,27 @@ class CompositeField(models.Field):
 
     @classmethod
     def get_field_by_name(cls, field_name):
-        return { k: v for k, v in cls._meta.fields }[field_name]
+        return cls._meta.fields_by_name[field_name]
+
+    @classmethod
+    def get_member_expression(cls, lhs, members, qn):
+        """Return the SQL expression that accesses the given member (or,
+        for nested composite types, list of members) of the composite value
+        given by the `lhs` SQL expression.
+        """
+        field = cls
+        for member in members:
+            # Sanity check: Is this actually a member of the composite type?
+            if (not hasattr(field, 'instance_class') or
+                    member not in field.instance_class._field_set):
+                raise FieldError('Unrecognized composite member: %s' %
+                                 member)
+
+            # Wrap the expression so far in parentheses, as PostgreSQL
+            # requires, and access the member.
+            lhs = '(%s).%s' % (lhs, qn(member))
+            field = field.get_field_by_name(member)
+        return lhs
 
     @classmethod
     def register_composite(cls, connection, globally=True):
@@ -123,8 +188,12 @@ class CompositeField(models.Field):
         if connection.vendor in ('dummy', 'unknown'):
             return
 
-        # Register the composite type with psycopg2.
-        return register_composite(str(cls.db_type()), connection.cursor(),
+        # Register the composite type with psycopg2. Types which are only
+        # registered on this connection must be registered using psycopg2's
+        # own connection object.
+        cursor = connection.cursor()
+        return register_composite(str(cls.db_type()),
+            cursor if globally else connection.connection,
             factory=cls.caster,
             globally=globally,
         )
@@ -133,6 +202,21 @@ class CompositeField(models.Field):
     def type_exists(cls, connection):
         return type_exists(connection, cls._meta.db_type)
 
+    def get_transform(self, lookup_name):
+        """Return the appropriate Django 1.7 transform for accessing a
+        single member of the composite type.
+        """
+        if lookup_name in self.instance_class._field_set:
+            member_field = self.get_field_by_name(lookup_name)
+
+            class CompositeMember(lookups.CompositeMember):
+                member = lookup_name
+                output_field = member_field
+            return CompositeMember
+
+        # The standard superclass is acceptable in every other situation.
+        return super(CompositeField, self).get_transform(lookup_name)
+
     def get_prep_lookup(self, lookup_type, value):
         """Return the appropriate value for a database lookup."""
         # We only understand the `exact` lookup type at this time.
@@ -144,30 +228,6 @@ class CompositeField(models.Field):
         """Convert the value to the appropriate Python type prior
         to assigning it.
         """
-        # If the value is the instance class, then pass it through
-        # unaltered.
-        if isinstance(value, self.instance_class):
-            for name, field in self.get_fields():
-                setattr(value, name, field.to_python(getattr(value, name)))
-            return value
-
-        # If the value is None or some other "falsy" value, simply
-        # set an empty object of the appropriate class.
-        if not value:
-            return self.instance_class()
-
-        # If the value is a list or a tuple, convert to the instance
-        # class based on values.
-        if isinstance(value, (list, tuple)):
-            return self.instance_class(
-                *[f[1].to_python(v) for f, v in zip(self.get_fields(), value)]
-            )
-
-        # The other thing we can understand is a dictionary, or something
-        # which can be sent to the dict constructor; pass it as keyword
-        # arguments.
-        kwargs = {}
-        for k, v in dict(value).items():
-            f = self.get_field_by_name(k)
-            kwargs[k] = f.to_python(v)
-        return self.instance_class(**kwargs)
+        # The conversion is done by a converter compiled for this composite
+        # type when the field class was created.
+        return self._converter(value)
@@ -4,6 +4,7 @@ from copy import copy
 from django.db import models, connection
 from django.db.models.fields.related import RelatedField
 from django_pg.models.fields.composite.adapter import adapter_factory
+from django_pg.models.fields.datetime_ import DateTimeField
 from django_pg.utils import Meta
 from django_pg.utils.types import type_exists
 from importlib import import_module
@@ -12,12 +13,47 @@ from psycopg2.extras import CompositeCaster
 import re
 
 
+# Field classes whose values are already cast to the appropriate Python
+# type by psycopg2, and therefore need no further coercion when they are
+# read out of the database as members of a composite type.
+NATIVE_FIELD_CLASSES = frozenset((
+    models.BigIntegerField,
+    models.BooleanField,
+    models.CharField,
+    models.CommaSeparatedIntegerField,
+    models.DateField,
+    models.DateTimeField,
+    models.DecimalField,
+    models.EmailField,
+    models.FloatField,
+    models.IntegerField,
+    models.NullBooleanField,
+    models.PositiveIntegerField,
+    models.PositiveSmallIntegerField,
+    models.SlugField,
+    models.SmallIntegerField,
+    models.TextField,
+    models.TimeField,
+    models.URLField,
+    DateTimeField,
+))
+
+
 class CompositeInstance(object):
-    def __init__(self, *args, **kwargs):
-        # Assign the default values to the instance.
-        for key, val in self._defaults.items():
-            setattr(self, key, val)
+    """Base class for the instance classes generated for each
+    CompositeField subclass.
+
+    Instance classes store their values in slots rather than in an
+    instance dictionary, since composite arrays may easily produce
+    millions of these objects.
+
+    The `_coerced` slot records whether every value has already been
+    coerced to the appropriate Python type; it is cleared whenever a value
+    is assigned directly.
+    """
+    __slots__ = ('_coerced',)
 
+    def __init__(self, *args, **kwargs):
         # If we have positional arguments, convert them to keyword arguments
         # based on our field names.
         for field_name, pos_arg_value in zip(self._field_names, args):
@@ -32,26 +68,174 @@ class CompositeInstance(object):
             # All is well: Assign the argument into kwargs.
             kwargs[field_name] = pos_arg_value
 
-        # Assign any values that were sent on initialization.
-        for key, val in kwargs.items():
-            # Sanity Check: Does this field actually exist within
-            # this composite type?
-            if key not in self._field_names:
+        # Sanity Check: Do all of the fields actually exist within
+        # this composite type?
+        for key in kwargs:
+            if key not in self._field_set:
                 raise KeyError('Unrecognized key: %s' % key)
-            setattr(self, key, val)
+
+        # Assign every value, falling back to the default values for any
+        # field that was not sent on initialization.
+        for key, setter in zip(self._field_names, self._setters):
+            if key in kwargs:
+                setter(self, kwargs[key])
+            else:
+                setter(self, self._defaults[key])
+        _set_coerced(self, False)
 
     def __iter__(self):
         for key in self._field_names:
             yield getattr(self, key)
 
+    def __reduce__(self):
+        return (self.__class__, tuple(self))
+
+    def __setattr__(self, name, value):
+        # A value assigned directly may need to be coerced again.
+        super(CompositeInstance, self).__setattr__(name, value)
+        _set_coerced(self, False)
+
     def __repr__(self):
         return repr(self.as_namedtuple())
 
+    @classmethod
+    def _make(cls, values, coerced=False):
+        """Create a new instance from a sequence of values, which must
+        be in field order and include a value for every field.
+
+        This is the fast constructor used when reading values out of the
+        database; it skips the keyword argument handling and validation
+        done by `__init__`.
+        """
+        instance = cls.__new__(cls)
+        for setter, value in zip(cls._setters, values):
+            setter(instance, value)
+        _set_coerced(instance, coerced)
+        return instance
+
     def as_namedtuple(self):
         return self._namedtuple(*tuple(self))
 
 
-class CompositeMeta(models.SubfieldBase):
+# Set the `_coerced` slot directly, bypassing `__setattr__`.
+_set_coerced = CompositeInstance._coerced.__set__
+
+
+class CompositeConverter(object):
+    """Callable which converts tuples, dictionaries, and composite instances
+    into instances of a composite instance class, coercing each member to
+    the appropriate Python type.
+
+    One converter is compiled for each CompositeField subclass when the
+    class is created, so that no per-call work is needed to look up the
+    composite type's fields.
+    """
+    def __init__(self, instance_class, fields):
+        self.instance_class = instance_class
+        self.converters = tuple([field.to_python for name, field in fields])
+        self.converters_by_name = dict(
+            [(name, field.to_python) for name, field in fields],
+        )
+        self.members = tuple(zip(
+            instance_class._field_names,
+            instance_class._setters,
+            self.converters,
+        ))
+
+        # Determine which members need to be coerced when an instance is
+        # read out of the database. Most values are already cast by psycopg2
+        # (and nested composite values are cast by their own casters), so
+        # only the remainder need any attention.
+        self.caster_coercions = tuple([
+            (index, field.to_python) for index, (name, field)
+            in enumerate(fields)
+            if type(field) not in NATIVE_FIELD_CLASSES
+            and not isinstance(type(field), CompositeMeta)
+        ])
+
+    def __call__(self, value):
+        """Convert the value to the composite instance class."""
+        instance_class = self.instance_class
+
+        # If the value is the instance class, then coerce its members
+        # in place, unless that has already been done.
+        if isinstance(value, instance_class):
+            if not value._coerced:
+                for name, setter, convert in self.members:
+                    setter(value, convert(getattr(value, name)))
+                _set_coerced(value, True)
+            return value
+
+        # If the value is None or some other "falsy" value, simply
+        # set an empty object of the appropriate class.
+        if not value:
+            return instance_class()
+
+        # If the value is a list or a tuple, convert to the instance
+        # class based on values.
+        if isinstance(value, (list, tuple)):
+            values = [convert(v) for convert, v in zip(self.converters, value)]
+            if len(values) == len(self.converters):
+                return instance_class._make(values, coerced=True)
+            instance = instance_class(*values)
+
+        # The other thing we can understand is a dictionary, or something
+        # which can be sent to the dict constructor; pass it as keyword
+        # arguments.
+        else:
+            converters = self.converters_by_name
+            instance = instance_class(**dict(
+                [(k, converters[k](v)) for k, v in dict(value).items()],
+            ))
+
+        # Any values not sent were set to their defaults, which need no
+        # further coercion.
+        _set_coerced(instance, True)
+        return instance
+
+
+class InstanceCaster(CompositeCaster):
+    """Caster class for converting composite values read from the
+    database into the composite instance class.
+
+    Subclasses are created by CompositeMeta, and set `instance_class`.
+    """
+    instance_class = None
+    coercions = ()
+
+    def __init__(self, *args, **kwargs):
+        super(InstanceCaster, self).__init__(*args, **kwargs)
+
+        # Determine whether the attributes of the type in the database
+        # are in the same order as our fields.
+        self.in_field_order = (
+            tuple(self.attnames) == self.instance_class._field_names
+        )
+
+    def make(self, values):
+        """Return an instance of the composite instance class from
+        the values read out of the database.
+        """
+        # In the overwhelmingly common case, the database type was created
+        # from our field definitions and the values are already in field
+        # order, so we can use the positional fast constructor, coercing
+        # only those members that psycopg2 does not already cast.
+        if self.in_field_order:
+            for index, convert in self.coercions:
+                values[index] = convert(values[index])
+            return self.instance_class._make(values, coerced=True)
+
+        # The type's attributes are in some other order; match them up
+        # by name.
+        return self.instance_class(**dict(zip(self.attnames, values)))
+
+
+# Every CompositeField subclass, so that their casters may be registered
+# on connections other than the default one.
+composite_field_classes = []
+
+
+class CompositeMeta(type):
     """Metaclass for CompositeFields."""
 
     def __new__(cls, name, bases, attrs):
@@ -84,46 +268,65 @@ class CompositeMeta(models.SubfieldBase):
         # Create a "_meta" object (mimic how django.db.models.Model does it)
         #   that stores the sub-fields, as well as any other properties
         #   (such as an alternate type name).
+        # CompositeField itself is the only class derived directly from
+        # Field, rather than from CompositeField.
         meta_obj = attrs.pop('Meta', Meta())
-        if not hasattr(meta_obj, 'db_type') and bases != (models.Field,):
+        base = models.Field in bases
+        if not hasattr(meta_obj, 'db_type') and not base:
             meta_obj.db_type = re.sub(r'field$', '', name.lower())
 
         # Store the fields on the meta object.
         if not hasattr(meta_obj, 'fields'):
             meta_obj.fields = []
         meta_obj.fields += fields
+        meta_obj.fields_by_name = dict(meta_obj.fields)
 
         # Instantiate the class
-        new_class = models.SubfieldBase.__new__(cls, name, bases, attrs)
+        new_class = super(CompositeMeta, cls).__new__(cls, name, bases,
+                                                      attrs)
 
         # Add the meta object to the class.
         new_class._meta = meta_obj
 
         # Sanity check: We actually only want the remaining behavior
         # on *subclasses* of CompositeField, not CompositeField itself.
-        if name == 'CompositeField' and bases == (models.Field,):
+        if base:
             return new_class
 
         # Additionally, create another class that will hold instance values.
         # The `str` on the next two lines is intentional; I want a `str` object
         # regardless of whether this is Python 2 or Python 3.
         class_name = str(re.sub(r'Field$', '', name))
-        field_names = [str(i[0]) for i in meta_obj.fields]
+        field_names = tuple([str(i[0]) for i in meta_obj.fields])
         instance_class = type(class_name, (CompositeInstance,), {
+            '__module__': new_class.__module__,
+            '__slots__': field_names,
             '_defaults': dict(
                 [(i[0], i[1].get_default()) for i in meta_obj.fields],
             ),
             '_field_names': field_names,
+            '_field_set': frozenset(field_names),
             '_namedtuple': namedtuple(
                 typename=class_name,
                 field_names=field_names,
             )
         })
 
+        # Store the setter for each slot, in field order, so that instances
+        # can be populated without any attribute name lookups.
+        instance_class._setters = tuple(
+            [getattr(instance_class, i).__set__ for i in field_names],
+        )
+
         # Assign the instance class to the field class, so we can
         # get to it from there.
         new_class.instance_class = instance_class
 
+        # Compile the converter which turns Python values into instances
+        # of the instance class.
+        new_class._converter = CompositeConverter(instance_class,
+                                                  meta_obj.fields)
+
         # Ensure that the type exists in the database.
         # This is the final hook for this; it will ensure the presence
         # of the type if the syncdb or connection creation hooks fail.
@@ -137,14 +340,14 @@ class CompositeMeta(models.SubfieldBase):
         #   comes out of the database into our new Python class.
         # For more info, see: http://initd.org/psycopg/docs/extras.html
         caster_class_name = str(class_name + 'Caster')
-        new_class.caster = type(caster_class_name, (CompositeCaster,), {
-            'make': lambda self, values: instance_class(
-                **dict(zip(self.attnames, values))
-            ),
+        new_class.caster = type(caster_class_name, (InstanceCaster,), {
+            'coercions': new_class._converter.caster_coercions,
+            'instance_class': instance_class,
         })
 
         # Register the caster class with psycopg2.
         new_class.register_composite(connection)
+        composite_field_classes.append(new_class)
 
         # Register an adapter function with psycopg2. The adapter function
         # tells psycopg2 how to translate our instance class to SQL.
@@ -168,6 +371,9 @@ class CompositeMeta(models.SubfieldBase):
                     (new_class,),
                     [],
                     {
+                        'db_index_members': ['db_index_members', {
+                            'default': (),
+                        }],
                         'null': ['null', { 'default': True }],
                     },
                 )
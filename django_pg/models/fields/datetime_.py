@@ -1,18 +1,27 @@
 from datetime import datetime
 from django.conf import settings
 from django.db import models
+from django_pg.models.fields.mixins import IndexMethodMixin
 from django_pg.utils.south import south_installed
 import pytz
 
 
-class DateTimeField(models.DateTimeField):
+class DateTimeField(IndexMethodMixin, models.DateTimeField):
     """A DateTimeField subclass that knows how to convert an integer
     from a UNIX timestamp to a datetime.
+
+    It may also be indexed using an index method other than btree;
+    BRIN indexes are well-suited to timestamps in append-only tables.
     """
     def to_python(self, value):
         """If an integer is provided, return an appropriate datetime, assuming
         this is a UNIX Timestamp. Otherwise, run the superclass method.
         """
+        # Values read from the database are already aware datetimes, and
+        # need no conversion; return them as quickly as possible.
+        if value.__class__ is datetime and value.tzinfo is not None:
+            return value
+
         if isinstance(value, int):
             if settings.USE_TZ:
                 return datetime.fromtimestamp(value, tz=pytz.UTC)
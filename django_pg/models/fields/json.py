@@ -2,6 +2,7 @@ from __future__ import absolute_import, unicode_literals
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.db.backends.postgresql_psycopg2.version import get_version
+from django_pg.models.fields.mixins import LazyConversionMixin
 from django_pg.utils.decorators import validate_type
 from django_pg.utils.south import south_installed
 import json
@@ -9,8 +10,7 @@ import re
 import six
 
 
-@six.add_metaclass(models.SubfieldBase)
-class JSONField(models.Field):
+class JSONField(LazyConversionMixin, models.Field):
     """Specialized text field that holds JSON in the database, which is
     represented within Python as (usually) a dictionary.
     """
@@ -0,0 +1,162 @@
+from __future__ import absolute_import, unicode_literals
+from django.core.management.color import no_style
+from django_pg.utils.indexes import create_index_sql, execute_sql, index_name
+from django_pg.utils.south import south_installed
+
+
+# The key set in a model instance's `__dict__` while it is being populated
+# from a database row, so that its values are converted lazily.
+LOADING = '_djangopg_loading'
+
+
+class RawValue(object):
+    """A value loaded from the database, which has yet to be converted
+    to its Python value.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __reduce__(self):
+        return (RawValue, (self.value,))
+
+
+class LazyConverter(object):
+    """Descriptor which converts values assigned to a field using the
+    field's `to_python` method.
+
+    Values loaded from the database are instead converted when they are
+    first accessed, so that instantiating (or unpickling) a model instance
+    never converts values which are never used.
+    """
+    def __init__(self, field):
+        self.field = field
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            raise AttributeError('Can only be accessed via an instance.')
+        value = instance.__dict__[self.field.name]
+        if value.__class__ is RawValue:
+            value = self.field.to_python(value.value)
+            instance.__dict__[self.field.name] = value
+        return value
+
+    def __set__(self, instance, value):
+        if instance.__dict__.get(LOADING):
+            value = RawValue(value)
+        else:
+            value = self.field.to_python(value)
+        instance.__dict__[self.field.name] = value
+
+
+class LazyConversionMixin(object):
+    """Mixin for Field subclasses, whose values are converted to Python
+    values using `to_python` when they are assigned, or (for values loaded
+    from the database) when they are first accessed.
+    """
+    def contribute_to_class(self, cls, name, *args, **kwargs):
+        super(LazyConversionMixin, self).contribute_to_class(cls, name,
+                                                             *args, **kwargs)
+        setattr(cls, self.name, LazyConverter(self))
+
+
+class IndexMethodMixin(object):
+    """Mixin for Field subclasses, which allows the index on the field
+    to use an index method other than the btree indexes that Django
+    knows how to create.
+
+    Fields using this mixin accept `db_index_method` (such as `'gist'`
+    or `'brin'`), and `db_index_options`, a dictionary of storage
+    parameters for the index (such as `{'pages_per_range': 32}`).
+    """
+    default_index_method = 'btree'
+
+    def __init__(self, *args, **kwargs):
+        method = kwargs.pop('db_index_method', None)
+        self.db_index_options = dict(kwargs.pop('db_index_options', {}))
+        super(IndexMethodMixin, self).__init__(*args, **kwargs)
+
+        # If an index was requested without a method, use the default
+        # method for this kind of field.
+        if method is None and self.db_index:
+            method = self.default_index_method
+        self.db_index_method = method
+
+        # Django creates btree indexes on its own. Indexes using any other
+        # method are created by django_pg after the table is created,
+        # so Django must not create one itself.
+        if method == 'btree':
+            self.db_index = True
+        elif method:
+            self.db_index = False
+
+    @property
+    def _default_index(self):
+        """True if this field's index is the one that `db_index=True` alone
+        creates, so that the index method need not be recorded in
+        migrations, False otherwise.
+        """
+        return bool(self.db_index and
+                    self.db_index_method == self.default_index_method)
+
+    def deconstruct(self):
+        """Return the information needed to recreate this field in a
+        migration (Django 1.7+), including its index method and options.
+        """
+        name, path, args, kwargs = super(IndexMethodMixin, self).deconstruct()
+        if self.db_index_method and not self._default_index:
+            kwargs['db_index_method'] = self.db_index_method
+        if self.db_index_options:
+            kwargs['db_index_options'] = self.db_index_options
+        return name, path, args, kwargs
+
+    def create_index_sql(self, connection, style=no_style(),
+                               only_if_not_exists=False):
+        """Return the appropriate SQL to create the index on this field,
+        if it uses an index method Django does not create itself.
+        """
+        method = self.db_index_method
+        if not method or method == 'btree':
+            return ''
+
+        # Return the SQL to create the index.
+        qn = connection.ops.quote_name
+        table = self.model._meta.db_table
+        return create_index_sql(connection, table,
+            expressions=[qn(self.column)],
+            method=method,
+            name=index_name(connection, table, self.column, method),
+            only_if_not_exists=only_if_not_exists,
+            options=self.db_index_options,
+            style=style,
+        )
+
+    def create_indexes(self, connection):
+        """Create the index on this field, if and only if it does not
+        already exist.
+        """
+        # Sanity check: Are we using a dummy database?
+        if connection.vendor in ('dummy', 'unknown'):
+            return
+
+        # Retrieve and execute the SQL to create the index.
+        sql = self.create_index_sql(connection, only_if_not_exists=True)
+        execute_sql(connection, sql)
+
+
+# If South is installed, then tell South how to properly introspect
+# the index options of every field using this mixin.
+if south_installed:
+    from south.modelsinspector import add_introspection_rules
+    add_introspection_rules([(
+        (IndexMethodMixin,),
+        [],
+        {
+            'db_index_method': ['db_index_method', {
+                'default': None,
+                'ignore_if': '_default_index',
+            }],
+            'db_index_options': ['db_index_options', { 'default': {} }],
+        },
+    )], [])
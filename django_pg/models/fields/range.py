@@ -0,0 +1,204 @@
+from __future__ import absolute_import, unicode_literals
+from django.db import models
+try:
+    from django_pg import lookups
+except ImportError:  # Django < 1.7
+    lookups = None
+from django_pg.models.fields.datetime_ import DateTimeField
+from django_pg.models.fields.mixins import (IndexMethodMixin,
+                                            LazyConversionMixin)
+from django_pg.utils.south import south_installed
+from psycopg2.extras import DateRange, DateTimeTZRange, NumericRange, Range
+import re
+import six
+
+
+# The PostgreSQL operators used for each of the range lookup types.
+RANGE_OPERATORS = {
+    'adjacent': '-|-',
+    'contained_by': '<@',
+    'contains': '@>',
+    'overlap': '&&',
+}
+
+
+class RangeField(IndexMethodMixin, LazyConversionMixin, models.Field):
+    """Field for storing PostgreSQL ranges.
+
+    Subclasses set the psycopg2 range class used to represent values,
+    the field class for the range's bounds, and the PostgreSQL range
+    and bound types.
+    """
+    base_field = None
+    db_range_type = None
+    db_subtype = None
+    range_type = Range
+
+    # Ranges are indexed using GiST indexes, which (unlike btree indexes)
+    # are able to answer overlap and containment queries.
+    default_index_method = 'gist'
+
+    if lookups:  # Django 1.7
+        class_lookups = {
+            'adjacent': lookups.RangeAdjacent,
+            'contained_by': lookups.RangeContainedBy,
+            'contains': lookups.RangeContains,
+            'overlap': lookups.RangeOverlap,
+        }
+
+    def __init__(self, *args, **kwargs):
+        super(RangeField, self).__init__(*args, **kwargs)
+
+        # Keep an instance of the field class for the range's bounds,
+        # which knows how to coerce individual values.
+        self.bound_field = self.base_field()
+
+    def db_type(self, connection):
+        return self.db_range_type
+
+    def get_db_lookup_expression(self, lookup_type, value, connection):
+        # If this is a range lookup, use the appropriate operator, and
+        # explicitly typecast our value to the proper type.
+        # Containment checks may be against a single value rather than a
+        # range, in which case the value is of the range's subtype.
+        if lookup_type in RANGE_OPERATORS:
+            db_type = self.db_type(connection)
+            if lookup_type == 'contains' and not isinstance(value, Range):
+                db_type = self.db_subtype
+            return '{field} %s {value}::%s' % (
+                RANGE_OPERATORS[lookup_type],
+                db_type,
+            )
+
+        # If this is the "exact" lookup type, then explicitly
+        # typecast our value to the proper type.
+        if lookup_type == 'exact':
+            return '{field} = {value}::%s' % self.db_type(connection)
+
+    def get_db_prep_lookup(self, lookup_type, value, connection,
+                           prepared=False):
+        # Range lookups need no further processing; in particular, we
+        # don't want the "%" adding to `contains` that comes with the Django
+        # stock implementation.
+        if lookup_type in RANGE_OPERATORS:
+            if not prepared:
+                value = self.get_prep_lookup(lookup_type, value)
+            return [value]
+
+        # Default behavior is fine in all other cases.
+        return super(RangeField, self).get_db_prep_lookup(
+            lookup_type, value, connection,
+            prepared=prepared,
+        )
+
+    def get_prep_lookup(self, lookup_type, value):
+        # A containment check may be against a single value, in which case
+        # it should be coerced to the range's subtype.
+        if lookup_type == 'contains':
+            if not isinstance(value, (Range, list, tuple)):
+                return self.bound_field.get_prep_value(value)
+
+        # The range lookups, as well as `exact`, take another range.
+        if lookup_type in RANGE_OPERATORS or lookup_type == 'exact':
+            return self.get_prep_value(value)
+
+        # `isnull` is handled by the superclass; ranges do not support any
+        # other built-in lookups.
+        if lookup_type != 'isnull':
+            raise TypeError('Unsupported lookup type: %s' % lookup_type)
+        return super(RangeField, self).get_prep_lookup(lookup_type, value)
+
+    def get_prep_value(self, value):
+        """Return the value as the appropriate psycopg2 range class,
+        which psycopg2 knows how to adapt.
+        """
+        return self.to_python(value)
+
+    def to_python(self, value):
+        """Convert the value to the appropriate psycopg2 range class."""
+        if value is None or isinstance(value, self.range_type):
+            return value
+
+        # A range (or string representation of a range) may be sent
+        # as a string, such as `'[1,5)'` or `'empty'`.
+        if isinstance(value, six.string_types):
+            if value == 'empty':
+                return self.range_type(empty=True)
+            match = re.match(r'^([\[(])(.*),(.*)([\])])$', value.strip())
+            if not match:
+                raise ValueError('Invalid range: %s' % value)
+            lower, upper = [i.strip().strip('"') or None
+                            for i in match.groups()[1:3]]
+            value = (lower, upper, match.group(1) + match.group(4))
+
+        # The other thing we can understand is a list or tuple of
+        # the lower and upper bounds, and optionally the bounds string.
+        if isinstance(value, (list, tuple)):
+            bounds = [self.bound_field.to_python(i) if i is not None
+                      else None for i in value[0:2]]
+            return self.range_type(*(bounds + list(value[2:3])))
+
+        # Ranges of the other psycopg2 range classes can be converted.
+        if isinstance(value, Range):
+            if value.isempty:
+                return self.range_type(empty=True)
+            bounds = '%s%s' % ('[' if value.lower_inc else '(',
+                               ']' if value.upper_inc else ')')
+            return self.to_python((value.lower, value.upper, bounds))
+
+        raise TypeError('Cannot convert %s to a range.' %
+                        type(value).__name__)
+
+
+class DateTimeRangeField(RangeField):
+    """Field for storing ranges of timestamps with time zones."""
+    base_field = DateTimeField
+    db_range_type = 'tstzrange'
+    db_subtype = 'timestamp with time zone'
+    description = 'Range of timestamps with time zones.'
+    range_type = DateTimeTZRange
+
+
+class DateRangeField(RangeField):
+    """Field for storing ranges of dates."""
+    base_field = models.DateField
+    db_range_type = 'daterange'
+    db_subtype = 'date'
+    description = 'Range of dates.'
+    range_type = DateRange
+
+
+class IntegerRangeField(RangeField):
+    """Field for storing ranges of integers."""
+    base_field = models.IntegerField
+    db_range_type = 'int4range'
+    db_subtype = 'integer'
+    description = 'Range of integers.'
+    range_type = NumericRange
+
+
+class BigIntegerRangeField(RangeField):
+    """Field for storing ranges of big (8 byte) integers."""
+    base_field = models.BigIntegerField
+    db_range_type = 'int8range'
+    db_subtype = 'bigint'
+    description = 'Range of big (8 byte) integers.'
+    range_type = NumericRange
+
+
+class NumericRangeField(RangeField):
+    """Field for storing ranges of arbitrary precision numbers."""
+    base_field = models.DecimalField
+    db_range_type = 'numrange'
+    db_subtype = 'numeric'
+    description = 'Range of arbitrary precision numbers.'
+    range_type = NumericRange
+
+
+# If South is installed, then tell South how to properly
+# introspect range fields.
+if south_installed:
+    from south.modelsinspector import add_introspection_rules
+    add_introspection_rules([],
+        (r'^django_pg\.models\.fields\.range\.',),
+    )
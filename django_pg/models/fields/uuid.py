@@ -1,6 +1,8 @@
 from __future__ import absolute_import, unicode_literals
-from django.db.models import Field, SubfieldBase
+from django.db.models import Field
 from django.db.models.fields import NOT_PROVIDED
+from django_pg.models.fields.mixins import (IndexMethodMixin,
+                                            LazyConversionMixin)
 from django_pg.utils.south import south_installed
 from psycopg2.extensions import register_adapter
 import importlib
@@ -8,12 +10,12 @@ import six
 import uuid
 
 
-@six.add_metaclass(SubfieldBase)
-class UUIDField(Field):
+class UUIDField(IndexMethodMixin, LazyConversionMixin, Field):
     """Field for storing UUIDs."""
     description = 'Universally unique identifier.'
 
-    def __init__(self, auto_add=False, coerce_to=uuid.UUID, **kwargs):
+    def __init__(self, auto_add=False, coerce_to=uuid.UUID, db_default=None,
+                       **kwargs):
         """Instantiate the field."""
 
         # If the `auto_add` argument is specified as True, substitute an
@@ -33,13 +35,18 @@ class UUIDField(Field):
         self._auto_add = auto_add
         self._coerce_to = coerce_to
 
+        # Save the SQL expression, if any, that the database uses to
+        # generate a UUID when none is provided.
+        self.db_default = db_default
+
         # This should be a unique field by default.
         if 'unique' not in kwargs:
             kwargs['unique'] = True
 
-        # If `auto_add` is enabled, it should imply that the field
-        # is not editable, and should not show up in ModelForms.
-        if auto_add and 'editable' not in kwargs:
+        # If `auto_add` (or a database default) is enabled, it should imply
+        # that the field is not editable, and should not show up
+        # in ModelForms.
+        if (auto_add or db_default) and 'editable' not in kwargs:
             kwargs['editable'] = False
 
         # Blank values shall be nulls.
@@ -60,7 +67,8 @@ class UUIDField(Field):
 
         # If the value is None, return None.
         if not value:
-            if self.null or self._auto_add or (self.default != NOT_PROVIDED):
+            if (self.null or self._auto_add or self.db_default or
+                    self.default != NOT_PROVIDED):
                 return None
             raise ValueError('Explicit UUID required unless either `null` is '
                              'True or `auto_add` is given.')
@@ -135,6 +143,7 @@ if south_installed:
         {
             'auto_add': ['_auto_add_str', { 'default': False }],
             'coerce_to': ['_coerce_to', { 'default': uuid.UUID }],
+            'db_default': ['db_default', { 'default': None }],
             'unique': ['unique', { 'default': True }],
         },
     )], (r'^django_pg\.models\.fields\.uuid\.UUIDField',))
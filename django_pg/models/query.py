@@ -1,6 +1,29 @@
 from __future__ import absolute_import, unicode_literals
+from collections import OrderedDict
+from django.db import connections, models, transaction
+from django.db.transaction import TransactionManagementError
 from django.db.models import query
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.fields import FieldDoesNotExist
+from django.db.models.sql.datastructures import EmptyResultSet
+from django.utils.encoding import force_text
+from django_pg.models.cache import (get_query_cache, invalidate_model,
+                                    query_cache_key, stats, table_versions)
+from django_pg.models.fields.composite import CompositeField
+from django_pg.models.routing import (in_transaction, read_alias,
+                                      record_write, use_primary)
+from django_pg.models.sql.bulk import (claim_sql, copy_to_sql,
+                                       has_db_default, insert_sql, update_sql,
+                                       upsert_cte_sql, upsert_sql)
+from django_pg.pagination import KeysetPage, decode_cursor, encode_cursor
+from django_pg.utils.columns import Column
+from django_pg.utils.cursors import unwrap
 from django_pg.utils.gis import gis_backend
+from django_pg.utils.explain import explain_sql
+from django_pg.utils.types import cast_type
+from itertools import islice
+import contextlib
+import json
 import six
 
 if gis_backend:
@@ -12,7 +35,938 @@ else:
     from django_pg.models.sql.where import WhereNode
 
 
-class QuerySet(query.QuerySet):
+@contextlib.contextmanager
+def write_transaction(using):
+    """Ensure that all writes made within the block are made in
+    a transaction, which is committed if it was not already open.
+    """
+    atomic = getattr(transaction, 'atomic', None)  # Django >= 1.6
+    if atomic:
+        with atomic(using=using, savepoint=False):
+            yield
+    else:
+        yield
+        transaction.commit_unless_managed(using=using)
+
+
+class GeneratorWriter(object):
+    """File-like object which sends everything written to it to
+    the given (primed) generator.
+    """
+    def __init__(self, generator):
+        self.write = generator.send
+
+
+class QuerySetMixin(object):
+    """Mixin for QuerySet classes, which teaches them how to perform
+    PostgreSQL-specific operations added in django_pg.
+    """
+    # Options for caching this QuerySet's results, set by `cached`.
+    _cache_options = None
+
+    # The model's `Meta` options (such as `select_related` and `defer`)
+    # which are yet to be applied to this QuerySet. They are applied only
+    # once it fetches model instances.
+    _meta_options = ()
+
+    def _clone(self, klass=None, setup=False, **kwargs):
+        """Return a copy of this QuerySet, carrying over its caching
+        options, and any `Meta` options which are yet to be applied.
+
+        If the copy is a ValuesQuerySet (as `values` and `values_list`
+        return), it is given django_pg's behavior as well.
+        """
+        if klass is not None and issubclass(klass, query.ValuesQuerySet):
+            if not issubclass(klass, QuerySetMixin):
+                klass = mixin_class(klass)
+
+            # Values are not model instances, so the model's `Meta` options
+            # do not apply to them.
+            kwargs['_meta_options'] = ()
+        kwargs.setdefault('_cache_options', self._cache_options)
+        kwargs.setdefault('_meta_options', self._meta_options)
+        return super(QuerySetMixin, self)._clone(klass=klass, setup=setup,
+                                                 **kwargs)
+
+    def __iter__(self):
+        self._apply_meta_options()
+        return super(QuerySetMixin, self).__iter__()
+
+    def __len__(self):
+        self._apply_meta_options()
+        return super(QuerySetMixin, self).__len__()
+
+    def iterator(self):
+        """Iterate over the results of this QuerySet, retrieving them from
+        the cache if this QuerySet is cached.
+        """
+        self._apply_meta_options()
+        if self._cache_options is None:
+            return super(QuerySetMixin, self).iterator()
+        return iter(self._get_cached_results(**self._cache_options))
+
+    def select_related(self, *fields, **kwargs):
+        """Return a new QuerySet instance that will select related objects.
+        Sending `None` also prevents the model's `Meta.select_related`
+        from being applied.
+        """
+        clone = super(QuerySetMixin, self).select_related(*fields, **kwargs)
+        if fields == (None,):
+            clone._discard_meta_options('select_related')
+        return clone
+
+    def prefetch_related(self, *lookups):
+        """Return a new QuerySet instance that will prefetch the given
+        related objects. Sending `None` also prevents the model's
+        `Meta.prefetch_related` from being applied.
+        """
+        clone = super(QuerySetMixin, self).prefetch_related(*lookups)
+        if lookups == (None,):
+            clone._discard_meta_options('prefetch_related')
+        return clone
+
+    def defer(self, *fields):
+        """Return a new QuerySet instance that will defer loading the given
+        fields. Sending `None` also prevents the model's `Meta.defer` and
+        `Meta.only` from being applied.
+        """
+        clone = super(QuerySetMixin, self).defer(*fields)
+        if fields == (None,):
+            clone._discard_meta_options('defer', 'only')
+        return clone
+
+    def without_meta_related(self):
+        """Return a new QuerySet instance to which the model's
+        `Meta.select_related` and `Meta.prefetch_related` options
+        are not applied.
+        """
+        clone = self._clone()
+        clone._discard_meta_options('select_related', 'prefetch_related')
+        return clone
+
+    def with_heavy(self):
+        """Return a new QuerySet instance to which the model's `Meta.defer`
+        and `Meta.only` options are not applied, so that every field is
+        loaded.
+        """
+        clone = self._clone()
+        clone._discard_meta_options('defer', 'only')
+        return clone
+
+    def order_by(self, *field_names):
+        """Return a new QuerySet instance with the ordering changed.
+        Members of composite fields (such as `ruler__name`) may be used.
+        """
+        clone = self._select_composite_members(field_names)
+        return super(QuerySetMixin, clone).order_by(*field_names)
+
+    def values(self, *fields):
+        """Return a ValuesQuerySet. Members of composite fields (such as
+        `ruler__name`) may be used.
+        """
+        clone = self._select_composite_members(fields)
+        return super(QuerySetMixin, clone).values(*fields)
+
+    def values_list(self, *fields, **kwargs):
+        """Return a ValuesListQuerySet. Members of composite fields (such as
+        `ruler__name`) may be used.
+        """
+        clone = self._select_composite_members(fields)
+        return super(QuerySetMixin, clone).values_list(*fields, **kwargs)
+
+    def update(self, **kwargs):
+        """Update every object in this QuerySet, and invalidate any cached
+        QuerySets that read from this model's tables.
+        """
+        rows = super(QuerySetMixin, self).update(**kwargs)
+        self._written()
+        return rows
+    update.alters_data = True
+
+    def delete(self):
+        """Delete every object in this QuerySet, and invalidate any cached
+        QuerySets that read from this model's tables, or from those of any
+        objects deleted along with them.
+        """
+        # The objects to be deleted (including those found by Django's
+        # collector, which are deleted along with them) are read from the
+        # primary database, rather than a replica which may be behind, and
+        # without any related objects that the model's `Meta` asks for.
+        with use_primary():
+            super(QuerySetMixin, self.without_meta_related()).delete()
+        self._written(delete=True)
+    delete.alters_data = True
+
+    def estimated_count(self):
+        """Return PostgreSQL's estimate of the number of objects in this
+        QuerySet, which is much faster than `count` for large tables.
+
+        If the QuerySet is not filtered, grouped, or made distinct, this is
+        the number of rows in the table as of its last VACUUM or ANALYZE.
+        Otherwise, it is the planner's estimate of the number of rows that
+        the query returns.
+        """
+        compiler = self.query.get_compiler(using=self.db)
+        cursor = compiler.connection.cursor()
+        query = self.query
+
+        # If we are counting the entire table, then use the table's
+        # statistics, unless it has never been analyzed.
+        if not (query.where or query.group_by or query.distinct or
+                query.low_mark or query.high_mark is not None):
+            cursor.execute('SELECT reltuples FROM pg_class '
+                           'WHERE oid = %s::regclass',
+                           [self.model._meta.db_table])
+            reltuples = cursor.fetchone()[0]
+            if reltuples > 0:
+                return int(reltuples)
+
+        # Otherwise, ask the planner.
+        try:
+            sql, params = compiler.as_sql()
+        except EmptyResultSet:
+            return 0
+        cursor.execute('EXPLAIN (FORMAT JSON) %s' % sql, params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, six.string_types):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def explain(self, analyze=False, buffers=False, format='json'):
+        """Return PostgreSQL's plan for this QuerySet's query, parsed if it
+        is in JSON (the default), and as text otherwise.
+
+        If `analyze` is set, the query is run, and the plan includes its
+        actual timings (and, if `buffers` is set, its buffer usage).
+
+        Return None if the QuerySet can not match any rows (and so is
+        never sent to the database at all).
+        """
+        compiler = self.query.get_compiler(using=self.db)
+        try:
+            sql, params = compiler.as_sql()
+        except EmptyResultSet:
+            return None
+
+        # The plan is retrieved using a plain cursor, rather than one which
+        # (for instance) sends the query as a prepared statement.
+        cursor = unwrap(compiler.connection).cursor()
+        return explain_sql(cursor, sql, params, analyze=analyze,
+                           buffers=buffers, format=format)
+
+    def get_or_create(self, **kwargs):
+        """Look up an object with the given keyword arguments, creating one
+        if necessary. The lookup is never sent to a read replica.
+        """
+        return super(QuerySetMixin, self.primary()).get_or_create(**kwargs)
+
+    def prepared(self):
+        """Return a copy of this QuerySet which is sent to the database as
+        a prepared statement, so that PostgreSQL only plans each shape of
+        query once per connection.
+        """
+        clone = self._clone()
+        clone.query.use_prepared = True
+        return clone
+
+    def primary(self):
+        """Return a copy of this QuerySet which is always sent to the
+        primary database, rather than to a read replica.
+        """
+        clone = self._clone()
+        clone.query.use_primary = True
+        return clone
+
+    def bulk_create(self, objs, batch_size=None):
+        """Insert each of the given objects into the database, in batches
+        of `batch_size` objects (or all at once), and return them.
+
+        Unlike Django's `bulk_create`, the primary key of each object, and
+        any other fields with values generated by the database, are set
+        on the objects, using INSERT ... RETURNING.
+        """
+        self._for_write = True
+        opts = self.model._meta.concrete_model._meta
+        objs = list(objs)
+        if not objs:
+            return objs
+
+        # Sanity check: This can't insert rows into parent tables.
+        if opts.parents:
+            raise ValueError("Can't bulk create an inherited model")
+
+        # Fields whose values are generated by the database are returned,
+        # and set on the objects.
+        fields = list(opts.local_fields)
+        returning = [f for f in fields if has_db_default(f)]
+        batch_size = batch_size or len(objs)
+        with write_transaction(self.db):
+            for i in range(0, len(objs), batch_size):
+                self._insert_returning(objs[i:i + batch_size], fields,
+                                       returning)
+        self._written()
+        return objs
+
+    def bulk_update(self, objs, fields, batch_size=1000):
+        """Update the given fields of each of the given objects, which must
+        already exist in the database, to their values on the object, and
+        return the number of rows updated.
+
+        Objects are sent `batch_size` at a time, in a single
+        UPDATE ... FROM (VALUES ...) statement for each batch. Objects are
+        sent in primary key order, so that concurrent bulk updates lock
+        rows in the same order. Like `bulk_create`, this does not send any
+        signals or call `save`.
+        """
+        self._for_write = True
+        connection = connections[self.db]
+        objs = list(objs)
+        if not objs:
+            return 0
+
+        # Sanity check: Only fields on this model's own table may be
+        # updated, and the primary key is how the rows are found.
+        if isinstance(fields, six.string_types):
+            fields = (fields,)
+        fields = self._get_local_fields(fields)
+        if not fields:
+            raise ValueError('Field names must be given to bulk_update.')
+        if any([f.primary_key for f in fields]):
+            raise ValueError("Can't bulk update the primary key.")
+        if any([o.pk is None for o in objs]):
+            raise ValueError('All objects given to bulk_update must have '
+                             'a primary key set.')
+
+        # Send each batch of objects to the database.
+        objs.sort(key=lambda o: o.pk)
+        cursor = connection.cursor()
+        rows = 0
+        with write_transaction(self.db):
+            for i in range(0, len(objs), batch_size):
+                sql, params = update_sql(connection, self.model, fields,
+                                         objs[i:i + batch_size])
+                cursor.execute(sql, params)
+                rows += cursor.rowcount
+        self._written()
+        return rows
+
+    def bulk_upsert(self, objs, conflict_target, update_fields=None,
+                          batch_size=1000):
+        """Insert each of the given objects into the database. If an object
+        conflicts with an existing row on the `conflict_target` field (or
+        fields), which must be covered by a unique index or constraint,
+        then update that row's `update_fields` instead.
+
+        If `update_fields` is not given, every field other than the
+        conflict target, the primary key, and fields which are only set
+        when an object is created (`auto_now_add` date fields and
+        `auto_add` UUID fields) is updated; if it is empty, conflicting
+        objects are ignored.
+
+        PostgreSQL can not update a row twice in one statement, so if
+        several objects have the same values for the conflict target, only
+        the last of them is sent.
+
+        Objects are sent `batch_size` at a time, in a single statement
+        for each batch. Like `bulk_create`, this does not send any signals
+        or call `save`. Return the list of objects which were sent, with
+        their primary keys set if they were generated by the database
+        (unless conflicting objects are being ignored, or the server is
+        older than PostgreSQL 9.5, in which case they are left unset).
+        """
+        self._for_write = True
+        opts = self.model._meta.concrete_model._meta
+        connection = connections[self.db]
+        objs = list(objs)
+        if not objs:
+            return objs
+
+        # Sanity check: Like `bulk_create`, this can't insert rows into
+        # parent tables.
+        if opts.parents:
+            raise ValueError("Can't bulk upsert a multi-table inherited "
+                             "model.")
+
+        # Determine the conflict target and the fields to be updated.
+        if isinstance(conflict_target, six.string_types):
+            conflict_target = (conflict_target,)
+        conflict_target = self._get_local_fields(conflict_target)
+        fields = list(opts.local_fields)
+        if update_fields is None:
+            update_fields = [f for f in fields if not f.primary_key and
+                             f not in conflict_target and
+                             not getattr(f, 'auto_now_add', False) and
+                             not getattr(f, '_auto_add', False)]
+        else:
+            update_fields = self._get_local_fields(update_fields)
+
+        # Only the last of any objects which conflict with each other
+        # is sent. Objects with a NULL in the conflict target never
+        # conflict.
+        unique = OrderedDict()
+        for i, obj in enumerate(objs):
+            key = tuple([f.get_prep_value(getattr(obj, f.attname))
+                         for f in conflict_target])
+            if None in key:
+                key = i
+            else:
+                try:
+                    hash(key)
+                except TypeError:
+                    key = repr(key)
+            unique.pop(key, None)
+            unique[key] = obj
+        objs = list(unique.values())
+
+        # Objects with an automatically incrementing primary key that has
+        # not been set get it from the database, so it is not sent.
+        batches = [(fields, objs)]
+        if isinstance(opts.pk, models.AutoField):
+            batches = [
+                (fields, [o for o in objs if o.pk is not None]),
+                ([f for f in fields if f is not opts.pk],
+                 [o for o in objs if o.pk is None]),
+            ]
+
+        # Send each batch of objects to the database.
+        with write_transaction(self.db):
+            for fields, objs_ in batches:
+                self._upsert_batches(connection, fields, objs_,
+                    conflict_target, update_fields, batch_size)
+        self._written()
+        return objs
+
+    def upsert(self, conflict_target, update_fields=None, **kwargs):
+        """Create an object with the given keyword arguments, and insert
+        it into the database, updating the existing row instead if it
+        conflicts with one on the `conflict_target` field (or fields).
+
+        See `bulk_upsert` for how conflicts are handled. Return the object.
+        """
+        obj = self.model(**kwargs)
+        self.bulk_upsert([obj], conflict_target, update_fields=update_fields)
+        return obj
+
+    def _written(self, delete=False):
+        """Record that this QuerySet's model has been written to (or, if
+        `delete` is set, deleted from), so that cached QuerySets reading
+        from its tables are invalidated, and reads in this thread are sent
+        to the primary database for a while.
+        """
+        invalidate_model(self.model, using=self.db, delete=delete)
+        record_write(self.db)
+
+    def _apply_meta_options(self):
+        """Apply the model's `Meta.select_related`, `Meta.prefetch_related`,
+        `Meta.defer`, and `Meta.only` options to this QuerySet, in place,
+        if they have not been already.
+
+        Fields which are explicitly loaded using `only` are never deferred
+        by the model's `Meta`.
+        """
+        for option in self._meta_options:
+            value = getattr(self.model._meta, option, ())
+            if isinstance(value, (six.text_type, six.binary_type)):
+                value = (value,)
+            if not value:
+                continue
+            existing, defer = self.query.deferred_loading
+            if option == 'prefetch_related':
+                self._prefetch_related_lookups = list(value) + [
+                    i for i in self._prefetch_related_lookups
+                    if i not in value
+                ]
+            elif option == 'select_related':
+                if self.query.select_related is not True:
+                    self.query.add_select_related(value)
+            elif option == 'defer' and defer:
+                self.query.add_deferred_loading(value)
+            elif option == 'only' and defer and not existing:
+                self.query.add_immediate_loading(value)
+        self._meta_options = ()
+
+    def _discard_meta_options(self, *options):
+        """Prevent the given `Meta` options from being applied to this
+        QuerySet.
+        """
+        self._meta_options = tuple([i for i in self._meta_options
+                                    if i not in options])
+
+    def _get_local_fields(self, field_names):
+        """Return the fields on this QuerySet's model with the given names,
+        which may include `pk`.
+        """
+        opts = self.model._meta
+        return [opts.pk if name == 'pk' else opts.get_field(name)
+                for name in field_names]
+
+    def _get_cached_results(self, ttl=None, key=None):
+        """Return the list of results of this QuerySet, from the cache if
+        they are there, and otherwise from the database (storing them in
+        the cache).
+        """
+        compiler = self.query.get_compiler(using=self.db)
+        try:
+            sql, params = compiler.as_sql()
+        except EmptyResultSet:
+            return []
+
+        # Determine the cache key, which includes the versions of every
+        # table that the query reads from (including any joined tables).
+        tables = [i.table_name for i in compiler.query.alias_map.values()]
+        cache_key = query_cache_key(self.db, sql, params,
+                                    table_versions(tables), key=key)
+
+        # Return the cached results, if there are any.
+        cache = get_query_cache()
+        results = cache.get(cache_key)
+        if results is not None:
+            stats.hits += 1
+            return results
+
+        # Retrieve the results from the database, and cache them.
+        stats.misses += 1
+        results = list(super(QuerySetMixin, self).iterator())
+        if ttl is None:
+            cache.set(cache_key, results)
+        else:
+            cache.set(cache_key, results, ttl)
+        return results
+
+    def _insert_returning(self, objs, fields, returning, raw=False):
+        """Insert the given fields of the given objects in a single
+        statement, and set the `returning` fields on each object to the
+        values that the database returns for it.
+        """
+        connection = connections[self.db]
+        sql, params = insert_sql(connection, self.model, fields, objs,
+                                 returning=returning, raw=raw)
+        cursor = connection.cursor()
+        cursor.execute(sql, params)
+        if not returning:
+            return
+        for obj, row in zip(objs, cursor.fetchall()):
+            for field, value in zip(returning, row):
+                setattr(obj, field.attname, value)
+
+    def _upsert_batches(self, connection, fields, objs, conflict_target,
+                              update_fields, batch_size):
+        """Insert or update the given objects in batches, using
+        INSERT ... ON CONFLICT if the server supports it and a writable
+        CTE otherwise.
+        """
+        pk = self.model._meta.pk
+        cursor = connection.cursor()
+        for i in range(0, len(objs), batch_size):
+            batch = objs[i:i + batch_size]
+
+            # PostgreSQL 9.4 and below do not support ON CONFLICT. The
+            # writable CTE used instead can not tell which row belongs to
+            # which object, so the primary keys are not set.
+            if connection.pg_version < 90500:
+                sql, params = upsert_cte_sql(connection, self.model, fields,
+                                             batch, conflict_target,
+                                             update_fields)
+                cursor.execute(sql, params)
+                continue
+
+            # Send the batch, and if a row came back for each object, then
+            # set the primary keys.
+            sql, params = upsert_sql(connection, self.model, fields, batch,
+                                     conflict_target, update_fields,
+                                     returning=pk)
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            if len(rows) == len(batch):
+                for obj, row in zip(batch, rows):
+                    setattr(obj, pk.attname, pk.to_python(row[0]))
+
+    def cached(self, ttl=None, key=None):
+        """Return a copy of this QuerySet whose results are stored in the
+        cache named by the `DJANGOPG_QUERY_CACHE` setting, for `ttl`
+        seconds (or the cache's default timeout).
+
+        Results are keyed by the compiled SQL and its parameters (or by
+        the explicit `key`), and by the versions of every table that the
+        query reads from. Saving or deleting objects through django_pg
+        models and managers increments those versions, so that stale
+        results are never used.
+        """
+        return self._clone(_cache_options={'ttl': ttl, 'key': key})
+
+    def claim(self, n=1, skip_locked=True, nowait=False, **updates):
+        """Lock up to `n` objects in this QuerySet (in its ordering), set
+        the given field values on them, and return them, in a single
+        statement.
+
+        By default, objects which are already locked by another transaction
+        are skipped, so that many workers may claim objects from the same
+        queue at once without waiting on one another. If `nowait` is set,
+        an error is raised if any object is locked instead.
+
+        If there are no values to set, the objects are only locked, which
+        lasts until the end of the current transaction.
+        """
+        self._for_write = True
+        opts = self.model._meta.concrete_model._meta
+        connection = connections[self.db]
+        if opts.parents:
+            raise ValueError("Can't claim objects of an inherited model.")
+        if not updates and not in_transaction(connection):
+            raise TransactionManagementError('claim without any values to '
+                                             'set must be called within '
+                                             'a transaction.')
+
+        # Compile the query for the primary keys of the objects to claim.
+        qs = self.primary().values_list('pk', flat=True)[:n]
+        try:
+            select, select_params = qs.query.get_compiler(
+                using=self.db,
+            ).as_sql()
+        except EmptyResultSet:
+            return []
+        fields = self._get_local_fields(updates.keys())
+        sql, params = claim_sql(connection, self.model, select, select_params,
+                                list(zip(fields, updates.values())),
+                                nowait=nowait, skip_locked=skip_locked)
+
+        # Claim the objects.
+        with write_transaction(self.db):
+            cursor = connection.cursor()
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        objs = []
+        for row in rows:
+            obj = self.model(*row)
+            obj._state.adding = False
+            obj._state.db = self.db
+            objs.append(obj)
+        if updates:
+            self._written()
+        return objs
+
+    def consume(self, batch_size=100, skip_locked=True, nowait=False,
+                **updates):
+        """Iterate over every object in this QuerySet, claiming them
+        `batch_size` at a time (see `claim`), until there are none left.
+
+        The values set on claimed objects must exclude them from this
+        QuerySet (for instance, by changing a status field that it
+        filters on), so that they are not claimed again.
+        """
+        seen = set()
+        while True:
+            batch = self.claim(batch_size, skip_locked=skip_locked,
+                               nowait=nowait, **updates)
+            # If we claimed an object that we have already seen, then the
+            # QuerySet does not exclude claimed objects; stop rather than
+            # claiming the same objects forever.
+            pks = set([obj.pk for obj in batch])
+            if not batch or pks & seen:
+                return
+            seen |= pks
+            for obj in batch:
+                yield obj
+
+    def with_settings(self, **settings):
+        """Return a copy of this QuerySet which changes the given PostgreSQL
+        settings (such as `work_mem`) while its query runs, and only for
+        that query.
+        """
+        clone = self._clone()
+        clone.query.pg_settings = dict(clone.query.pg_settings or {},
+                                       **settings)
+        return clone
+
+    def copy_to(self, fileobj, format='csv', columns=(), header=None):
+        """Write the results of this QuerySet to the given file-like
+        object (or primed generator, which is sent each chunk of data)
+        using PostgreSQL's COPY, and return the number of rows written.
+
+        The values of each field (or only of the given `columns`) are
+        written in PostgreSQL's own format (`'csv'`, `'text'` or
+        `'binary'`), without creating any model instances. CSV output
+        includes a header row unless `header` is False.
+        """
+        if header is None:
+            header = format == 'csv'
+
+        # If we were given a generator, then send it each chunk.
+        if not hasattr(fileobj, 'write') and hasattr(fileobj, 'send'):
+            fileobj = GeneratorWriter(fileobj)
+
+        # Compile the query for the values that we want. COPY does not
+        # support parameters, so they are interpolated by psycopg2.
+        qs = self.values_list(*columns)
+        connection = connections[qs.db]
+        try:
+            sql, params = qs.query.get_compiler(using=qs.db).as_sql()
+        except EmptyResultSet:
+            return 0
+        cursor = connection.cursor()
+        sql = force_text(cursor.mogrify(sql, params))
+
+        # Composite members are selected using `extra`, which Django always
+        # selects before any fields. Restore the order that was asked for.
+        # The selected columns may share names (such as `id` and
+        # `ruler__id`), so each is given a distinct alias.
+        extra = list(qs.query.extra_select)
+        if extra and len(extra) < len(columns):
+            qn = connection.ops.quote_name
+            names = extra + [getattr(i, 'col', i)[1]  # Django < 1.6: tuples
+                             for i in qs.query.select]
+            positions = iter(range(len(extra), len(names)))
+            sql = 'SELECT %s FROM (%s) AS "copy" (%s)' % (', '.join([
+                '"copy"."column%d" AS %s' % (i, qn(names[i])) for i in [
+                    extra.index(name) if name in extra else next(positions)
+                    for name in columns
+                ]
+            ]), sql, ', '.join(['"column%d"' % i
+                                for i in range(0, len(names))]))
+
+        # Copy the results to the file.
+        cursor.copy_expert(copy_to_sql(sql, format=format, header=header),
+                           fileobj)
+        return cursor.rowcount
+
+    def to_columns(self, *fields, **kwargs):
+        """Return an OrderedDict mapping each of the given field names (or
+        every field name, if none are given) to a container holding that
+        field's values for every object in this QuerySet, in order, without
+        creating any model instances.
+
+        Integers, floats, booleans, dates, and timestamps are returned as
+        NumPy arrays if NumPy is installed (and `use_numpy` is not False),
+        and as `array.array`s otherwise (where dates and timestamps are
+        days and microseconds since the epoch). UUIDs are returned as 16
+        bytes each. JSON is decoded unless `raw_json` is set. Columns which
+        contain NULL (in which dates, timestamps and booleans are Python
+        objects), and all other columns, are returned as lists.
+
+        Rows are fetched `chunk_size` at a time (the default is 2000) using
+        a server-side cursor.
+        """
+        chunk_size = kwargs.pop('chunk_size', 2000)
+        raw_json = kwargs.pop('raw_json', False)
+        use_numpy = kwargs.pop('use_numpy', None)
+        if kwargs:
+            raise TypeError('Unexpected keyword arguments: %s' %
+                            ', '.join(sorted(kwargs)))
+
+        # Determine the fields that we want, and how each is selected.
+        if not fields:
+            fields = [i.name for i in self.model._meta.fields]
+        model_fields = self._get_local_fields(fields)
+        columns = [Column(i, raw_json=raw_json) for i in model_fields]
+        unique = list(OrderedDict.fromkeys(model_fields))
+
+        # Compile the query for the fields' values, to be sent using
+        # a server-side cursor, and have PostgreSQL convert each value.
+        qs = self.values_list(*[i.name for i in unique])
+        qs.query.stream_chunk_size = chunk_size
+        compiler = qs.query.get_compiler(using=qs.db)
+        try:
+            sql, params = compiler.as_sql()
+        except EmptyResultSet:
+            sql = None
+        else:
+            connection = unwrap(compiler.connection)
+            qn = connection.ops.quote_name
+            sql = 'SELECT %s FROM (%s) AS "columns"' % (', '.join([
+                column.expression.format(column=qn(field.column))
+                for column, field in zip(columns, model_fields)
+            ]), sql)
+
+        # Fetch the rows a chunk at a time, adding each chunk to the
+        # columns. If we are not already in a transaction (which the
+        # server-side cursor needs), then open one.
+        if sql:
+            atomic = getattr(transaction, 'atomic', None)  # Django >= 1.6
+            if atomic and not connection.in_atomic_block:
+                with atomic(using=connection.alias):
+                    self._fill_columns(compiler, sql, params, columns)
+            else:
+                self._fill_columns(compiler, sql, params, columns)
+        return OrderedDict([
+            (name, column.finish(use_numpy=use_numpy))
+            for name, column in zip(fields, columns)
+        ])
+
+    def _fill_columns(self, compiler, sql, params, columns):
+        """Run the given SQL using the compiler's (server-side) cursor, and
+        add each chunk of rows to the given columns.
+        """
+        cursor = compiler.connection.cursor()
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                return
+            for column, values in zip(columns, zip(*rows)):
+                column.extend(values)
+
+    def keyset_page(self, after=None, order_by=('pk',), size=100):
+        """Return a KeysetPage of up to `size` objects, ordered by the
+        given fields, which follow the object that the `after` cursor
+        token (from the previous page's `next_cursor`) represents.
+
+        Rather than an OFFSET, the page is found using a row-value
+        comparison on the ordering fields, so that every page is able to
+        use an index on those fields, no matter how deep it is.
+
+        The ordering fields must uniquely identify each object (so the
+        primary key is usually the last of them), must not be null, and
+        must all be sorted in the same direction.
+        """
+        opts = self.model._meta
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+
+        # Determine the fields that we are ordering by, and the direction.
+        descending = set([i.startswith('-') for i in order_by])
+        if len(descending) != 1:
+            raise ValueError('Keyset pagination requires every ordering '
+                             'field to be sorted in the same direction.')
+        descending = descending.pop()
+        fields = self._get_local_fields([i.lstrip('-') for i in order_by])
+
+        # Order the QuerySet, and if we have a cursor, then only retrieve
+        # objects that come after it.
+        qs = self.order_by(*order_by)
+        if after:
+            values = decode_cursor(after)
+            if len(values) != len(fields):
+                raise ValueError('Invalid cursor: %s' % after)
+            qs = qs.extra(
+                where=['(%s) %s (%s)' % (
+                    ', '.join(['%s.%s' % (qn(opts.db_table), qn(i.column))
+                               for i in fields]),
+                    '<' if descending else '>',
+                    ', '.join(['%%s::%s' % cast_type(i, connection)
+                               for i in fields]),
+                )],
+                params=[field.get_db_prep_value(field.to_python(value),
+                                                connection=connection)
+                        for field, value in zip(fields, values)],
+            )
+
+        # Retrieve one more object than we need, to determine whether
+        # there is another page.
+        object_list = list(qs[:size + 1])
+        if len(object_list) <= size:
+            return KeysetPage(object_list)
+        object_list = object_list[:size]
+        return KeysetPage(object_list, next_cursor=encode_cursor(
+            [field.value_to_string(object_list[-1]) for field in fields],
+        ))
+
+    def stream(self, chunk_size=2000):
+        """Iterate over the results of this QuerySet using a server-side
+        cursor, fetching `chunk_size` rows at a time, so that the entire
+        result set is never held in memory at once.
+
+        Server-side cursors only exist within a transaction; if this is
+        not called within one, a transaction is opened for the duration
+        of the iteration, on the read replica that the results are read
+        from (unless the QuerySet is sent to the primary database).
+        """
+        clone = self._clone()
+        clone.query.stream_chunk_size = chunk_size
+
+        # Choose the database to read from now, so that any transaction
+        # is opened on the same one.
+        using = clone.db
+        if not (clone.query.use_primary or clone.query.select_for_update):
+            using = clone.query.read_from = read_alias(clone.db)
+
+        # If we are not already in a transaction, then open one.
+        connection = connections[using]
+        atomic = getattr(transaction, 'atomic', None)  # Django >= 1.6
+        if atomic and not connection.in_atomic_block:
+            with atomic(using=using):
+                for obj in clone._stream_chunks(chunk_size):
+                    yield obj
+            return
+
+        for obj in clone._stream_chunks(chunk_size):
+            yield obj
+
+    def _stream_chunks(self, chunk_size):
+        """Iterate over the results of this QuerySet, performing any
+        `prefetch_related` lookups a chunk at a time.
+        """
+        iterator = self.iterator()
+        if not self._prefetch_related_lookups:
+            for obj in iterator:
+                yield obj
+            return
+
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                return
+            query.prefetch_related_objects(chunk,
+                                           self._prefetch_related_lookups)
+            for obj in chunk:
+                yield obj
+
+    def _select_composite_members(self, field_names):
+        """Return a clone of this QuerySet which selects every composite
+        member referenced in `field_names` (such as `ruler__name`),
+        using the reference itself as the name of the selected value.
+
+        Django is unable to traverse into composite types on its own,
+        so this allows them to be used for ordering or in `values`.
+        """
+        opts = self.model._meta
+        qn = connections[self.db].ops.quote_name
+        select = {}
+        for field_name in field_names:
+            # Strip any ordering direction, and split the name into
+            # its constituent parts.
+            if not isinstance(field_name, six.string_types):
+                continue
+            path = field_name.lstrip('-+').split(LOOKUP_SEP)
+            name = LOOKUP_SEP.join(path)
+
+            # Composite members are always a field name followed by
+            # one or more member names.
+            if len(path) < 2 or name in self.query.extra:
+                continue
+            try:
+                field = opts.get_field(path[0])
+            except FieldDoesNotExist:
+                continue
+            if not isinstance(field, CompositeField):
+                continue
+
+            # Select the member out of the composite column.
+            column = '%s.%s' % (qn(opts.db_table), qn(field.column))
+            select[name] = field.get_member_expression(column, path[1:], qn)
+
+        # If there are no composite members, then this QuerySet is fine
+        # as it is.
+        if not select:
+            return self
+        return self.extra(select=select)
+
+
+# The subclasses of Django's ValuesQuerySet classes which add django_pg's
+# behavior, keyed by the class that each extends.
+_mixin_classes = {}
+
+
+def mixin_class(klass):
+    """Return a subclass of the given ValuesQuerySet class which adds
+    django_pg's behavior to it.
+    """
+    if klass not in _mixin_classes:
+        _mixin_classes[klass] = type(klass.__name__, (QuerySetMixin, klass),
+                                     {})
+    return _mixin_classes[klass]
+
+
+class QuerySet(QuerySetMixin, query.QuerySet):
     """QuerySet subclass that adds support for PostgreSQL
     specific extensions provided by django_pg.
     """
@@ -32,7 +986,7 @@ class QuerySet(query.QuerySet):
 
 
 if gis_backend:
-    class GeoQuerySet(gis_query.GeoQuerySet):
+    class GeoQuerySet(QuerySetMixin, gis_query.GeoQuerySet):
         """GeoQuerySet subclass that adds support for PostgreSQL
         specific extensions provided by django_pg.
         """
@@ -0,0 +1,152 @@
+from __future__ import absolute_import, unicode_literals
+from django.conf import settings
+from django.db import connections
+from django.db.utils import DEFAULT_DB_ALIAS
+import contextlib
+import itertools
+import threading
+import time
+
+
+# The time of the most recent write to each database made by each thread,
+# and whether its reads are currently pinned to the primary database.
+_local = threading.local()
+
+# The counter used to choose replicas in turn.
+_counter = itertools.count()
+
+# The most recently measured replication lag of each replica, and when
+# it was measured.
+_lags = {}
+
+
+def _replica_setting():
+    """Return the `DJANGOPG_READ_REPLICAS` setting, as a dictionary mapping
+    database aliases to lists of the aliases of their read replicas.
+
+    The setting may also be a list of replicas of the default database.
+    """
+    replicas = getattr(settings, 'DJANGOPG_READ_REPLICAS', None) or {}
+    if not isinstance(replicas, dict):
+        replicas = {DEFAULT_DB_ALIAS: replicas}
+    return replicas
+
+
+def get_replicas(using):
+    """Return the aliases of the read replicas of the given database."""
+    return list(_replica_setting().get(using, ()))
+
+
+def primary_aliases():
+    """Return the set of aliases of every database with read replicas."""
+    return set([k for k, v in _replica_setting().items() if v])
+
+
+def replica_aliases():
+    """Return the set of aliases of every read replica."""
+    return set(itertools.chain(*_replica_setting().values()))
+
+
+def record_write(using, when=None):
+    """Record that this thread has written to the given database, so that
+    reads from it are not sent to a replica for a while.
+    """
+    if not hasattr(_local, 'writes'):
+        _local.writes = {}
+    _local.writes[using] = when or time.time()
+
+
+def last_write(using):
+    """Return the time that this thread last wrote to the given database,
+    or None if it has not.
+    """
+    return getattr(_local, 'writes', {}).get(using)
+
+
+def latest_write():
+    """Return the time that this thread last wrote to any database, or
+    None if it has not.
+    """
+    return max(list(getattr(_local, 'writes', {}).values()) or [None])
+
+
+def clear_writes():
+    """Forget every write that this thread has made, so that reads are
+    sent to replicas immediately.
+    """
+    _local.writes = {}
+
+
+@contextlib.contextmanager
+def use_primary():
+    """Send every read made by this thread within the block to the
+    primary database, rather than to a replica.
+    """
+    _local.pinned = getattr(_local, 'pinned', 0) + 1
+    try:
+        yield
+    finally:
+        _local.pinned -= 1
+
+
+def replica_lag(alias):
+    """Return the replication lag of the given replica, in seconds.
+
+    This is measured at most once every `DJANGOPG_REPLICA_LAG_INTERVAL`
+    seconds for each replica.
+    """
+    interval = getattr(settings, 'DJANGOPG_REPLICA_LAG_INTERVAL', 5)
+    measured, lag = _lags.get(alias, (None, None))
+    now = time.time()
+    if measured is None or now - measured >= interval:
+        cursor = connections[alias].cursor()
+        cursor.execute('SELECT EXTRACT(EPOCH FROM '
+                       'now() - pg_last_xact_replay_timestamp())')
+        # A server which is not replaying anything is not behind.
+        lag = float(cursor.fetchone()[0] or 0)
+        _lags[alias] = (now, lag)
+    return lag
+
+
+def select_replica(using):
+    """Return the alias of the replica of the given database which the
+    next read should be sent to, or the database itself if it has
+    no replicas.
+
+    Replicas are chosen in turn, or if the `DJANGOPG_REPLICA_SELECTION`
+    setting is `'least_lag'`, the replica which is least behind is chosen.
+    """
+    replicas = get_replicas(using)
+    if not replicas:
+        return using
+    if getattr(settings, 'DJANGOPG_REPLICA_SELECTION', None) == 'least_lag':
+        return min(replicas, key=replica_lag)
+    return replicas[next(_counter) % len(replicas)]
+
+
+def in_transaction(connection):
+    """Return True if the given connection is within a transaction that
+    the application has opened, False otherwise.
+    """
+    if hasattr(connection, 'in_atomic_block'):
+        return connection.in_atomic_block
+    return connection.is_managed()  # Django < 1.6
+
+
+def read_alias(using):
+    """Return the alias of the database which a read from the given
+    database should be sent to.
+
+    Reads are sent to the database itself (rather than to a replica) within
+    a transaction or a `use_primary` block, or if this thread has written
+    to it within the last `DJANGOPG_READ_YOUR_WRITES` seconds.
+    """
+    if not get_replicas(using) or getattr(_local, 'pinned', 0):
+        return using
+    written = last_write(using)
+    window = getattr(settings, 'DJANGOPG_READ_YOUR_WRITES', 5)
+    if written is not None and time.time() - written < window:
+        return using
+    if in_transaction(connections[using]):
+        return using
+    return select_replica(using)
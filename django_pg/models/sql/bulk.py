@@ -0,0 +1,231 @@
+from __future__ import absolute_import, unicode_literals
+from django.db import models
+from django_pg.utils.types import cast_type
+
+
+# The formats in which PostgreSQL's COPY can write data.
+COPY_FORMATS = ('csv', 'text', 'binary')
+
+
+def has_db_default(field):
+    """Return True if the database generates a value for the given field
+    when none is provided, False otherwise.
+    """
+    return (isinstance(field, models.AutoField) or
+            bool(getattr(field, 'db_default', None)))
+
+
+def values_sql(connection, fields, objs, raw=False, defaults=False):
+    """Return the SQL for a VALUES list containing the given fields of
+    each of the given objects, and the parameters for it.
+
+    Each placeholder is explicitly typecast to the field's database type,
+    so that values which psycopg2 does not send with a type (such as empty
+    arrays, JSON, and composite values) are not ambiguous.
+
+    Unless `raw` is set, each field's `pre_save` is run first, so that
+    (for instance) automatic timestamps and UUIDs are populated.
+
+    If `defaults` is set, then fields with no value whose value the
+    database generates are sent as DEFAULT. This is only valid in the
+    VALUES list of an INSERT statement.
+    """
+    placeholders = ['%%s::%s' % cast_type(f, connection) for f in fields]
+    rows = []
+    params = []
+    for obj in objs:
+        row = []
+        for field, placeholder in zip(fields, placeholders):
+            if raw:
+                value = getattr(obj, field.attname)
+            else:
+                value = field.pre_save(obj, True)
+            if defaults and value is None and has_db_default(field):
+                row.append('DEFAULT')
+                continue
+            row.append(placeholder)
+            params.append(field.get_db_prep_save(value, connection=connection))
+        rows.append('(%s)' % ', '.join(row))
+    return 'VALUES %s' % ', '.join(rows), params
+
+
+def claim_sql(connection, model, select, select_params, updates,
+              nowait=False, skip_locked=False):
+    """Return the SQL to lock the rows of the model's table which the given
+    SELECT statement (which selects their primary keys) returns, set the
+    given `(field, value)` pairs on them, and return every column of those
+    rows, along with the parameters for it.
+
+    If `nowait` is set, an error is raised if any row is already locked. If
+    `skip_locked` is set, rows which are already locked are skipped.
+    """
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    pk = model._meta.pk
+    columns = ', '.join(['%s.%s' % (table, qn(f.column)) for f in
+                         model._meta.concrete_model._meta.local_fields])
+
+    # Lock the selected rows (and only rows of this table).
+    lock = ' FOR UPDATE OF %s' % table
+    if nowait:
+        lock += ' NOWAIT'
+    elif skip_locked:
+        lock += ' SKIP LOCKED'
+    select += lock
+
+    # If there is nothing to update, then the locked rows are simply
+    # returned.
+    if not updates:
+        return 'SELECT %s FROM %s WHERE %s.%s IN (%s)' % (
+            columns, table, table, qn(pk.column), select,
+        ), list(select_params)
+
+    return 'UPDATE %s SET %s WHERE %s.%s IN (%s) RETURNING %s' % (
+        table,
+        ', '.join(['%s = %%s::%s' % (qn(f.column), cast_type(f, connection))
+                   for f, value in updates]),
+        table, qn(pk.column), select,
+        columns,
+    ), [f.get_db_prep_save(value, connection=connection)
+        for f, value in updates] + list(select_params)
+
+
+def copy_to_sql(sql, format='csv', header=False):
+    """Return the SQL to copy the results of the given SELECT statement,
+    which must not contain any parameters, to the client.
+    """
+    if format not in COPY_FORMATS:
+        raise ValueError('The format must be "csv", "text", or "binary".')
+    options = ['FORMAT %s' % format]
+    if header:
+        options.append('HEADER true')
+    return 'COPY (%s) TO STDOUT WITH (%s)' % (sql, ', '.join(options))
+
+
+def insert_sql(connection, model, fields, objs, returning=(), raw=False):
+    """Return the SQL to insert each of the given objects into the model's
+    table, and the parameters for it.
+
+    Fields with no value whose value the database generates (such as
+    automatically incrementing primary keys) are sent as DEFAULT, and
+    the `returning` fields are returned for every row.
+    """
+    qn = connection.ops.quote_name
+    values, params = values_sql(connection, fields, objs, raw=raw,
+                                defaults=True)
+    sql = 'INSERT INTO %s (%s) %s' % (
+        qn(model._meta.db_table),
+        ', '.join([qn(f.column) for f in fields]),
+        values,
+    )
+    if returning:
+        sql += ' RETURNING %s' % ', '.join([qn(f.column) for f in returning])
+    return sql, params
+
+
+def update_sql(connection, model, fields, objs):
+    """Return the SQL to update the given fields of each of the given
+    objects (which must already exist) to their values on the object,
+    and the parameters for it.
+
+    The values for every object are sent in a single VALUES list, which
+    the model's table is joined against using the primary key.
+    """
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    pk = model._meta.pk
+    values, params = values_sql(connection, [pk] + list(fields), objs,
+                                raw=True)
+    sql = 'UPDATE %s SET %s FROM (%s) AS "data" (%s) WHERE %s.%s = "data".%s'
+    return sql % (
+        table,
+        ', '.join(['%s = "data".%s' % (qn(f.column), qn(f.column))
+                   for f in fields]),
+        values,
+        ', '.join([qn(f.column) for f in [pk] + list(fields)]),
+        table, qn(pk.column), qn(pk.column),
+    ), params
+
+
+def upsert_sql(connection, model, fields, objs, conflict_target,
+               update_fields, returning=None):
+    """Return the SQL to insert each of the given objects into the model's
+    table, updating the given fields of (or, if there are none, ignoring)
+    any row which conflicts with it on the `conflict_target` fields, and
+    the parameters for it.
+
+    This uses INSERT ... ON CONFLICT, which requires PostgreSQL 9.5.
+    If `returning` is given, that field is returned for every row
+    inserted or updated.
+    """
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    values, params = values_sql(connection, fields, objs, defaults=True)
+
+    # Build the INSERT statement.
+    sql = 'INSERT INTO %s (%s) %s ON CONFLICT (%s) ' % (
+        table,
+        ', '.join([qn(f.column) for f in fields]),
+        values,
+        ', '.join([qn(f.column) for f in conflict_target]),
+    )
+    if update_fields:
+        sql += 'DO UPDATE SET %s' % ', '.join(
+            ['%s = EXCLUDED.%s' % (qn(f.column), qn(f.column))
+             for f in update_fields],
+        )
+    else:
+        sql += 'DO NOTHING'
+    if returning:
+        sql += ' RETURNING %s' % qn(returning.column)
+    return sql, params
+
+
+def upsert_cte_sql(connection, model, fields, objs, conflict_target,
+                   update_fields):
+    """Return the SQL to insert each of the given objects into the model's
+    table, updating the given fields of (or, if there are none, ignoring)
+    any row which conflicts with it on the `conflict_target` fields, and
+    the parameters for it.
+
+    This uses a writable common table expression, for PostgreSQL servers
+    which do not support INSERT ... ON CONFLICT. Unlike ON CONFLICT, this is
+    not safe against rows being concurrently inserted by another transaction,
+    and nothing is returned.
+    """
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    values, params = values_sql(connection, fields, objs)
+    columns = ', '.join([qn(f.column) for f in fields])
+
+    # DEFAULT is not valid in the VALUES list of a CTE, so the expression
+    # which generates a field's value is used directly for rows that have
+    # no value.
+    selected = ', '.join([
+        'COALESCE("data".%s, %s)' % (qn(f.column), f.db_default)
+        if getattr(f, 'db_default', None) else '"data".%s' % qn(f.column)
+        for f in fields
+    ])
+    matches = ' AND '.join(['%s.%s = "data".%s' % (
+        table, qn(f.column), qn(f.column),
+    ) for f in conflict_target])
+
+    # Build a CTE for the values, and if there are fields to update,
+    # a second one which updates the rows that already exist.
+    sql = 'WITH "data" (%s) AS (%s)' % (columns, values)
+    if update_fields:
+        sql += ', "updated" AS (UPDATE %s SET %s FROM "data" WHERE %s)' % (
+            table,
+            ', '.join(['%s = "data".%s' % (qn(f.column), qn(f.column))
+                       for f in update_fields]),
+            matches,
+        )
+
+    # Insert any rows that do not already exist. Every part of the
+    # statement sees the table as it was before the statement began, so
+    # this excludes exactly the rows that were updated.
+    sql += ' INSERT INTO %s (%s) SELECT %s FROM "data" ' \
+           'WHERE NOT EXISTS (SELECT 1 FROM %s WHERE %s)' % (
+        table, columns, selected, table, matches,
+    )
+    return sql, params
@@ -1,20 +1,85 @@
 from __future__ import absolute_import, unicode_literals
+from django.conf import settings
 from django.db.models.sql import query
+from django_pg.models.routing import read_alias
+from django_pg.utils import budget
+from django_pg.utils.cursors import (BudgetConnection, PreparingConnection,
+                                     SettingsConnection, SlowQueryConnection,
+                                     StreamingConnection)
 from django_pg.utils.gis import gis_backend
 
 if gis_backend:
     from django.contrib.gis.db.models.sql import query as gis_query
     
 
-DJANGO_PG_QUERY_TERMS = { 'len' }
+DJANGO_PG_QUERY_TERMS = { 'adjacent', 'contained_by', 'len', 'overlap' }
 
 
-class Query(query.Query):
+class QueryMixin(object):
+    """Mixin for Query classes, which allows the query to be sent to the
+    database using a different kind of cursor, or to a read replica.
+    """
+    # If set, the query is sent using a server-side cursor, which
+    # fetches this many rows at a time. This is deliberately not
+    # preserved when the query is cloned.
+    stream_chunk_size = None
+
+    # If set, the query is never sent to a read replica.
+    use_primary = False
+
+    # If set, the alias of the database (such as a particular read replica)
+    # which the query is read from, rather than choosing one when it is
+    # compiled. This is deliberately not preserved when the query is cloned.
+    read_from = None
+
+    # If set, the query is sent as a prepared statement.
+    use_prepared = False
+
+    # PostgreSQL settings to change for the duration of the query.
+    pg_settings = None
+
+    # The related object attribute (as `Model.attribute`) whose access
+    # created the query, if any.
+    related_attribute = None
+
+    def clone(self, *args, **kwargs):
+        kwargs.setdefault('related_attribute', self.related_attribute)
+        kwargs.setdefault('use_primary', self.use_primary)
+        kwargs.setdefault('use_prepared', self.use_prepared)
+        kwargs.setdefault('pg_settings', self.pg_settings)
+        return super(QueryMixin, self).clone(*args, **kwargs)
+
+    def get_compiler(self, using=None, connection=None):
+        # Queries using this class only ever read, so unless they lock
+        # rows, they may be sent to a replica of the database.
+        if using and not (connection or self.use_primary or
+                          self.select_for_update):
+            using = self.read_from or read_alias(using)
+        compiler = super(QueryMixin, self).get_compiler(using=using,
+                                                        connection=connection)
+        if self.stream_chunk_size:
+            compiler.connection = StreamingConnection(compiler.connection,
+                                                      self.stream_chunk_size)
+        elif self.use_prepared:
+            compiler.connection = PreparingConnection(compiler.connection)
+        if self.pg_settings:
+            compiler.connection = SettingsConnection(compiler.connection,
+                                                     self.pg_settings)
+        threshold = getattr(settings, 'DJANGOPG_SLOW_QUERY_THRESHOLD', None)
+        if threshold is not None and not self.stream_chunk_size:
+            compiler.connection = SlowQueryConnection(compiler.connection)
+        if budget.active():
+            compiler.connection = BudgetConnection(compiler.connection,
+                                                   self.related_attribute)
+        return compiler
+
+
+class Query(QueryMixin, query.Query):
     query_terms = query.Query.query_terms.union(DJANGO_PG_QUERY_TERMS)
 
 
 if gis_backend:
-    class GeoQuery(gis_query.GeoQuery):
+    class GeoQuery(QueryMixin, gis_query.GeoQuery):
         query_terms = gis_query.GeoQuery.query_terms.union(
             DJANGO_PG_QUERY_TERMS,
         )
@@ -0,0 +1,83 @@
+from __future__ import absolute_import, unicode_literals
+from django.core.paginator import Paginator
+from django.utils.encoding import force_bytes, force_text
+import base64
+import binascii
+import json
+
+
+def encode_cursor(values):
+    """Return an opaque cursor token representing the given list of
+    string values.
+    """
+    token = base64.urlsafe_b64encode(force_bytes(json.dumps(values)))
+    return force_text(token).rstrip('=')
+
+
+def decode_cursor(token):
+    """Return the list of string values represented by the given cursor
+    token, raising ValueError if the token is not valid.
+    """
+    try:
+        token = force_bytes(token)
+        token += b'=' * (-len(token) % 4)
+        values = json.loads(force_text(base64.urlsafe_b64decode(token)))
+    except (binascii.Error, TypeError, ValueError):
+        raise ValueError('Invalid cursor: %s' % token)
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor: %s' % token)
+    return values
+
+
+class KeysetPage(object):
+    """A single page of results from keyset pagination.
+
+    Rather than a page number, each page provides an opaque `next_cursor`
+    token, which is sent back to `QuerySet.keyset_page` to retrieve the
+    following page. If this is the last page, `next_cursor` is None.
+    """
+    def __init__(self, object_list, next_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __repr__(self):
+        return '<KeysetPage: %d objects>' % len(self)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator which, for QuerySets estimated to contain more than
+    `estimate_threshold` objects, uses PostgreSQL's estimate of the number
+    of objects (from `QuerySet.estimated_count`) rather than counting them.
+
+    The number of pages is therefore approximate for large QuerySets.
+    """
+    estimate_threshold = 100000
+
+    def __init__(self, *args, **kwargs):
+        if 'estimate_threshold' in kwargs:
+            self.estimate_threshold = kwargs.pop('estimate_threshold')
+        super(EstimatedCountPaginator, self).__init__(*args, **kwargs)
+
+    def _get_count(self):
+        """Return the estimated number of objects, if it is above the
+        threshold, and the actual number otherwise.
+        """
+        if self._count is None and hasattr(self.object_list,
+                                           'estimated_count'):
+            estimate = self.object_list.estimated_count()
+            if estimate > self.estimate_threshold:
+                self._count = estimate
+        return super(EstimatedCountPaginator, self)._get_count()
+    count = property(_get_count)
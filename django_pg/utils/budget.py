@@ -0,0 +1,183 @@
+from __future__ import absolute_import, unicode_literals
+from collections import OrderedDict
+from django_pg.utils.explain import call_site
+import functools
+import logging
+import sys
+import threading
+
+
+logger = logging.getLogger('django_pg.query_budget')
+
+# The query budgets which are currently open in each thread, innermost last.
+_local = threading.local()
+
+# The module of Django's related object descriptors.
+_related_module = 'django.db.models.fields.related'
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Exception raised when more queries are made within a query budget
+    than it allows.
+    """
+    pass
+
+
+class QueryBudget(object):
+    """Context manager (or decorator) which records each query made by a
+    django_pg QuerySet in this thread within it, and raises or logs if more
+    than `max_queries` queries are made, or if queries of any one shape
+    (that is, the same SQL, regardless of parameters) are repeated more than
+    `max_repeats` times, which is usually the sign of an N+1 problem.
+
+    Only reads are recorded. Writes (such as saving objects, or calling
+    `update` or `delete`) and raw SQL are not.
+
+    If `action` is `'raise'`, `QueryBudgetExceeded` is raised when the
+    block ends; if it is `'log'`, a warning is logged to the
+    `django_pg.query_budget` logger instead.
+    """
+    def __init__(self, max_queries=None, max_repeats=None, action='raise'):
+        if action not in ('log', 'raise'):
+            raise ValueError('The action must be "log" or "raise".')
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+        self.action = action
+        self.queries = []
+
+    def __enter__(self):
+        self.queries = []
+        if not hasattr(_local, 'budgets'):
+            _local.budgets = []
+        _local.budgets.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _local.budgets.remove(self)
+
+        # Never hide an exception raised within the block.
+        if exc_type is None and self.exceeded():
+            if self.action == 'raise':
+                raise QueryBudgetExceeded(self.report())
+            logger.warning(self.report(), extra={'budget': self})
+
+    def __call__(self, function):
+        @functools.wraps(function)
+        def inner(*args, **kwargs):
+            with QueryBudget(self.max_queries, self.max_repeats, self.action):
+                return function(*args, **kwargs)
+        return inner
+
+    def record(self, using, sql, attribute=None):
+        """Record a query made within this budget."""
+        self.queries.append({
+            'attribute': attribute,
+            'call_site': call_site(),
+            'sql': sql,
+            'using': using,
+        })
+
+    def shapes(self):
+        """Return a dictionary mapping the SQL of each query made within
+        this budget to the list of queries of that shape, in the order that
+        each was first made.
+        """
+        answer = OrderedDict()
+        for query in self.queries:
+            answer.setdefault(query['sql'], []).append(query)
+        return answer
+
+    def repeated(self):
+        """Return a dictionary like `shapes`, but only including the shapes
+        of queries made more than `max_repeats` times.
+        """
+        if self.max_repeats is None:
+            return OrderedDict()
+        return OrderedDict([(k, v) for k, v in self.shapes().items()
+                                   if len(v) > self.max_repeats])
+
+    def exceeded(self):
+        """Return True if more queries were made within this budget than
+        it allows, False otherwise.
+        """
+        if self.max_queries is not None:
+            if len(self.queries) > self.max_queries:
+                return True
+        return bool(self.repeated())
+
+    def report(self):
+        """Return a description of the queries made within this budget,
+        and of any which were repeated too often.
+        """
+        lines = ['%d queries were made' % len(self.queries)]
+        if self.max_queries is not None:
+            lines[0] += ' (the budget is %d)' % self.max_queries
+        for sql, queries in self.repeated().items():
+            lines.append('%d queries of the same shape: %s' % (len(queries),
+                                                                sql))
+            attributes = sorted(set([i['attribute'] for i in queries
+                                                    if i['attribute']]))
+            if attributes:
+                lines.append('  loading %s' % ', '.join(attributes))
+            for site in OrderedDict.fromkeys([i['call_site']
+                                              for i in queries]):
+                lines.append('  at %s' % site)
+        return '\n'.join(lines)
+
+
+def active():
+    """Return True if any query budget is open in this thread,
+    False otherwise.
+    """
+    return bool(getattr(_local, 'budgets', None))
+
+
+def clear():
+    """Close every query budget open in this thread, without reporting
+    on any of them.
+    """
+    _local.budgets = []
+
+
+def record_query(using, sql, attribute=None):
+    """Record a query in every query budget open in this thread."""
+    for budget in getattr(_local, 'budgets', ()):
+        budget.record(using, sql, attribute=attribute)
+
+
+def related_attribute(manager):
+    """Return the name (as `Model.attribute`) of the related object
+    attribute whose access is using the given manager to load related
+    objects, or None if it is not being used to do so.
+    """
+    # Managers for the "many" side of a relationship are made for each
+    # instance. Many-to-many managers know which attribute they belong to;
+    # others can find it from the foreign key that they filter on.
+    instance = getattr(manager, 'instance', None)
+    if instance is not None:
+        name = getattr(manager, 'prefetch_cache_name', None)
+        if name is None:
+            field_name = list(manager.core_filters)[0].split('__')[0]
+            field = manager.model._meta.get_field(field_name)
+            name = field.related.get_accessor_name()
+        return '%s.%s' % (type(instance).__name__, name)
+
+    # Single related objects are loaded using the related model's default
+    # manager within the descriptor's `__get__` method.
+    frame = sys._getframe(1)
+    while frame is not None:
+        descriptor = None
+        if frame.f_code.co_name == '__get__':
+            descriptor = frame.f_locals.get('self')
+        if type(descriptor).__module__ == _related_module:
+            instance = frame.f_locals.get('instance')
+            if hasattr(descriptor, 'field'):
+                name = descriptor.field.name
+            elif hasattr(descriptor, 'related'):
+                name = descriptor.related.get_accessor_name()
+            else:
+                name = None
+            if name and instance is not None:
+                return '%s.%s' % (type(instance).__name__, name)
+        frame = frame.f_back
+    return None
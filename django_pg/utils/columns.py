@@ -0,0 +1,141 @@
+from __future__ import absolute_import, unicode_literals
+from array import array
+from datetime import date, datetime, timedelta
+from django.conf import settings
+from django.utils import timezone
+from django_pg.models.fields.json import JSONField
+from django_pg.models.fields.uuid import UUIDField
+import json
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# The array typecode for 64-bit integers, which Python 2 lacks
+# (where `long` is 64 bits on the platforms that matter).
+try:
+    INT64 = array(str('q')).typecode
+except ValueError:  # Python 2
+    INT64 = str('l')
+
+# The internal types of Django's integer fields.
+INTEGER_TYPES = frozenset((
+    'AutoField', 'BigIntegerField', 'IntegerField', 'PositiveIntegerField',
+    'PositiveSmallIntegerField', 'SmallIntegerField',
+))
+
+
+def datetime_from_epoch(microseconds):
+    """Return the datetime the given number of microseconds after the
+    epoch, as Django would return it: aware (in UTC) if `USE_TZ` is set,
+    and naive (in the default time zone) otherwise.
+    """
+    value = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    value += timedelta(microseconds=microseconds)
+    if settings.USE_TZ:
+        return value
+    return timezone.make_naive(value, timezone.get_default_timezone())
+
+
+def date_from_days(days):
+    """Return the date the given number of days after the epoch."""
+    return date(1970, 1, 1) + timedelta(days=days)
+
+
+class Column(object):
+    """The values of a single field, accumulated a chunk at a time.
+
+    Each kind of column is selected using an SQL expression which makes
+    PostgreSQL do any conversion (so timestamps are selected as epoch
+    microseconds, and UUIDs as their 16 bytes), and numeric values are
+    stored in an `array.array`, extended a whole chunk at a time.
+
+    Once a NULL is seen, values are stored in a list instead, and any
+    which PostgreSQL converted (timestamps, dates, and booleans) are
+    converted back to Python objects.
+    """
+    def __init__(self, field, raw_json=False):
+        self.convert = None
+        self.from_array = None
+        self.dtype = None
+        self.typecode = None
+        self.expression = '{column}'
+
+        # Determine how the column is selected and stored. Foreign keys
+        # are stored like the fields that they refer to.
+        while getattr(field, 'rel', None) is not None:
+            field = field.rel.get_related_field()
+        internal_type = field.get_internal_type()
+        if isinstance(field, UUIDField):
+            self.expression = 'uuid_send({column})'
+            self.convert = bytes
+            self.dtype = 'S16'
+        elif isinstance(field, JSONField):
+            self.expression = '{column}::text'
+            if not raw_json:
+                self.convert = json.loads
+        elif internal_type in INTEGER_TYPES:
+            self.typecode = INT64
+            self.dtype = 'int64'
+        elif internal_type == 'FloatField':
+            self.typecode = str('d')
+            self.dtype = 'float64'
+        elif internal_type in ('BooleanField', 'NullBooleanField'):
+            self.typecode = str('b')
+            self.dtype = 'bool'
+            self.from_array = bool
+        elif internal_type == 'DateTimeField':
+            self.expression = ('(EXTRACT(EPOCH FROM {column}) '
+                               '* 1000000)::bigint')
+            self.typecode = INT64
+            self.dtype = 'datetime64[us]'
+            self.from_array = datetime_from_epoch
+        elif internal_type == 'DateField':
+            self.expression = "({column} - DATE '1970-01-01')"
+            self.typecode = INT64
+            self.dtype = 'datetime64[D]'
+            self.from_array = date_from_days
+
+        # Values are accumulated in an array if they are numeric, and in
+        # a list otherwise (or once a NULL has been seen).
+        self.values = array(self.typecode) if self.typecode else []
+
+    def extend(self, values):
+        """Add the given chunk of values (as a tuple) to this column."""
+        # A NULL can not be stored in an array, so once one is seen, the
+        # values are kept in a list instead, as Python objects.
+        if self.dtype is not None and None in values:
+            self.dtype = None
+            if isinstance(self.values, array):
+                self.values = self.values.tolist()
+                if self.from_array:
+                    self.values = [self.from_array(i) for i in self.values]
+        if self.from_array and self.dtype is None:
+            values = [None if i is None else self.from_array(i)
+                      for i in values]
+
+        # Any values which PostgreSQL is unable to convert itself (UUIDs,
+        # which psycopg2 returns as buffers, and JSON) are converted here.
+        if self.convert:
+            values = [None if i is None else self.convert(i) for i in values]
+        self.values.extend(values)
+
+    def finish(self, use_numpy=None):
+        """Return the values of this column, as a NumPy array if NumPy is
+        available (and `use_numpy` is not False), and otherwise as the
+        `array.array` or list that they were accumulated in.
+        """
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        elif use_numpy and numpy is None:
+            raise ImportError('NumPy is not installed.')
+        if not use_numpy or self.dtype is None:
+            return self.values
+        if self.dtype == 'S16' or not self.values:
+            return numpy.array(self.values, dtype=self.dtype)
+        answer = numpy.frombuffer(self.values, dtype=self.values.typecode)
+        if self.dtype == 'bool':
+            return answer.astype(self.dtype)
+        return answer.view(self.dtype)
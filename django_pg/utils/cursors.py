@@ -0,0 +1,382 @@
+from __future__ import absolute_import, unicode_literals
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.postgresql_psycopg2.base import utc_tzinfo_factory
+from django_pg.utils.budget import record_query
+from django_pg.utils.explain import log_slow_query, logger, should_log
+try:
+    from django.db.backends.utils import CursorDebugWrapper, CursorWrapper
+except ImportError:  # Django < 1.7
+    from django.db.backends.util import CursorDebugWrapper, CursorWrapper
+from collections import OrderedDict
+import itertools
+import re
+import six
+import time
+import uuid
+
+
+# The counter used to name prepared statements.
+_statement_counter = itertools.count()
+
+
+class ConnectionProxy(object):
+    """Object which stands in for a Django database connection, passing
+    everything through to it, but which may be subclassed to change the
+    cursors that the connection provides.
+
+    This allows a single compiled query to be sent to the database
+    differently, without needing a different database backend.
+    """
+    def __init__(self, connection):
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            return super(ConnectionProxy, self).__setattr__(name, value)
+        return setattr(self._connection, name, value)
+
+
+def unwrap(connection):
+    """Return the Django database connection which the given connection
+    (or connection proxy) stands in for.
+    """
+    while isinstance(connection, ConnectionProxy):
+        connection = connection._connection
+    return connection
+
+
+class NamedCursorWrapper(CursorWrapper):
+    """Cursor wrapper around a psycopg2 named (server-side) cursor, which
+    fetches rows from the server `chunk_size` at a time, regardless of
+    how many rows Django asks for.
+    """
+    def __init__(self, cursor, db, chunk_size):
+        super(NamedCursorWrapper, self).__init__(cursor, db)
+        self.chunk_size = chunk_size
+        cursor.itersize = chunk_size
+
+    def fetchmany(self, size=None):
+        return self.cursor.fetchmany(self.chunk_size)
+
+
+class NamedCursorDebugWrapper(NamedCursorWrapper, CursorDebugWrapper):
+    """Named cursor wrapper which also logs its queries, as Django's
+    debug cursors do.
+    """
+    pass
+
+
+class StreamingConnection(ConnectionProxy):
+    """Connection proxy whose cursors are server-side cursors, so that
+    rows are held on the server until they are fetched.
+
+    Named cursors only exist for the duration of a transaction, so they
+    must be used within one.
+    """
+    def __init__(self, connection, chunk_size):
+        super(StreamingConnection, self).__init__(connection)
+        self._chunk_size = chunk_size
+
+    def cursor(self):
+        """Return a cursor wrapper around a new named cursor."""
+        # Ensure that the underlying connection is open.
+        if hasattr(self._connection, 'ensure_connection'):
+            self._connection.ensure_connection()
+        else:  # Django < 1.6
+            self._connection.cursor()
+
+        # Create the named cursor, with the same time zone handling that
+        # Django gives its own cursors.
+        name = 'django_pg_%s' % uuid.uuid4().hex
+        cursor = self._connection.connection.cursor(name=str(name))
+        cursor.tzinfo_factory = utc_tzinfo_factory if settings.USE_TZ else None
+
+        # Log the query, as Django would, if debugging (which includes
+        # within `assertNumQueries`).
+        wrapper = NamedCursorWrapper
+        use_debug_cursor = self._connection.use_debug_cursor
+        if use_debug_cursor or (use_debug_cursor is None and settings.DEBUG):
+            wrapper = NamedCursorDebugWrapper
+        return wrapper(cursor, self._connection, self._chunk_size)
+
+
+class PreparedStatements(object):
+    """The statements prepared on a single database connection, keyed by
+    the SQL that they were prepared from.
+
+    At most `size` statements are kept; when another is prepared, the least
+    recently used statement is deallocated.
+    """
+    def __init__(self, raw_connection, size):
+        self.raw_connection = raw_connection
+        self.size = size
+        self.statements = OrderedDict()
+        self.stale = []
+
+    def execute(self, cursor, sql, params=None):
+        """Execute the given SQL (with `%s` placeholders) on the cursor,
+        preparing it first if it has not already been prepared.
+        """
+        name = self.statements.pop(sql, None)
+        if name is None:
+            name = self.prepare(cursor, sql)
+        self.statements[sql] = name
+
+        try:
+            if params:
+                return cursor.execute('EXECUTE %s (%s)' % (
+                    name, ', '.join(['%s'] * len(params)),
+                ), params)
+            return cursor.execute('EXECUTE %s' % name)
+        except Exception:
+            # The statement may no longer be valid (for instance, if the
+            # table it reads from has changed); prepare it again next time.
+            del self.statements[sql]
+            self.stale.append(name)
+            raise
+
+    def prepare(self, cursor, sql):
+        """Prepare the given SQL on the cursor, deallocating any stale or
+        least recently used statements, and return the statement's name.
+        """
+        # A stale statement may not exist at all (if it failed because it
+        # had been deallocated), and DEALLOCATE fails for those, so rather
+        # than deallocating each, start afresh.
+        if self.stale:
+            self.clear(cursor)
+        while self.statements and len(self.statements) >= self.size:
+            name = self.statements.popitem(last=False)[1]
+            cursor.execute('DEALLOCATE %s' % name)
+
+        # Prepared statements use positional parameters (`$1`) rather
+        # than placeholders.
+        counter = itertools.count(1)
+        def placeholder(match):
+            if match.group(0) == '%%':
+                return '%'
+            return '$%d' % next(counter)
+        sql = re.sub(r'%[%s]', placeholder, sql)
+        name = 'django_pg_%d' % next(_statement_counter)
+        cursor.execute('PREPARE %s AS %s' % (name, sql))
+        return name
+
+    def clear(self, cursor):
+        """Deallocate every prepared statement."""
+        # Forget the statements first, so that if DEALLOCATE fails, it is
+        # not attempted again.
+        if self.statements or self.stale:
+            self.statements.clear()
+            self.stale = []
+            cursor.execute('DEALLOCATE ALL')
+
+
+def prepared_statements(connection):
+    """Return the PreparedStatements for the given (open) Django database
+    connection, which holds at most `DJANGOPG_PREPARED_STATEMENTS`.
+    """
+    statements = getattr(connection, '_djangopg_prepared', None)
+    if statements is None or (statements.raw_connection is not
+                              connection.connection):
+        statements = PreparedStatements(connection.connection,
+            size=getattr(settings, 'DJANGOPG_PREPARED_STATEMENTS', 100),
+        )
+        connection._djangopg_prepared = statements
+    return statements
+
+
+def deallocate_prepared(connection):
+    """Deallocate every statement prepared on the given Django database
+    connection, if it is open.
+    """
+    statements = getattr(connection, '_djangopg_prepared', None)
+    if statements and statements.raw_connection is connection.connection:
+        statements.clear(connection.cursor())
+
+
+class PreparedCursor(object):
+    """Cursor which prepares each statement it is asked to execute the
+    first time it sees it on its connection, and executes the prepared
+    statement after that.
+    """
+    def __init__(self, cursor, statements):
+        self._cursor = cursor
+        self._statements = statements
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, params=None):
+        return self._statements.execute(self._cursor, sql, params)
+
+
+class PreparingConnection(ConnectionProxy):
+    """Connection proxy whose cursors execute prepared statements, so that
+    each query is only planned once per connection.
+    """
+    def cursor(self):
+        cursor = self._connection.cursor()
+        return PreparedCursor(cursor, prepared_statements(self._connection))
+
+
+class SettingsCursor(object):
+    """Cursor which changes the given PostgreSQL settings for each statement
+    it executes, and only for that statement.
+    """
+    def __init__(self, cursor, connection, settings):
+        self._cursor = cursor
+        self._connection = connection
+        self._settings = settings
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, params=None):
+        # Settings changed with `set_config` (or SET LOCAL) only last until
+        # the end of the transaction, so if we are not in one, open one.
+        atomic = getattr(transaction, 'atomic', None)  # Django >= 1.6
+        if atomic and not self._connection.in_atomic_block:
+            with atomic(using=self._connection.alias):
+                return self._execute(sql, params, restore=False)
+        return self._execute(sql, params, restore=True)
+
+    def _execute(self, sql, params, restore):
+        """Execute the given SQL with the settings changed, restoring their
+        previous values afterward if `restore` is set.
+        """
+        names = sorted(self._settings)
+        values = [setting_value(self._settings[i]) for i in names]
+
+        # Retrieve the current value of each setting, and change it. This
+        # uses a separate cursor, so that it does not disturb the results.
+        cursor = self._connection.cursor()
+        cursor.execute('SELECT %s' % ', '.join(
+            ['current_setting(%s)'] * len(names) +
+            ['set_config(%s, %s, true)'] * len(names)
+        ), names + list(itertools.chain(*zip(names, values))))
+        previous = list(cursor.fetchone()[:len(names)])
+
+        # Execute the statement, and then restore the settings. If the
+        # statement fails, the transaction (or savepoint) is rolled back,
+        # which restores them.
+        #
+        # Executing a server-side cursor only declares it, and its rows are
+        # fetched afterward, so its settings must remain until the
+        # transaction ends.
+        answer = self._cursor.execute(sql, params)
+        if restore and getattr(self._cursor, 'name', None) is None:
+            cursor.execute('SELECT %s' % ', '.join(
+                ['set_config(%s, %s, true)'] * len(names)
+            ), list(itertools.chain(*zip(names, previous))))
+        return answer
+
+
+class SettingsConnection(ConnectionProxy):
+    """Connection proxy whose cursors change the given PostgreSQL
+    settings for each statement they execute.
+    """
+    def __init__(self, connection, settings):
+        super(SettingsConnection, self).__init__(connection)
+        self._settings = settings
+
+    def cursor(self):
+        return SettingsCursor(self._connection.cursor(),
+                              unwrap(self._connection), self._settings)
+
+
+def setting_value(value):
+    """Return the given Python value as the value of a PostgreSQL
+    setting.
+    """
+    if isinstance(value, bool):
+        return 'on' if value else 'off'
+    return six.text_type(value)
+
+
+class SlowQueryCursor(object):
+    """Cursor which times each statement that it executes, and logs the
+    plan of slow statements.
+    """
+    def __init__(self, cursor, connection):
+        self._cursor = cursor
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, params=None):
+        start = time.time()
+        answer = self._cursor.execute(sql, params)
+        duration = (time.time() - start) * 1000
+        if should_log(duration):
+            self._log_slow_query(sql, params, duration)
+        return answer
+
+    def _log_slow_query(self, sql, params, duration):
+        """Log the plan of the given slow statement. If that fails, the
+        failure is logged rather than raised, and (within a transaction)
+        rolled back, so that the statement itself is unaffected.
+        """
+        connection = self._connection
+        atomic = getattr(transaction, 'atomic', None)  # Django >= 1.6
+        try:
+            if atomic and connection.in_atomic_block:
+                with atomic(using=connection.alias):
+                    log_slow_query(connection.cursor(), sql, params,
+                                   duration)
+            else:
+                log_slow_query(connection.cursor(), sql, params, duration)
+        except Exception:
+            logger.exception('Unable to log the plan of a slow query.')
+
+
+class SlowQueryConnection(ConnectionProxy):
+    """Connection proxy whose cursors log the plans of slow statements."""
+    def cursor(self):
+        return SlowQueryCursor(self._connection.cursor(),
+                               unwrap(self._connection))
+
+
+class BudgetCursor(object):
+    """Cursor which records each statement that it executes in the query
+    budgets open in this thread.
+    """
+    def __init__(self, cursor, using, attribute):
+        self._cursor = cursor
+        self._using = using
+        self._attribute = attribute
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, params=None):
+        record_query(self._using, sql, attribute=self._attribute)
+        return self._cursor.execute(sql, params)
+
+
+class BudgetConnection(ConnectionProxy):
+    """Connection proxy whose cursors record each statement in the query
+    budgets open in this thread.
+    """
+    def __init__(self, connection, attribute=None):
+        super(BudgetConnection, self).__init__(connection)
+        self._attribute = attribute
+
+    def cursor(self):
+        return BudgetCursor(self._connection.cursor(), self.alias,
+                            self._attribute)
@@ -0,0 +1,106 @@
+from __future__ import absolute_import, unicode_literals
+from collections import deque
+from django.conf import settings
+from django.utils.encoding import force_text
+import django
+import json
+import logging
+import os
+import random
+import six
+import threading
+import time
+import traceback
+
+
+logger = logging.getLogger('django_pg.slow_queries')
+
+# The formats in which PostgreSQL can return query plans.
+EXPLAIN_FORMATS = ('json', 'text', 'xml', 'yaml')
+
+# The times at which recent slow query plans were logged, so that no more
+# than `DJANGOPG_SLOW_QUERY_LIMIT` are logged each minute.
+_logged = deque()
+_logged_lock = threading.Lock()
+
+# The directories of Django and django_pg, whose frames are never reported
+# as the call site of a query.
+_internal_dirs = (
+    os.path.dirname(os.path.abspath(django.__file__)) + os.sep,
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep,
+)
+
+
+def explain_sql(cursor, sql, params, analyze=False, buffers=False,
+                format='json'):
+    """Return PostgreSQL's plan for the given SQL. JSON plans are parsed;
+    plans in any other format are returned as text.
+
+    If `analyze` is set, the query is run, and the plan includes its actual
+    timings (and, if `buffers` is set, its buffer usage).
+    """
+    format = format.lower()
+    if format not in EXPLAIN_FORMATS:
+        raise ValueError('The format must be "json", "text", "xml", '
+                         'or "yaml".')
+    options = ['FORMAT %s' % format.upper()]
+    if analyze:
+        options.insert(0, 'ANALYZE true')
+        if buffers:
+            options.insert(1, 'BUFFERS true')
+    cursor.execute('EXPLAIN (%s) %s' % (', '.join(options), sql), params)
+    rows = [row[0] for row in cursor.fetchall()]
+    if format != 'json':
+        return '\n'.join(rows)
+    if isinstance(rows[0], six.string_types):
+        return json.loads(rows[0])
+    return rows[0]
+
+
+def call_site():
+    """Return the file name, line number, and function of the innermost
+    frame on the stack outside of Django and django_pg, as a string.
+    """
+    for filename, lineno, function, _ in reversed(traceback.extract_stack()):
+        if not os.path.abspath(filename).startswith(_internal_dirs):
+            return '%s:%d in %s' % (filename, lineno, function)
+    return 'unknown'
+
+
+def should_log(duration):
+    """Return True if a query that took the given number of milliseconds
+    should have its plan logged, False otherwise.
+
+    Only queries slower than `DJANGOPG_SLOW_QUERY_THRESHOLD` are logged,
+    of which only the `DJANGOPG_SLOW_QUERY_SAMPLE_RATE` fraction are, and
+    no more than `DJANGOPG_SLOW_QUERY_LIMIT` each minute.
+    """
+    threshold = getattr(settings, 'DJANGOPG_SLOW_QUERY_THRESHOLD', None)
+    if threshold is None or duration < threshold:
+        return False
+    rate = getattr(settings, 'DJANGOPG_SLOW_QUERY_SAMPLE_RATE', 1.0)
+    if rate < 1.0 and random.random() >= rate:
+        return False
+
+    # Forget plans logged more than a minute ago, and see whether there
+    # is room for another.
+    limit = getattr(settings, 'DJANGOPG_SLOW_QUERY_LIMIT', 10)
+    now = time.time()
+    with _logged_lock:
+        while _logged and _logged[0] <= now - 60:
+            _logged.popleft()
+        if len(_logged) >= limit:
+            return False
+        _logged.append(now)
+    return True
+
+
+def log_slow_query(cursor, sql, params, duration):
+    """Log the plan of the given query, which took the given number of
+    milliseconds, along with its SQL and where it was run from.
+    """
+    plan = explain_sql(cursor, sql, params)
+    logger.warning('Slow query (%.1f ms) at %s: %s\n%s', duration,
+                   call_site(), force_text(cursor.mogrify(sql, params)),
+                   json.dumps(plan, indent=2),
+                   extra={'duration': duration, 'plan': plan})
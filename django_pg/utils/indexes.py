@@ -0,0 +1,122 @@
+from __future__ import absolute_import, unicode_literals
+from django.core.management.color import no_style
+try:
+    from django.db.backends.utils import truncate_name
+except ImportError:  # Django < 1.7
+    from django.db.backends.util import truncate_name
+
+
+SELECT_INDEX_SQL = """
+    SELECT c.relname
+      FROM pg_catalog.pg_class c
+     WHERE c.relkind = 'i'
+       AND c.relname = %s
+       AND pg_catalog.pg_table_is_visible(c.oid)
+"""
+
+
+SELECT_CONSTRAINT_SQL = """
+    SELECT c.conname
+      FROM pg_catalog.pg_constraint c
+      JOIN pg_catalog.pg_class t ON t.oid = c.conrelid
+     WHERE c.conname = %s
+       AND pg_catalog.pg_table_is_visible(t.oid)
+"""
+
+
+def constraint_exists(connection, constraint_name):
+    """Return True if the given PostgreSQL constraint exists,
+    False otherwise.
+    """
+    cursor = connection.cursor()
+    cursor.execute(SELECT_CONSTRAINT_SQL, [constraint_name])
+    return bool(cursor.fetchall())
+
+
+def index_exists(connection, index_name):
+    """Return True if the given PostgreSQL index exists, False otherwise."""
+    cursor = connection.cursor()
+    cursor.execute(SELECT_INDEX_SQL, [index_name])
+    return bool(cursor.fetchall())
+
+
+def index_name(connection, table, *parts):
+    """Return an appropriate name for an index on the given table,
+    built out of the given parts and truncated to the maximum length
+    PostgreSQL allows.
+    """
+    name = '_'.join((table,) + parts)
+    return truncate_name(name, connection.ops.max_name_length())
+
+
+def create_index_sql(connection, table, name, expressions, method=None,
+                     options=None, style=no_style(),
+                     only_if_not_exists=False):
+    """Return the appropriate SQL to create an index with the given name
+    on the given table, covering the given SQL expressions.
+
+    Expressions are used verbatim, and are responsible for their own
+    quoting. If a dictionary of `options` is given, they are sent as the
+    index's storage parameters.
+    """
+    # If the index already exists and we were asked to only create
+    # new indexes, then there is nothing to do.
+    if only_if_not_exists and index_exists(connection, name):
+        return ''
+
+    # Construct the CREATE INDEX statement.
+    qn = connection.ops.quote_name
+    sql = []
+    sql.append(style.SQL_KEYWORD('CREATE INDEX '))
+    sql.append(style.SQL_TABLE(qn(name)))
+    sql.append(style.SQL_KEYWORD(' ON '))
+    sql.append(style.SQL_TABLE(qn(table)))
+    if method:
+        sql.append(style.SQL_KEYWORD(' USING %s' % method))
+    sql.append(' (%s)' % ', '.join(['(%s)' % i for i in expressions]))
+    if options:
+        sql.append(style.SQL_KEYWORD(' WITH'))
+        sql.append(' (%s)' % ', '.join(
+            ['%s = %s' % (k, v) for k, v in sorted(options.items())],
+        ))
+    return ''.join(sql) + '\n;'
+
+
+def exclusion_constraint_sql(connection, table, name, elements,
+                             method='gist', style=no_style(),
+                             only_if_not_exists=False):
+    """Return the appropriate SQL to add an exclusion constraint with
+    the given name to the given table.
+
+    The elements are a sequence of two-tuples of SQL expressions and
+    the operators which may not return true for any two rows.
+    """
+    # If the constraint already exists and we were asked to only create
+    # new constraints, then there is nothing to do.
+    if only_if_not_exists and constraint_exists(connection, name):
+        return ''
+
+    # Construct the ALTER TABLE statement.
+    qn = connection.ops.quote_name
+    sql = []
+    sql.append(style.SQL_KEYWORD('ALTER TABLE '))
+    sql.append(style.SQL_TABLE(qn(table)))
+    sql.append(style.SQL_KEYWORD(' ADD CONSTRAINT '))
+    sql.append(style.SQL_TABLE(qn(name)))
+    sql.append(style.SQL_KEYWORD(' EXCLUDE USING %s' % method))
+    sql.append(' (%s)' % ', '.join(
+        ['%s %s %s' % (expression, style.SQL_KEYWORD('WITH'), operator)
+         for expression, operator in elements],
+    ))
+    return ''.join(sql) + '\n;'
+
+
+def execute_sql(connection, sql):
+    """Execute each of the semicolon-separated statements in the
+    given SQL.
+    """
+    cursor = connection.cursor()
+    for sql_stmt in sql.split(';'):
+        if not sql_stmt.strip():
+            continue
+        cursor.execute(sql_stmt)
@@ -0,0 +1,325 @@
+from __future__ import absolute_import, unicode_literals
+from datetime import date, datetime, timedelta
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.color import no_style
+from django.db import models
+from django.utils import timezone
+import re
+
+
+# The intervals which range partitions may cover.
+PARTITION_INTERVALS = ('day', 'week', 'month', 'year')
+
+
+SELECT_PARTITIONS_SQL = """
+    SELECT c.relname
+      FROM pg_catalog.pg_inherits i
+      JOIN pg_catalog.pg_class c ON c.oid = i.inhrelid
+      JOIN pg_catalog.pg_class p ON p.oid = i.inhparent
+     WHERE p.relname = %s
+       AND pg_catalog.pg_table_is_visible(p.oid)
+"""
+
+
+SELECT_TABLES_SQL = """
+    SELECT c.relname
+      FROM pg_catalog.pg_class c
+     WHERE c.relkind IN ('r', 'p')
+       AND pg_catalog.pg_table_is_visible(c.oid)
+"""
+
+
+class PartitionSpec(object):
+    """Object representing how a model's table is partitioned, as declared
+    using the `partition_by` option on the model's `Meta` inner class.
+
+    Range partitioning (`('range', 'created')`) partitions on a date or
+    timestamp field, with one partition per `partition_interval`, and keeps
+    `partitions_ahead` partitions ahead of the current one. If
+    `partitions_retained` is set, partitions more than that many intervals
+    in the past may be detached (or dropped).
+
+    Hash partitioning (`('hash', 'id')`) partitions on any field, across a
+    fixed number (`partition_count`) of partitions.
+
+    If `partition_default` is set, range partitioned tables also get a
+    default partition, which holds any rows that no other partition does.
+    """
+    def __init__(self, model):
+        opts = model._meta
+        self.model = model
+        self.table = opts.db_table
+
+        # Sanity check: Is the partitioning declaration usable?
+        try:
+            self.method, field_name = opts.partition_by
+        except (TypeError, ValueError):
+            raise ImproperlyConfigured('partition_by must be a two-tuple of '
+                                       'the method and the field name.')
+        if self.method not in ('hash', 'range'):
+            raise ImproperlyConfigured('Unrecognized partitioning method: %s'
+                                       % self.method)
+        self.field = opts.get_field(field_name)
+
+        # Range partitioning is only supported on date and timestamp fields,
+        # with one partition per interval.
+        self.interval = getattr(opts, 'partition_interval', 'month')
+        self.ahead = getattr(opts, 'partitions_ahead', 3)
+        self.retained = getattr(opts, 'partitions_retained', None)
+        if self.method == 'range':
+            if not isinstance(self.field, models.DateField):
+                raise ImproperlyConfigured('Range partitioning requires a '
+                                           'date or timestamp field.')
+            if self.interval not in PARTITION_INTERVALS:
+                raise ImproperlyConfigured('Unrecognized partition interval: '
+                                           '%s' % self.interval)
+
+        # Hash partitioning requires a number of partitions, and can not
+        # have a default partition.
+        self.count = getattr(opts, 'partition_count', 8)
+        self.default = getattr(opts, 'partition_default', False)
+        if self.default and self.method != 'range':
+            raise ImproperlyConfigured('Only range partitioned tables may '
+                                       'have a default partition.')
+
+        # PostgreSQL requires every unique constraint on a partitioned table
+        # to include the partition key. The primary key is expanded to do
+        # so, but other unique constraints are not, since that would weaken
+        # what they guarantee.
+        for field in opts.local_fields:
+            if field.unique and not field.primary_key and \
+                    field is not self.field:
+                raise ImproperlyConfigured('The unique field %s does not '
+                    'include the partition key; declare it with '
+                    'unique=False, or in a unique_together with %s.' %
+                    (field.name, self.field.name))
+        for field_names in opts.unique_together:
+            if self.field.name not in field_names:
+                raise ImproperlyConfigured('unique_together %r does not '
+                    'include the partition key (%s).' %
+                    (tuple(field_names), self.field.name))
+
+    def check_server(self, connection):
+        """Raise ImproperlyConfigured if the PostgreSQL server on the
+        given connection does not support this partitioning.
+        """
+        if connection.pg_version < 100000:
+            raise ImproperlyConfigured('Declarative partitioning requires '
+                                       'PostgreSQL 10 or higher.')
+        if connection.pg_version < 110000:
+            if self.method == 'hash':
+                raise ImproperlyConfigured('Hash partitioning requires '
+                                           'PostgreSQL 11 or higher.')
+            if self.default:
+                raise ImproperlyConfigured('Default partitions require '
+                                           'PostgreSQL 11 or higher.')
+
+    def partition_name(self, suffix, connection):
+        """Return the name of the partition with the given suffix, which is
+        the remainder for hash partitions and the date on which the
+        partition begins for range partitions.
+        """
+        if isinstance(suffix, date):
+            suffix = suffix.strftime('%Y%m%d')
+        suffix = '_p%s' % suffix
+        max_length = connection.ops.max_name_length()
+        return self.table[:max_length - len(suffix)] + suffix
+
+    def partition_start(self, name, connection):
+        """Return the date on which the range partition with the given name
+        begins, or None if the name is not one of ours.
+        """
+        prefix = self.partition_name('', connection)
+        match = re.match(r'^%s(\d{8})$' % re.escape(prefix), name)
+        if not match:
+            return None
+        return datetime.strptime(match.group(1), '%Y%m%d').date()
+
+    def period_start(self, value):
+        """Return the date on which the period containing the given
+        date begins.
+        """
+        if self.interval == 'week':
+            return value - timedelta(days=value.weekday())
+        if self.interval == 'month':
+            return value.replace(day=1)
+        if self.interval == 'year':
+            return value.replace(month=1, day=1)
+        return value
+
+    def shift_period(self, start, periods):
+        """Return the date on which the period the given number of periods
+        after (or, if negative, before) the given period begins.
+        """
+        if self.interval == 'day':
+            return start + timedelta(days=periods)
+        if self.interval == 'week':
+            return start + timedelta(days=periods * 7)
+        if self.interval == 'month':
+            months = start.year * 12 + start.month - 1 + periods
+            return date(months // 12, months % 12 + 1, 1)
+        return date(start.year + periods, 1, 1)
+
+    def bound(self, value):
+        """Return the SQL literal for the given date as a partition bound,
+        which is midnight UTC for timestamp fields.
+        """
+        if isinstance(self.field, models.DateTimeField):
+            value = datetime(value.year, value.month, value.day,
+                             tzinfo=timezone.utc)
+        return "'%s'" % value.isoformat()
+
+    def current_period(self, now=None):
+        """Return the date on which the current period begins."""
+        now = now or timezone.now()
+        if isinstance(now, datetime):
+            if timezone.is_aware(now):
+                now = now.astimezone(timezone.utc)
+            now = now.date()
+        return self.period_start(now)
+
+
+def partitioned_table_sql(sql, model, connection, style=no_style()):
+    """Return the given CREATE TABLE statement for the given model,
+    modified to create a partitioned table as declared in the model's
+    `Meta`.
+
+    PostgreSQL requires that the primary key of a partitioned table
+    include the partition key, so the primary key is moved into a
+    constraint covering both if necessary.
+    """
+    spec = PartitionSpec(model)
+    spec.check_server(connection)
+    qn = connection.ops.quote_name
+    pk = model._meta.pk
+
+    # Find the closing parenthesis of the column definitions.
+    index = sql.rindex(')')
+    columns, remainder = sql[:index].rstrip(), sql[index + 1:]
+
+    # If the partition key is not the primary key, then the primary key
+    # must be expanded to cover it.
+    if spec.field.column != pk.column:
+        columns = columns.replace(' %s' % style.SQL_KEYWORD('PRIMARY KEY'),
+                                  '', 1)
+        columns += ',\n    %s (%s, %s)' % (
+            style.SQL_KEYWORD('PRIMARY KEY'),
+            style.SQL_FIELD(qn(pk.column)),
+            style.SQL_FIELD(qn(spec.field.column)),
+        )
+
+    # Add the partitioning clause.
+    return '%s\n) %s (%s)%s' % (
+        columns,
+        style.SQL_KEYWORD('PARTITION BY %s' % spec.method.upper()),
+        style.SQL_FIELD(qn(spec.field.column)),
+        remainder,
+    )
+
+
+def table_names(connection):
+    """Return a list of the names of the tables visible on the given
+    connection, including partitioned tables (which Django's own
+    introspection does not list).
+    """
+    cursor = connection.cursor()
+    cursor.execute(SELECT_TABLES_SQL)
+    return sorted([row[0] for row in cursor.fetchall()])
+
+
+def list_partitions(connection, table):
+    """Return a list of the names of the partitions attached to
+    the given table.
+    """
+    cursor = connection.cursor()
+    cursor.execute(SELECT_PARTITIONS_SQL, [table])
+    return sorted([row[0] for row in cursor.fetchall()])
+
+
+def create_partitions_sql(model, connection, now=None, style=no_style()):
+    """Return a list of the SQL statements to create every partition
+    that the given model's table should have, if they do not
+    already exist.
+
+    For range partitions, this is the partition for the current period and
+    those for the `partitions_ahead` periods after it, as well as the
+    default partition if the model asks for one.
+    """
+    spec = PartitionSpec(model)
+    spec.check_server(connection)
+    qn = connection.ops.quote_name
+    answer = []
+
+    # Determine the partitions and the values each one holds.
+    partitions = []
+    if spec.method == 'hash':
+        for remainder in range(0, spec.count):
+            partitions.append((remainder, 'WITH (MODULUS %d, REMAINDER %d)' %
+                                          (spec.count, remainder)))
+    else:
+        start = spec.current_period(now)
+        for i in range(0, spec.ahead + 1):
+            lower = spec.shift_period(start, i)
+            upper = spec.shift_period(start, i + 1)
+            partitions.append((lower, 'FROM (%s) TO (%s)' % (
+                spec.bound(lower),
+                spec.bound(upper),
+            )))
+
+        # Rows outside of every range go to the default partition.
+        if spec.default:
+            partitions.append(('default', None))
+
+    # Build the CREATE TABLE statement for each partition.
+    for suffix, values in partitions:
+        if values is None:
+            bounds = style.SQL_KEYWORD(' DEFAULT')
+        else:
+            bounds = style.SQL_KEYWORD(' FOR VALUES ') + values
+        answer.append(''.join((
+            style.SQL_KEYWORD('CREATE TABLE IF NOT EXISTS '),
+            style.SQL_TABLE(qn(spec.partition_name(suffix, connection))),
+            style.SQL_KEYWORD(' PARTITION OF '),
+            style.SQL_TABLE(qn(spec.table)),
+            bounds,
+            '\n;',
+        )))
+    return answer
+
+
+def expired_partitions(model, connection, now=None):
+    """Return a list of the names of the range partitions attached to the
+    given model's table which only hold values from more than
+    `partitions_retained` periods ago.
+    """
+    spec = PartitionSpec(model)
+    if spec.method != 'range' or spec.retained is None:
+        return []
+
+    # Any partition which ends on or before the start of the oldest
+    # retained period has expired.
+    cutoff = spec.shift_period(spec.current_period(now), -spec.retained)
+    answer = []
+    for name in list_partitions(connection, spec.table):
+        start = spec.partition_start(name, connection)
+        if start and spec.shift_period(start, 1) <= cutoff:
+            answer.append(name)
+    return answer
+
+
+def remove_partition_sql(model, name, connection, drop=False,
+                         style=no_style()):
+    """Return the SQL to detach the given partition from the given model's
+    table or, if `drop` is set, to drop it altogether.
+    """
+    qn = connection.ops.quote_name
+    if drop:
+        return '%s%s\n;' % (style.SQL_KEYWORD('DROP TABLE '),
+                            style.SQL_TABLE(qn(name)))
+    return ''.join((
+        style.SQL_KEYWORD('ALTER TABLE '),
+        style.SQL_TABLE(qn(model._meta.db_table)),
+        style.SQL_KEYWORD(' DETACH PARTITION '),
+        style.SQL_TABLE(qn(name)),
+        '\n;',
+    ))
@@ -0,0 +1,123 @@
+from __future__ import absolute_import, unicode_literals
+from datetime import date, datetime
+from psycopg2.extensions import (DATE, DATETIME, new_array_type, new_type,
+                                 register_type)
+from psycopg2.tz import FixedOffsetTimezone
+
+try:
+    from ciso8601 import parse_datetime_as_naive
+except ImportError:
+    parse_datetime_as_naive = None
+
+
+# The OIDs of the PostgreSQL types that these typecasters handle, and
+# the OIDs of arrays of those types.
+DATE_OIDS = ((1082,), (1182,))
+TIMESTAMP_OIDS = ((1114,), (1115,))
+TIMESTAMPTZ_OIDS = ((1184,), (1185,))
+
+
+# The tzinfo objects for each UTC offset (in minutes) that has been
+# seen, keyed by the tzinfo factory used to create them.
+_tzinfo_cache = {}
+
+
+def _get_tzinfo(offset, cursor):
+    """Return the tzinfo object for the given UTC offset (in minutes),
+    as created by the cursor's tzinfo factory, creating it only if it has
+    not been seen before.
+    """
+    factory = cursor.tzinfo_factory or FixedOffsetTimezone
+    try:
+        return _tzinfo_cache[(factory, offset)]
+    except KeyError:
+        tzinfo = _tzinfo_cache[(factory, offset)] = factory(offset)
+        return tzinfo
+
+
+def _parse_naive(value):
+    """Parse a PostgreSQL timestamp (without a time zone) in the ISO
+    format PostgreSQL sends (`YYYY-MM-DD HH:MM:SS[.ffffff]`).
+
+    Raise ValueError (or IndexError) for anything else, such as years
+    beyond 9999, BC dates, and infinities.
+    """
+    if len(value) > 19:
+        if value[19] != '.':
+            raise ValueError('Unrecognized timestamp: %s' % value)
+        microsecond = int(value[20:26].ljust(6, '0'))
+    else:
+        microsecond = 0
+    return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                    int(value[11:13]), int(value[14:16]), int(value[17:19]),
+                    microsecond)
+
+# If ciso8601 is installed, it is faster still.
+if parse_datetime_as_naive:
+    _parse_naive = parse_datetime_as_naive
+
+
+def cast_date(value, cursor):
+    """Return a Python date from a PostgreSQL date."""
+    if value is None:
+        return None
+    try:
+        if len(value) != 10:
+            raise ValueError('Unrecognized date: %s' % value)
+        return date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+    except ValueError:
+        return DATE(value, cursor)
+
+
+def cast_timestamp(value, cursor):
+    """Return a naive Python datetime from a PostgreSQL timestamp."""
+    if value is None:
+        return None
+    try:
+        return _parse_naive(value)
+    except (IndexError, ValueError):
+        return DATETIME(value, cursor)
+
+
+def cast_timestamptz(value, cursor):
+    """Return an aware Python datetime from a PostgreSQL timestamp with
+    time zone, which PostgreSQL sends in the ISO format, followed by the
+    UTC offset (`+HH`, `+HH:MM`, or `+HH:MM:SS`).
+    """
+    if value is None:
+        return None
+    try:
+        # Split the timestamp from its UTC offset.
+        index = max(value.rfind('+'), value.rfind('-'))
+        if index < 19:
+            raise ValueError('Unrecognized timestamp: %s' % value)
+        offset = value[index + 1:]
+
+        # Offsets with seconds can not be represented by psycopg2's
+        # tzinfo objects; let psycopg2 decide what to do with them.
+        if len(offset) > 5:
+            raise ValueError('Unrecognized offset: %s' % offset)
+        minutes = int(offset[0:2]) * 60 + int(offset[3:5] or 0)
+        if value[index] == '-':
+            minutes = -minutes
+
+        # Parse the timestamp, and attach the time zone.
+        answer = _parse_naive(value[:index])
+        return answer.replace(tzinfo=_get_tzinfo(minutes, cursor))
+    except (IndexError, ValueError):
+        return DATETIME(value, cursor)
+
+
+def register_typecasters(conn_or_curs):
+    """Register the fast typecasters for dates and timestamps (and arrays
+    of them) on the given psycopg2 connection or cursor.
+    """
+    for oids, name, caster in (
+            (DATE_OIDS, 'DATE', cast_date),
+            (TIMESTAMP_OIDS, 'TIMESTAMP', cast_timestamp),
+            (TIMESTAMPTZ_OIDS, 'TIMESTAMPTZ', cast_timestamptz)):
+        type_ = new_type(oids[0], str('DJANGOPG_%s' % name), caster)
+        array_type = new_array_type(oids[1], str('DJANGOPG_%sARRAY' % name),
+                                    type_)
+        register_type(type_, conn_or_curs)
+        register_type(array_type, conn_or_curs)
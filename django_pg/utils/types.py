@@ -1,4 +1,5 @@
 from __future__ import absolute_import, unicode_literals
+from django.db import models
 
 
 # Taken from the following StackOverflow answer:
@@ -36,3 +37,15 @@ def type_exists(connection, type_name):
     """Return True if the given PostgreSQL type exists, False otherwise."""
     type_name = type_name.lower()
     return type_name in get_type_names(connection)
+
+
+def cast_type(field, connection):
+    """Return the PostgreSQL type to which values for the given field
+    should be typecast.
+
+    This is the field's database type, except for automatically
+    incrementing fields, whose `serial` type is not a real type.
+    """
+    if isinstance(field, models.AutoField):
+        return models.IntegerField().db_type(connection)
+    return field.db_type(connection)
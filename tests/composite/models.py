@@ -5,7 +5,7 @@ from tests.composite import fields
 
 class Monarchy(models.Model):
     name = models.CharField(max_length=100)
-    ruler = fields.MonarchField()
+    ruler = fields.MonarchField(db_index_members=('name',))
 
 
 class Author(models.Model):
@@ -21,3 +21,8 @@ class Author(models.Model):
 class Character(models.Model):
     name = models.CharField(max_length=50)
     items = models.ArrayField(of=fields.ItemField)
+
+
+class Heirloom(models.Model):
+    owner = models.CharField(max_length=50)
+    item = fields.ItemField(db_index_members=('acquired_in__pages',))
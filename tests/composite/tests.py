@@ -1,13 +1,17 @@
 from __future__ import absolute_import, unicode_literals
 from collections import namedtuple
 from datetime import date
+from django.core.exceptions import FieldError
 from django.db import connection
 from django.test import TestCase
 from django.test.utils import override_settings
+from django.utils.unittest import skipIf
 from django_pg import models
 from django_pg.models.fields.composite import CompositeField
 from tests.composite.fields import Monarch, Book, Item
-from tests.composite.models import Monarchy, Author, Character
+from tests.composite.models import Monarchy, Author, Character, Heirloom
+import django
+import pickle
 
 
 class CompositeTestCase(TestCase):
@@ -119,6 +123,105 @@ class CompositeTestCase(TestCase):
                 authors = models.ManyToManyField(Author)
 
 
+class CompositeMemberTestCase(TestCase):
+    """Test suite for lookups, ordering, and projection on individual
+    members of composite fields.
+    """
+    def setUp(self):
+        Monarchy.objects.create(
+            name='Gondor',
+            ruler=Monarch(title='King', name='Elessar', suffix=2),
+        )
+        Monarchy.objects.create(
+            name='Rohan',
+            ruler=('King', 'Theoden', 2),
+        )
+        Monarchy.objects.create(
+            name='Lothlorien',
+            ruler=("H'Elf", 'Celeborn', 1),
+        )
+        Heirloom.objects.create(
+            owner='Bilbo Baggins',
+            item=Item(name='The One Ring', acquired_in=('The Hobbit', 600)),
+        )
+        Heirloom.objects.create(
+            owner='Frodo Baggins',
+            item=Item(name='Sting', acquired_in=('The Fellowship', 400)),
+        )
+
+    @skipIf(django.VERSION < (1, 7), 'Member lookups require Django 1.7.')
+    def test_member_lookup(self):
+        """Test that a lookup on a single member of a composite field
+        works as expected.
+        """
+        monarchy = Monarchy.objects.get(ruler__name='Theoden')
+        self.assertEqual(monarchy.name, 'Rohan')
+
+    @skipIf(django.VERSION < (1, 7), 'Member lookups require Django 1.7.')
+    def test_member_lookup_type(self):
+        """Test that a lookup on a single member of a composite field
+        uses the lookup types of the member field.
+        """
+        monarchies = Monarchy.objects.filter(ruler__suffix__gte=2)
+        self.assertEqual(monarchies.count(), 2)
+
+    @skipIf(django.VERSION < (1, 7), 'Member lookups require Django 1.7.')
+    def test_nested_member_lookup(self):
+        """Test that a lookup on a member of a nested composite field
+        works as expected.
+        """
+        heirloom = Heirloom.objects.get(item__acquired_in__pages__gt=500)
+        self.assertEqual(heirloom.owner, 'Bilbo Baggins')
+
+    def test_member_ordering(self):
+        """Test that ordering by a member of a composite field works
+        as expected.
+        """
+        names = [i.name for i in Monarchy.objects.order_by('ruler__name')]
+        self.assertEqual(names, ['Lothlorien', 'Gondor', 'Rohan'])
+        names = [i.name for i in Monarchy.objects.order_by('-ruler__name')]
+        self.assertEqual(names, ['Rohan', 'Gondor', 'Lothlorien'])
+
+    def test_member_values(self):
+        """Test that members of composite fields may be used
+        in `values` and `values_list`.
+        """
+        values = Monarchy.objects.filter(name='Gondor').values('ruler__name')
+        self.assertEqual(list(values), [{'ruler__name': 'Elessar'}])
+        values = Heirloom.objects.order_by('owner').values_list(
+            'item__acquired_in__pages',
+            flat=True,
+        )
+        self.assertEqual(list(values), [600, 400])
+
+    def test_invalid_member(self):
+        """Test that ordering by something that is not a member of the
+        composite field raises FieldError.
+        """
+        with self.assertRaises(FieldError):
+            Monarchy.objects.order_by('ruler__realm')
+
+    def test_member_index_sql(self):
+        """Test that expression indexes are created for members listed
+        in `db_index_members`.
+        """
+        field = Monarchy._meta.get_field('ruler')
+        sql = field.create_index_sql(connection)
+        self.assertIn('CREATE INDEX', sql)
+        self.assertIn('(("composite_monarchy"."ruler")."name")', sql)
+
+    def test_nested_member_index_sql(self):
+        """Test that expression indexes are created for nested members
+        listed in `db_index_members`.
+        """
+        field = Heirloom._meta.get_field('item')
+        sql = field.create_index_sql(connection)
+        self.assertIn(
+            '((("composite_heirloom"."item")."acquired_in")."pages")',
+            sql,
+        )
+
+
 class ArrayCompositeTestCase(TestCase):
     def setUp(self):
         """Create multiple authors."""
@@ -283,6 +386,60 @@ class SupportSuite(TestCase):
         monarch_tuple = monarch_tuple_type('King', 'Elessar', 2)
         self.assertEqual(repr(monarch), repr(monarch_tuple))
 
+    def test_composite_instance_slots(self):
+        """Test that composite instances store their values in slots,
+        and therefore reject attributes that are not fields.
+        """
+        monarch = Monarch(title='King', name='Elessar', suffix=2)
+        self.assertFalse(hasattr(monarch, '__dict__'))
+        with self.assertRaises(AttributeError):
+            monarch.realm = 'Gondor'
+
+    def test_composite_instance_make(self):
+        """Test that the positional fast constructor used when reading
+        values from the database creates the expected instance.
+        """
+        monarch = Monarch._make(('King', 'Elessar', 2))
+        self.assertEqual(tuple(monarch), ('King', 'Elessar', 2))
+        self.assertEqual(monarch.name, 'Elessar')
+
+    def test_composite_instance_pickle(self):
+        """Test that composite instances survive a round trip
+        through pickle.
+        """
+        monarch = Monarch(title='King', name='Elessar', suffix=2)
+        unpickled = pickle.loads(pickle.dumps(monarch))
+        self.assertEqual(tuple(unpickled), ('King', 'Elessar', 2))
+
+    def test_converter_coerces_instance(self):
+        """Test that converting a composite instance coerces its members,
+        and that an assignment to a member causes it to be coerced again.
+        """
+        field = Monarchy._meta.get_field('ruler')
+        monarch = field.to_python(Monarch('King', 'Elessar', '2'))
+        self.assertEqual(monarch.suffix, 2)
+        monarch.suffix = '3'
+        self.assertEqual(field.to_python(monarch).suffix, 3)
+
+    def test_converter_nested(self):
+        """Test that nested composite values are converted by the nested
+        field's converter.
+        """
+        field = Character._meta.get_field('items')
+        items = field.to_python([('Sting', {'title': 'The Hobbit',
+                                            'pages': '600'})])
+        self.assertIsInstance(items[0].acquired_in, Book)
+        self.assertEqual(items[0].acquired_in.pages, 600)
+
+    def test_caster_instances_coerced(self):
+        """Test that instances read out of the database are marked as
+        already coerced, so they are not coerced again on assignment.
+        """
+        Monarchy.objects.create(name='Gondor', ruler=('King', 'Elessar', 2))
+        monarchy = Monarchy.objects.get(name='Gondor')
+        self.assertTrue(monarchy.ruler._coerced)
+        self.assertEqual(monarchy.ruler.suffix, 2)
+
     def test_create_type_dummy(self):
         class FakeConnection(object):
             vendor = 'dummy'
@@ -1 +1,8 @@
-# Intentionally empty; we just need tests.py to run.
+from __future__ import absolute_import, unicode_literals
+from django_pg import models
+
+
+class LogEntry(models.Model):
+    message = models.TextField()
+    logged = models.DateTimeField(db_index_method='brin',
+                                  db_index_options={'pages_per_range': 32})
@@ -1,8 +1,14 @@
 from __future__ import absolute_import, unicode_literals
 from datetime import datetime
-from django.db import models
+from django.db import connection, models
+from django.test import TestCase
 from django.test.utils import override_settings
-from django_pg.models import DateTimeField
+from django.utils.unittest import skipIf
+from django_pg.models import DateTimeField, UUIDField
+from django_pg.utils.indexes import index_exists
+from django_pg.utils.south import south_installed
+from tests.datetimes.models import LogEntry
+import django
 import mock
 import pytz
 import unittest
@@ -63,3 +69,63 @@ class DateTimeFieldTests(unittest.TestCase):
             # and we don't have to be opinionated on whether the second call
             # happens or not.
             self.assertEqual(tp.mock_calls[0], mock.call(1335024000))
+
+
+class DateTimeIndexTests(TestCase):
+    """Establish that our DateTimeField class may be indexed using
+    BRIN indexes.
+    """
+    def test_brin_index_sql(self):
+        """Establish that the BRIN index is sent with its
+        `pages_per_range` storage parameter.
+        """
+        field = LogEntry._meta.get_field('logged')
+        self.assertEqual(
+            field.create_index_sql(connection),
+            'CREATE INDEX "datetimes_logentry_logged_brin" ON '
+            '"datetimes_logentry" USING brin (("logged")) '
+            'WITH (pages_per_range = 32)\n;',
+        )
+
+    def test_brin_index_created(self):
+        """Establish that the BRIN index is created in place of the
+        btree index that Django would otherwise create.
+        """
+        field = LogEntry._meta.get_field('logged')
+        self.assertFalse(field.db_index)
+        self.assertTrue(index_exists(connection,
+                                     'datetimes_logentry_logged_brin'))
+
+    def test_btree_index(self):
+        """Establish that by default, indexes are left to Django."""
+        dtf = DateTimeField(db_index=True)
+        self.assertEqual(dtf.db_index_method, 'btree')
+        self.assertTrue(dtf.db_index)
+        self.assertEqual(dtf.create_index_sql(connection), '')
+
+    @skipIf(django.VERSION < (1, 7), 'Django 1.7+ only')
+    def test_deconstruct(self):
+        """Establish that BRIN indexes are preserved in migrations, and
+        that default indexes are recorded only as `db_index`.
+        """
+        kwargs = LogEntry._meta.get_field('logged').deconstruct()[3]
+        self.assertEqual(kwargs['db_index_method'], 'brin')
+        self.assertEqual(kwargs['db_index_options'], {'pages_per_range': 32})
+        kwargs = DateTimeField(db_index=True).deconstruct()[3]
+        self.assertTrue(kwargs['db_index'])
+        self.assertNotIn('db_index_method', kwargs)
+        kwargs = UUIDField(db_index_method='brin').deconstruct()[3]
+        self.assertEqual(kwargs['db_index_method'], 'brin')
+
+    @skipIf(not south_installed, 'South is not installed.')
+    def test_south_introspection(self):
+        """Establish that South preserves BRIN indexes, and records
+        default indexes only as `db_index`.
+        """
+        from south.modelsinspector import introspector
+        kwargs = introspector(LogEntry._meta.get_field('logged'))[1]
+        self.assertEqual(kwargs['db_index_method'], repr('brin'))
+        self.assertEqual(kwargs['db_index_options'],
+                         repr({'pages_per_range': 32}))
+        kwargs = introspector(DateTimeField(db_index=True))[1]
+        self.assertNotIn('db_index_method', kwargs)
@@ -5,6 +5,8 @@ from django.test import TestCase
 from django_pg.models.fields.json import JSONField
 from tests.jsont.models import Song
 import math
+import mock
+import pickle
 
 
 class JSONSuite(TestCase):
@@ -190,6 +192,24 @@ class JSONSuite(TestCase):
         self.assertIsInstance(song.sample_lines, list)
         self.assertEqual(song.sample_lines, [])
 
+    def test_lazy_conversion(self):
+        """Establish that values loaded from the database are converted
+        when they are first accessed, rather than when the object is
+        instantiated, and survive pickling either way.
+        """
+        with mock.patch.object(JSONField, 'to_python',
+                               side_effect=JSONField.to_python,
+                               autospec=True) as to_python:
+            song = Song.objects.get(title='Song of the Lonely Mountain')
+            self.assertEqual(to_python.call_count, 0)
+            self.assertEqual(song.data['verses'], 10)
+            self.assertEqual(song.data['sung_by'], 'Dwarves')
+            self.assertEqual(to_python.call_count, 1)
+        song = pickle.loads(pickle.dumps(song))
+        self.assertEqual(song.data, {'sung_by': 'Dwarves', 'verses': 10})
+        self.assertEqual(len(song.sample_lines), 4)
+        self.assertEqual(song.stuff, None)
+
 class SupportSuite(TestCase):
     """Suite for testing more rarely-accessed aspects of JSON fields."""
 
@@ -0,0 +1,22 @@
+from __future__ import absolute_import, unicode_literals
+from django_pg import models
+
+
+class Event(models.Model):
+    name = models.CharField(max_length=50)
+    created = models.DateTimeField()
+
+    class Meta:
+        partition_by = ('range', 'created')
+        partition_interval = 'month'
+        partitions_ahead = 2
+        partitions_retained = 6
+
+
+class Token(models.Model):
+    id = models.UUIDField(auto_add=True, primary_key=True)
+    owner = models.CharField(max_length=50)
+
+    class Meta:
+        partition_by = ('hash', 'id')
+        partition_count = 4
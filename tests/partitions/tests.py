@@ -0,0 +1,223 @@
+from __future__ import absolute_import, unicode_literals
+from datetime import date, datetime, timedelta
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from django_pg.utils.indexes import execute_sql
+from django_pg.utils.partitions import (create_partitions_sql,
+                                        expired_partitions, list_partitions,
+                                        partitioned_table_sql, PartitionSpec,
+                                        table_names)
+from tests.partitions.models import Event, Token
+import mock
+
+
+class PartitionSpecSuite(TestCase):
+    """Test suite for interpreting the partitioning declared on a model."""
+
+    def test_periods(self):
+        """Establish that periods begin and shift as expected for
+        each interval.
+        """
+        spec = PartitionSpec(Event)
+        self.assertEqual(spec.period_start(date(2014, 6, 18)),
+                         date(2014, 6, 1))
+        self.assertEqual(spec.shift_period(date(2014, 11, 1), 3),
+                         date(2015, 2, 1))
+        self.assertEqual(spec.shift_period(date(2014, 2, 1), -3),
+                         date(2013, 11, 1))
+        spec.interval = 'week'
+        self.assertEqual(spec.period_start(date(2014, 6, 18)),
+                         date(2014, 6, 16))
+
+    def test_partition_names(self):
+        """Establish that partition names are built from the table name,
+        and that range partitions can be identified by name.
+        """
+        spec = PartitionSpec(Event)
+        name = spec.partition_name(date(2014, 6, 1), connection)
+        self.assertEqual(name, 'partitions_event_p20140601')
+        self.assertEqual(spec.partition_start(name, connection),
+                         date(2014, 6, 1))
+        self.assertEqual(spec.partition_start('partitions_event_old',
+                                              connection), None)
+
+    def test_invalid_method(self):
+        """Establish that unrecognized partitioning methods are rejected."""
+        with mock.patch.object(Event._meta, 'partition_by',
+                               ('list', 'created')):
+            with self.assertRaises(ImproperlyConfigured):
+                PartitionSpec(Event)
+
+    def test_hash_default_partition(self):
+        """Establish that hash partitioned tables may not have a
+        default partition.
+        """
+        with mock.patch.object(Token._meta, 'partition_default', True,
+                               create=True):
+            with self.assertRaises(ImproperlyConfigured):
+                PartitionSpec(Token)
+
+    def test_range_requires_date(self):
+        """Establish that range partitioning on fields other than dates
+        and timestamps is rejected.
+        """
+        with mock.patch.object(Event._meta, 'partition_by',
+                               ('range', 'name')):
+            with self.assertRaises(ImproperlyConfigured):
+                PartitionSpec(Event)
+
+    def test_unique_field(self):
+        """Establish that unique fields which do not include the partition
+        key are rejected.
+        """
+        with mock.patch.object(Event._meta.get_field('name'), '_unique',
+                               True):
+            with self.assertRaises(ImproperlyConfigured):
+                PartitionSpec(Event)
+
+    def test_unique_together(self):
+        """Establish that unique_together is only accepted if it includes
+        the partition key.
+        """
+        with mock.patch.object(Event._meta, 'unique_together',
+                               (('name', 'created'),)):
+            PartitionSpec(Event)
+        with mock.patch.object(Event._meta, 'unique_together',
+                               (('id', 'name'),)):
+            with self.assertRaises(ImproperlyConfigured):
+                PartitionSpec(Event)
+
+    def test_server_version(self):
+        """Establish that partitioning the server does not support
+        is rejected.
+        """
+        spec = PartitionSpec(Event)
+        with mock.patch.object(connection, 'pg_version', 90200):
+            with self.assertRaises(ImproperlyConfigured):
+                spec.check_server(connection)
+        with mock.patch.object(connection, 'pg_version', 100000):
+            spec.check_server(connection)
+            with self.assertRaises(ImproperlyConfigured):
+                PartitionSpec(Token).check_server(connection)
+            with mock.patch.object(Event._meta, 'partition_default', True,
+                                   create=True):
+                with self.assertRaises(ImproperlyConfigured):
+                    PartitionSpec(Event).check_server(connection)
+
+
+class PartitionSQLSuite(TestCase):
+    """Test suite for the SQL used to create partitioned tables
+    and their partitions.
+    """
+    def test_range_table_sql(self):
+        """Establish that the primary key of a range partitioned table
+        is expanded to include the partition key.
+        """
+        sql = partitioned_table_sql('CREATE TABLE "partitions_event" (\n'
+            '    "id" serial NOT NULL PRIMARY KEY,\n'
+            '    "created" timestamp with time zone NOT NULL\n'
+            ')\n;', Event, connection)
+        self.assertEqual(sql, 'CREATE TABLE "partitions_event" (\n'
+            '    "id" serial NOT NULL,\n'
+            '    "created" timestamp with time zone NOT NULL,\n'
+            '    PRIMARY KEY ("id", "created")\n'
+            ') PARTITION BY RANGE ("created")\n;')
+
+    def test_hash_table_sql(self):
+        """Establish that the primary key of a table partitioned on its
+        primary key is left alone.
+        """
+        sql = partitioned_table_sql('CREATE TABLE "partitions_token" (\n'
+            '    "id" uuid NOT NULL PRIMARY KEY\n'
+            ')\n;', Token, connection)
+        self.assertEqual(sql, 'CREATE TABLE "partitions_token" (\n'
+            '    "id" uuid NOT NULL PRIMARY KEY\n'
+            ') PARTITION BY HASH ("id")\n;')
+
+    def test_range_partitions_sql(self):
+        """Establish that range partitions are created for the current
+        period and those ahead of it.
+        """
+        now = datetime(2014, 6, 18, 12, tzinfo=timezone.utc)
+        sql = create_partitions_sql(Event, connection, now=now)
+        self.assertEqual(len(sql), 3)
+        self.assertEqual(sql[0], 'CREATE TABLE IF NOT EXISTS '
+            '"partitions_event_p20140601" PARTITION OF "partitions_event" '
+            "FOR VALUES FROM ('2014-06-01T00:00:00+00:00') "
+            "TO ('2014-07-01T00:00:00+00:00')\n;")
+        self.assertIn('"partitions_event_p20140801"', sql[2])
+
+    def test_default_partition_sql(self):
+        """Establish that a default partition is created for range
+        partitioned tables which ask for one.
+        """
+        now = datetime(2014, 6, 18, 12, tzinfo=timezone.utc)
+        with mock.patch.object(Event._meta, 'partition_default', True,
+                               create=True):
+            sql = create_partitions_sql(Event, connection, now=now)
+        self.assertEqual(len(sql), 4)
+        self.assertEqual(sql[3], 'CREATE TABLE IF NOT EXISTS '
+            '"partitions_event_pdefault" PARTITION OF "partitions_event" '
+            'DEFAULT\n;')
+
+    def test_hash_partitions_sql(self):
+        """Establish that every hash partition is created."""
+        sql = create_partitions_sql(Token, connection)
+        self.assertEqual(len(sql), 4)
+        self.assertEqual(sql[3], 'CREATE TABLE IF NOT EXISTS '
+            '"partitions_token_p3" PARTITION OF "partitions_token" '
+            'FOR VALUES WITH (MODULUS 4, REMAINDER 3)\n;')
+
+
+class PartitionedModelSuite(TestCase):
+    """Test suite for using partitioned models."""
+
+    def test_partitions_created(self):
+        """Establish that partitions are created along with the table."""
+        self.assertEqual(len(list_partitions(connection, 'partitions_token')),
+                         4)
+        spec = PartitionSpec(Event)
+        self.assertIn(spec.partition_name(spec.current_period(), connection),
+                      list_partitions(connection, 'partitions_event'))
+
+    def test_table_names(self):
+        """Establish that partitioned tables are listed among the tables
+        (unlike by Django's own introspection), along with their
+        partitions.
+        """
+        tables = table_names(connection)
+        self.assertIn('partitions_event', tables)
+        self.assertIn('partitions_token', tables)
+        self.assertIn('partitions_token_p0', tables)
+
+    def test_round_trip(self):
+        """Establish that rows are inserted and queried through the
+        partitioned table.
+        """
+        Event.objects.create(name='Coronation', created=timezone.now())
+        token = Token.objects.create(owner='Aragorn')
+        self.assertEqual(Event.objects.get().name, 'Coronation')
+        self.assertEqual(Token.objects.get(id=token.id).owner, 'Aragorn')
+
+    def test_expired_partitions(self):
+        """Establish that old partitions are detached by the
+        management command.
+        """
+        # Create a partition for a period well in the past.
+        spec = PartitionSpec(Event)
+        old = timezone.now() - timedelta(days=730)
+        for sql in create_partitions_sql(Event, connection, now=old)[0:1]:
+            execute_sql(connection, sql)
+        name = spec.partition_name(spec.current_period(old), connection)
+        self.assertIn(name, list_partitions(connection, 'partitions_event'))
+        self.assertEqual(expired_partitions(Event, connection), [name])
+
+        # Run the management command, and establish that the partition
+        # is detached.
+        call_command('pgpartitions', 'partitions', verbosity=0)
+        self.assertNotIn(name, list_partitions(connection,
+                                               'partitions_event'))
+        self.assertEqual(expired_partitions(Event, connection), [])
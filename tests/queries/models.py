@@ -0,0 +1,85 @@
+from __future__ import absolute_import, unicode_literals
+from django.test.utils import override_settings
+from django_pg import models
+from tests.composite.fields import MonarchField
+
+
+class Adventurer(models.Model):
+    name = models.CharField(max_length=50)
+    level = models.PositiveIntegerField()
+    skills = models.ArrayField(of=models.CharField(max_length=20))
+    data = models.JSONField(type=dict)
+
+
+class Quest(models.Model):
+    adventurer = models.ForeignKey(Adventurer)
+    title = models.CharField(max_length=100)
+
+    class Meta:
+        select_related = 'adventurer'
+
+
+class Party(models.Model):
+    name = models.CharField(max_length=50)
+    members = models.ManyToManyField(Adventurer)
+
+
+with override_settings(DJANGOPG_DEFAULT_UUID_PK=True):
+    class Scroll(models.Model):
+        title = models.CharField(max_length=100)
+        written = models.DateTimeField()
+
+
+class Relic(models.Model):
+    code = models.CharField(max_length=20, unique=True)
+    serial = models.UUIDField(auto_add=True)
+    keywords = models.ArrayField(of=models.CharField(max_length=20))
+    data = models.JSONField(type=dict)
+    keeper = MonarchField()
+
+
+class Heirloom(Relic):
+    class Meta:
+        proxy = True
+
+
+with override_settings(DJANGOPG_DEFAULT_UUID_PK='gen_random_uuid()'):
+    class Ent(models.Model):
+        name = models.CharField(max_length=50)
+
+
+class Huorn(Ent):
+    class Meta:
+        proxy = True
+
+
+class Job(models.Model):
+    name = models.CharField(max_length=50)
+    priority = models.IntegerField()
+    status = models.CharField(max_length=20, default='pending')
+    worker = models.CharField(max_length=20, null=True)
+    claimed = models.DateTimeField(null=True)
+    due = models.DateField(null=True)
+    urgent = models.NullBooleanField()
+
+
+class Errand(Job):
+    class Meta:
+        proxy = True
+
+
+class Chronicle(models.Model):
+    title = models.CharField(max_length=100)
+    payload = models.JSONField(type=dict)
+    history = models.ArrayField(of=models.CharField(max_length=50))
+
+    class Meta:
+        defer = ('payload', 'history')
+
+
+class Ledger(models.Model):
+    title = models.CharField(max_length=100)
+    entries = models.ArrayField(of=models.IntegerField())
+
+    class Meta:
+        only = 'title'
@@ -0,0 +1,1335 @@
+from __future__ import absolute_import, unicode_literals
+from array import array
+from datetime import date, datetime, timedelta
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count
+from django.db.transaction import TransactionManagementError
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from django.utils.unittest import skipIf
+from django_pg.models import routing
+from django_pg.models.cache import get_query_cache, stats
+from django_pg.models.sql.bulk import update_sql, upsert_cte_sql
+from django_pg.pagination import (EstimatedCountPaginator, decode_cursor,
+                                  encode_cursor)
+from django_pg.utils import explain
+from django_pg.utils.columns import numpy
+from django_pg.utils.cursors import NamedCursorWrapper, deallocate_prepared
+from tests.queries.models import (Adventurer, Chronicle, Ent, Errand,
+                                  Heirloom, Huorn, Job, Ledger, Party, Quest,
+                                  Relic, Scroll)
+import django
+import io
+import json
+import mock
+import uuid
+
+
+def create_adventurers(count=5):
+    """Create the given number of adventurers, each with a quest."""
+    for i in range(0, count):
+        adventurer = Adventurer.objects.create(
+            name='Adventurer %d' % i,
+            level=i,
+            skills=['swords', 'spells'],
+            data={'index': i},
+        )
+        Quest.objects.create(adventurer=adventurer, title='Quest %d' % i)
+
+
+class StreamSuite(TestCase):
+    """Test suite for streaming QuerySet results using
+    server-side cursors.
+    """
+    def setUp(self):
+        create_adventurers()
+
+    def test_stream(self):
+        """Establish that streaming returns every object, with its
+        values converted.
+        """
+        adventurers = list(Adventurer.objects.order_by('level').stream())
+        self.assertEqual([i.level for i in adventurers], [0, 1, 2, 3, 4])
+        self.assertEqual(adventurers[2].skills, ['swords', 'spells'])
+        self.assertEqual(adventurers[2].data, {'index': 2})
+
+    def test_chunk_size(self):
+        """Establish that rows are fetched from the server-side cursor
+        `chunk_size` at a time.
+        """
+        fetchmany = NamedCursorWrapper.fetchmany
+        with mock.patch.object(NamedCursorWrapper, 'fetchmany',
+                               autospec=True, side_effect=fetchmany) as fm:
+            list(Adventurer.objects.stream(chunk_size=2))
+
+        # There are five rows, so three chunks and a final empty fetch.
+        self.assertEqual(fm.call_count, 4)
+
+    def test_select_related(self):
+        """Establish that the `select_related` Meta option is honored when
+        streaming.
+        """
+        cache_name = Quest._meta.get_field('adventurer').get_cache_name()
+        for quest in Quest.objects.stream(chunk_size=2):
+            self.assertTrue(hasattr(quest, cache_name))
+
+    def test_prefetch_related(self):
+        """Establish that `prefetch_related` lookups are performed once
+        per chunk.
+        """
+        # One query for the adventurers, and one for each chunk's quests.
+        qs = Adventurer.objects.prefetch_related('quest_set')
+        with self.assertNumQueries(4):
+            adventurers = list(qs.stream(chunk_size=2))
+            for adventurer in adventurers:
+                self.assertEqual(len(adventurer.quest_set.all()), 1)
+
+
+@skipIf(django.VERSION < (1, 6), 'Requires atomic blocks.')
+class StreamTransactionSuite(TransactionTestCase):
+    """Test suite for streaming QuerySet results outside of
+    a transaction.
+    """
+    def setUp(self):
+        create_adventurers()
+
+    def test_stream_autocommit(self):
+        """Establish that a transaction is opened for the server-side
+        cursor when streaming outside of one.
+        """
+        self.assertFalse(connection.in_atomic_block)
+        stream = Adventurer.objects.stream(chunk_size=2)
+        next(stream)
+        self.assertTrue(connection.in_atomic_block)
+        self.assertEqual(len(list(stream)), 4)
+        self.assertFalse(connection.in_atomic_block)
+
+
+class KeysetPageSuite(TestCase):
+    """Test suite for keyset pagination."""
+
+    def setUp(self):
+        # Create scrolls, several of which share a timestamp, so that
+        # the primary key is needed to break ties.
+        start = datetime(2014, 6, 1, 12, 0, 0, 250000, tzinfo=timezone.utc)
+        for i in range(0, 7):
+            Scroll.objects.create(title='Scroll %d' % i,
+                                  written=start + timedelta(hours=i // 2))
+        self.expected = list(Scroll.objects.order_by('written', 'id'))
+
+    def test_pages(self):
+        """Establish that following each page's cursor retrieves every
+        object exactly once, in order.
+        """
+        pages = []
+        cursor = None
+        while True:
+            page = Scroll.objects.keyset_page(after=cursor, size=3,
+                                              order_by=('written', 'id'))
+            pages.append(page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual([len(i) for i in pages], [3, 3, 1])
+        self.assertEqual([obj for page in pages for obj in page],
+                         self.expected)
+
+    def test_descending(self):
+        """Establish that keyset pagination works in descending order."""
+        page = Scroll.objects.keyset_page(size=4, order_by=('-written', '-id'))
+        page = Scroll.objects.keyset_page(after=page.next_cursor, size=4,
+                                          order_by=('-written', '-id'))
+        self.assertEqual(list(page), list(reversed(self.expected))[4:])
+        self.assertFalse(page.has_next())
+
+    def test_primary_key(self):
+        """Establish that the UUID primary key may be used on its own."""
+        first = Scroll.objects.keyset_page(size=5)
+        second = Scroll.objects.keyset_page(after=first.next_cursor, size=5)
+        self.assertEqual(sorted([i.pk for i in list(first) + list(second)]),
+                         sorted([i.pk for i in self.expected]))
+
+    def test_integer_primary_key(self):
+        """Establish that automatically incrementing primary keys may be
+        used for ordering.
+        """
+        create_adventurers()
+        first = Adventurer.objects.keyset_page(size=3)
+        second = Adventurer.objects.keyset_page(after=first.next_cursor)
+        self.assertEqual(list(first) + list(second),
+                         list(Adventurer.objects.order_by('pk')))
+
+    def test_filtered(self):
+        """Establish that keyset pagination respects existing filters."""
+        qs = Scroll.objects.exclude(title='Scroll 0')
+        page = qs.keyset_page(size=10, order_by=('written', 'id'))
+        self.assertEqual(list(page), self.expected[1:])
+
+    def test_mixed_directions(self):
+        """Establish that mixing ordering directions is rejected."""
+        with self.assertRaises(ValueError):
+            Scroll.objects.keyset_page(order_by=('written', '-id'))
+
+    def test_invalid_cursor(self):
+        """Establish that invalid cursors are rejected."""
+        with self.assertRaises(ValueError):
+            Scroll.objects.keyset_page(after='not a cursor')
+        with self.assertRaises(ValueError):
+            Scroll.objects.keyset_page(after=encode_cursor(['a', 'b']))
+
+    def test_cursor_round_trip(self):
+        """Establish that cursors are opaque encodings of their values."""
+        self.assertEqual(decode_cursor(encode_cursor(['2014', 'abc'])),
+                         ['2014', 'abc'])
+
+
+class UpsertSuite(TestCase):
+    """Test suite for inserting or updating rows in one statement."""
+
+    def setUp(self):
+        self.ring = Relic.objects.create(
+            code='ring',
+            keywords=['gold'],
+            data={'forged': 'Mount Doom'},
+            keeper={'title': 'Lord', 'name': 'Sauron'},
+        )
+
+    def _relic(self, code, **kwargs):
+        kwargs.setdefault('keywords', [])
+        kwargs.setdefault('data', {})
+        kwargs.setdefault('keeper', {'title': 'King', 'name': 'Isildur'})
+        return Relic(code=code, **kwargs)
+
+    def test_bulk_upsert(self):
+        """Establish that new objects are inserted, and conflicting
+        objects update the existing rows.
+        """
+        relics = Relic.objects.bulk_upsert([
+            self._relic('ring', keywords=['gold', 'precious'],
+                        data={'inscribed': True}),
+            self._relic('phial'),
+            self._relic('arkenstone', keywords=['gem']),
+        ], conflict_target='code')
+        self.assertEqual(Relic.objects.count(), 3)
+
+        # The primary keys of every object are set, including the one
+        # which conflicted.
+        self.assertEqual(relics[0].pk, self.ring.pk)
+        self.assertEqual(set([i.pk for i in relics]),
+                         set(Relic.objects.values_list('pk', flat=True)))
+
+        # The conflicting row was updated, including its array, JSON,
+        # and composite values.
+        ring = Relic.objects.get(code='ring')
+        self.assertEqual(ring.keywords, ['gold', 'precious'])
+        self.assertEqual(ring.data, {'inscribed': True})
+        self.assertEqual(ring.keeper.name, 'Isildur')
+        self.assertEqual(ring.serial, self.ring.serial)
+        self.assertEqual(Relic.objects.get(code='phial').keywords, [])
+        self.assertIsInstance(Relic.objects.get(code='phial').serial,
+                              uuid.UUID)
+
+    def test_duplicates(self):
+        """Establish that only the last of several objects with the same
+        conflict target is sent.
+        """
+        relics = Relic.objects.bulk_upsert([
+            self._relic('phial', keywords=['light']),
+            self._relic('ring', keywords=['gold']),
+            self._relic('phial', keywords=['star']),
+        ], conflict_target='code')
+        self.assertEqual([i.code for i in relics], ['ring', 'phial'])
+        self.assertEqual(Relic.objects.count(), 2)
+        self.assertEqual(Relic.objects.get(code='phial').keywords, ['star'])
+
+    def test_update_fields(self):
+        """Establish that only the given fields are updated."""
+        Relic.objects.bulk_upsert([
+            self._relic('ring', keywords=['precious']),
+        ], conflict_target=('code',), update_fields=('keywords',))
+        ring = Relic.objects.get(code='ring')
+        self.assertEqual(ring.keywords, ['precious'])
+        self.assertEqual(ring.data, {'forged': 'Mount Doom'})
+        self.assertEqual(ring.serial, self.ring.serial)
+
+    def test_ignore_conflicts(self):
+        """Establish that conflicting objects are ignored if there are no
+        fields to update.
+        """
+        Relic.objects.bulk_upsert([
+            self._relic('ring', keywords=['precious']),
+            self._relic('phial'),
+        ], conflict_target='code', update_fields=())
+        self.assertEqual(Relic.objects.count(), 2)
+        self.assertEqual(Relic.objects.get(code='ring').keywords, ['gold'])
+
+    def test_batches(self):
+        """Establish that objects are sent in batches."""
+        relics = [self._relic('relic %d' % i) for i in range(0, 5)]
+        with self.assertNumQueries(3):
+            Relic.objects.bulk_upsert(relics, conflict_target='code',
+                                      batch_size=2)
+        self.assertEqual(Relic.objects.count(), 6)
+
+    def test_writable_cte(self):
+        """Establish that the writable CTE used for servers which do not
+        support ON CONFLICT inserts and updates rows.
+        """
+        fields = [f for f in Relic._meta.local_fields if not f.primary_key]
+        code = Relic._meta.get_field('code')
+        sql, params = upsert_cte_sql(connection, Relic, fields, [
+            self._relic('ring', keywords=['precious']),
+            self._relic('phial'),
+        ], [code], [f for f in fields if f is not code])
+        connection.cursor().execute(sql, params)
+        self.assertEqual(Relic.objects.count(), 2)
+        self.assertEqual(Relic.objects.get(code='ring').keywords,
+                         ['precious'])
+
+    def test_writable_cte_keys(self):
+        """Establish that the writable CTE fallback leaves primary keys
+        generated by the database unset.
+        """
+        with mock.patch.object(connection, 'pg_version', 90400):
+            relics = Relic.objects.bulk_upsert([self._relic('phial')],
+                                               conflict_target='code')
+        self.assertIsNone(relics[0].pk)
+        self.assertEqual(Relic.objects.filter(code='phial').count(), 1)
+
+    def test_database_default(self):
+        """Establish that fields without a value whose values are
+        generated by the database get them, using either ON CONFLICT or
+        the writable CTE fallback.
+        """
+        Ent.objects.bulk_upsert([Ent(name='Beechbone')], conflict_target='pk')
+        with mock.patch.object(connection, 'pg_version', 90400):
+            Ent.objects.bulk_upsert([Ent(name='Skinbark')],
+                                    conflict_target='pk')
+        for name in ('Beechbone', 'Skinbark'):
+            self.assertIsInstance(Ent.objects.get(name=name).pk, uuid.UUID)
+
+    def test_upsert(self):
+        """Establish that a single object may be upserted."""
+        ring = Relic.objects.upsert('code', code='ring', keywords=['one'],
+                                    data={}, keeper=self.ring.keeper)
+        self.assertEqual(ring.pk, self.ring.pk)
+        self.assertEqual(Relic.objects.get(code='ring').keywords, ['one'])
+
+    def test_proxy(self):
+        """Establish that objects of proxy models are upserted into their
+        concrete model's table.
+        """
+        heirloom = Heirloom(code='ring', keywords=['precious'], data={},
+                            keeper=self.ring.keeper)
+        Heirloom.objects.bulk_upsert([heirloom], conflict_target='code')
+        self.assertEqual(heirloom.pk, self.ring.pk)
+        self.assertEqual(Relic.objects.get(code='ring').keywords,
+                         ['precious'])
+
+
+class BulkCreateSuite(TestCase):
+    """Test suite for bulk creation using INSERT ... RETURNING."""
+
+    def test_serial_primary_keys(self):
+        """Establish that automatically incrementing primary keys are set
+        on every object, including those which were given one.
+        """
+        adventurers = Adventurer.objects.bulk_create([
+            Adventurer(name='Frodo', level=1, skills=[], data={}),
+            Adventurer(id=1000, name='Sam', level=1, skills=[], data={}),
+            Adventurer(name='Merry', level=1, skills=['ponies'], data={}),
+        ])
+        self.assertEqual(adventurers[1].pk, 1000)
+        self.assertEqual(
+            set([i.pk for i in adventurers]),
+            set(Adventurer.objects.values_list('pk', flat=True)),
+        )
+        self.assertEqual(Adventurer.objects.get(pk=adventurers[2].pk).skills,
+                         ['ponies'])
+
+    def test_batches(self):
+        """Establish that objects are sent in batches, each in
+        a single query.
+        """
+        adventurers = [Adventurer(name='Ent %d' % i, level=i, skills=[],
+                                  data={}) for i in range(0, 5)]
+        with self.assertNumQueries(2):
+            Adventurer.objects.bulk_create(adventurers, batch_size=3)
+        self.assertTrue(all([i.pk for i in adventurers]))
+
+    def test_database_default(self):
+        """Establish that primary keys generated by the database using
+        the `DJANGOPG_DEFAULT_UUID_PK` setting are set on the objects.
+        """
+        id_field = Ent._meta.get_field('id')
+        self.assertEqual(id_field.db_default, 'gen_random_uuid()')
+        ents = Ent.objects.bulk_create([Ent(name='Treebeard'),
+                                        Ent(name='Quickbeam')])
+        for ent in ents:
+            self.assertIsInstance(ent.pk, uuid.UUID)
+            self.assertEqual(Ent.objects.get(pk=ent.pk).name, ent.name)
+
+    def test_save_database_default(self):
+        """Establish that saving an object sets the primary key generated
+        by the database.
+        """
+        ent = Ent.objects.create(name='Fangorn')
+        self.assertIsInstance(ent.pk, uuid.UUID)
+        self.assertEqual(Ent.objects.get(name='Fangorn').pk, ent.pk)
+
+    def test_proxy(self):
+        """Establish that objects of proxy models are created in their
+        concrete model's table.
+        """
+        huorns = Huorn.objects.bulk_create([Huorn(name='Old Man Willow')])
+        self.assertIsInstance(huorns[0].pk, uuid.UUID)
+        self.assertEqual(Ent.objects.get(pk=huorns[0].pk).name,
+                         'Old Man Willow')
+
+
+class CopyToSuite(TestCase):
+    """Test suite for exporting QuerySet results using COPY."""
+    def setUp(self):
+        create_adventurers(count=3)
+
+    def test_csv(self):
+        """Establish that CSV output includes a header, and array and JSON
+        values in PostgreSQL's text format.
+        """
+        output = io.BytesIO()
+        rows = Adventurer.objects.order_by('level').copy_to(output,
+            columns=('name', 'level', 'skills', 'data'))
+        self.assertEqual(rows, 3)
+        lines = output.getvalue().decode('utf-8').splitlines()
+        self.assertEqual(lines[0], 'name,level,skills,data')
+        self.assertEqual(lines[1],
+                         'Adventurer 0,0,"{swords,spells}","{""index"": 0}"')
+        self.assertEqual(len(lines), 4)
+
+    def test_filtered(self):
+        """Establish that filter parameters are interpolated into the
+        copied query, and that the header may be omitted.
+        """
+        output = io.BytesIO()
+        Adventurer.objects.filter(name='Adventurer 1').copy_to(output,
+            columns=('level',), header=False)
+        self.assertEqual(output.getvalue(), b'1\n')
+
+    def test_composite(self):
+        """Establish that composite values and their members may be
+        copied.
+        """
+        Relic.objects.create(code='ring', keywords=[], data={},
+                             keeper={'title': 'King', 'name': 'Thror'})
+        output = io.BytesIO()
+        Relic.objects.copy_to(output, format='text',
+                              columns=('keeper', 'keeper__name'))
+        self.assertEqual(output.getvalue(), b'(King,Thror,0)\tThror\n')
+
+    def test_duplicate_names(self):
+        """Establish that columns with the same name may be copied along
+        with composite members.
+        """
+        relic = Relic.objects.create(code='ring', keywords=[], data={},
+            keeper={'title': 'King', 'name': 'Thror'})
+        output = io.BytesIO()
+        Relic.objects.copy_to(output, format='csv',
+                              columns=('keeper__name', 'pk', 'id'))
+        self.assertEqual(output.getvalue().decode('utf-8').splitlines(), [
+            'keeper__name,id,id',
+            'Thror,%d,%d' % (relic.pk, relic.pk),
+        ])
+
+    def test_invalid_format(self):
+        """Establish that unrecognized formats are rejected."""
+        with self.assertRaises(ValueError):
+            Adventurer.objects.copy_to(io.BytesIO(), format='csv) TO STDOUT')
+
+    def test_binary(self):
+        """Establish that binary output begins with the PGCOPY
+        signature.
+        """
+        output = io.BytesIO()
+        Adventurer.objects.copy_to(output, format='binary', columns=('id',))
+        self.assertTrue(output.getvalue().startswith(b'PGCOPY\n'))
+
+    def test_generator(self):
+        """Establish that each chunk of data is sent to a generator."""
+        chunks = []
+        def collect():
+            while True:
+                chunks.append((yield))
+        generator = collect()
+        next(generator)
+        Adventurer.objects.copy_to(generator, format='text',
+                                   columns=('level',))
+        self.assertEqual(sorted(b''.join(chunks).split()), [b'0', b'1', b'2'])
+
+    def test_empty(self):
+        """Establish that an empty QuerySet copies nothing."""
+        output = io.BytesIO()
+        empty = Adventurer.objects.filter(pk__in=[])
+        self.assertEqual(empty.copy_to(output), 0)
+        self.assertEqual(output.getvalue(), b'')
+
+
+class BulkUpdateSuite(TestCase):
+    """Test suite for updating many objects using a single
+    UPDATE ... FROM (VALUES ...) statement.
+    """
+    def setUp(self):
+        for code in ('ring', 'sword', 'staff'):
+            Relic.objects.create(code=code, keywords=[], data={},
+                                 keeper={'title': 'King', 'name': 'Thror'})
+
+    def test_bulk_update(self):
+        """Establish that array, JSON, UUID, and composite values are
+        each updated to the values on their objects.
+        """
+        relics = list(Relic.objects.order_by('code'))
+        serial = uuid.uuid4()
+        for relic in relics:
+            relic.keywords = [relic.code, 'lost']
+            relic.data = {'code': relic.code}
+            relic.keeper.name = 'Thrain'
+        relics[0].serial = serial
+        rows = Relic.objects.bulk_update(relics,
+            ('keywords', 'data', 'serial', 'keeper'))
+        self.assertEqual(rows, 3)
+
+        ring = Relic.objects.get(code='ring')
+        self.assertEqual(ring.keywords, ['ring', 'lost'])
+        self.assertEqual(ring.data, {'code': 'ring'})
+        self.assertEqual(ring.serial, serial)
+        self.assertEqual(ring.keeper.name, 'Thrain')
+        self.assertEqual(Relic.objects.get(code='staff').data,
+                         {'code': 'staff'})
+
+    def test_only_given_fields(self):
+        """Establish that fields which are not given are not updated."""
+        relics = list(Relic.objects.all())
+        for relic in relics:
+            relic.code += '!'
+            relic.keywords = ['found']
+        Relic.objects.bulk_update(relics, 'keywords')
+        self.assertEqual(Relic.objects.filter(code__endswith='!').count(), 0)
+        self.assertEqual(Relic.objects.filter(keywords=['found']).count(), 3)
+
+    def test_batches(self):
+        """Establish that objects are sent in batches, in primary
+        key order.
+        """
+        relics = list(Relic.objects.order_by('-pk'))
+        for relic in relics:
+            relic.keywords = ['batched']
+        with mock.patch('django_pg.models.query.update_sql',
+                        wraps=update_sql) as us:
+            Relic.objects.bulk_update(relics, ['keywords'], batch_size=2)
+        self.assertEqual(us.call_count, 2)
+        pks = [o.pk for call in us.call_args_list for o in call[0][3]]
+        self.assertEqual(pks, sorted(pks))
+
+    def test_invalid(self):
+        """Establish that the primary key can not be updated, and that
+        every object must have one.
+        """
+        relic = Relic.objects.get(code='ring')
+        with self.assertRaises(ValueError):
+            Relic.objects.bulk_update([relic], ['id'])
+        with self.assertRaises(ValueError):
+            Relic.objects.bulk_update([Relic(code='cup')], ['code'])
+        with self.assertRaises(ValueError):
+            Relic.objects.bulk_update([relic], [])
+
+
+class CachedSuite(TestCase):
+    """Test suite for caching QuerySet results."""
+    def setUp(self):
+        create_adventurers(count=3)
+        get_query_cache().clear()
+        stats.reset()
+
+    def test_cached(self):
+        """Establish that cached results are retrieved from the cache,
+        and that hits and misses are counted.
+        """
+        qs = Adventurer.objects.order_by('level').cached()
+        self.assertEqual([i.level for i in qs], [0, 1, 2])
+        with self.assertNumQueries(0):
+            adventurers = list(qs.all())
+        self.assertEqual([i.level for i in adventurers], [0, 1, 2])
+        self.assertEqual(adventurers[1].skills, ['swords', 'spells'])
+        self.assertEqual((stats.hits, stats.misses), (1, 1))
+
+    def test_parameters(self):
+        """Establish that querysets which differ only in their parameters
+        are cached separately, and that cached querysets may be filtered.
+        """
+        qs = Adventurer.objects.cached()
+        self.assertEqual(qs.get(level=1).name, 'Adventurer 1')
+        self.assertEqual(qs.get(level=2).name, 'Adventurer 2')
+        with self.assertNumQueries(0):
+            self.assertEqual(qs.get(level=1).name, 'Adventurer 1')
+        self.assertEqual((stats.hits, stats.misses), (1, 2))
+
+    def test_save(self):
+        """Establish that saving or deleting an object invalidates cached
+        results for its model.
+        """
+        qs = Adventurer.objects.order_by('level').cached()
+        adventurer = list(qs)[0]
+        adventurer.name = 'Bilbo'
+        adventurer.save()
+        self.assertEqual(list(qs)[0].name, 'Bilbo')
+        adventurer.quest_set.all().delete()
+        adventurer.delete()
+        self.assertEqual(len(list(qs)), 2)
+        self.assertEqual((stats.hits, stats.misses), (0, 3))
+
+    def test_cascade(self):
+        """Establish that deleting objects invalidates cached results for
+        the objects deleted along with them.
+        """
+        qs = Quest.objects.cached()
+        self.assertEqual(len(list(qs)), 3)
+        Adventurer.objects.filter(level=0).delete()
+        self.assertEqual(len(list(qs)), 2)
+        Adventurer.objects.get(level=1).delete()
+        self.assertEqual(len(list(qs)), 1)
+        self.assertEqual(stats.misses, 3)
+
+    def test_many_to_many(self):
+        """Establish that adding objects to (and removing them from) a
+        many-to-many relationship invalidates cached results which join
+        to its table.
+        """
+        party = Party.objects.create(name='Fellowship')
+        qs = Adventurer.objects.filter(party=party).cached()
+        self.assertEqual(list(qs), [])
+        party.members.add(Adventurer.objects.get(level=1))
+        self.assertEqual([i.level for i in qs], [1])
+        party.members.clear()
+        self.assertEqual(list(qs), [])
+        self.assertEqual(stats.misses, 3)
+
+    def test_values(self):
+        """Establish that values may be cached, whether `cached` is called
+        before or after `values`.
+        """
+        for qs in (Adventurer.objects.order_by('level').values('level'),
+                   Adventurer.objects.cached().order_by('level').values(
+                       'level')):
+            qs = qs.cached()
+            self.assertEqual([i['level'] for i in qs], [0, 1, 2])
+            with self.assertNumQueries(0):
+                self.assertEqual(list(qs.all()), [{'level': 0},
+                                                  {'level': 1},
+                                                  {'level': 2}])
+        qs = Adventurer.objects.cached().values_list('level', flat=True)
+        self.assertEqual(sorted(qs), [0, 1, 2])
+        with self.assertNumQueries(0):
+            self.assertEqual(sorted(qs.all()), [0, 1, 2])
+
+    def test_update(self):
+        """Establish that updating a QuerySet invalidates cached results
+        which join to its model's table.
+        """
+        qs = Quest.objects.order_by('title').cached()
+        self.assertEqual(list(qs)[0].adventurer.level, 0)
+        Adventurer.objects.filter(level=0).update(level=10)
+        self.assertEqual(list(qs)[0].adventurer.level, 10)
+        self.assertEqual(stats.misses, 2)
+
+    def test_uncached(self):
+        """Establish that QuerySets which are not cached are unaffected."""
+        list(Adventurer.objects.all())
+        with self.assertNumQueries(1):
+            list(Adventurer.objects.all())
+        self.assertEqual((stats.hits, stats.misses), (0, 0))
+
+    def test_key(self):
+        """Establish that an explicit cache key may be given."""
+        list(Adventurer.objects.filter(level=1).cached(key='heroes'))
+        with self.assertNumQueries(0):
+            adventurers = list(Adventurer.objects.cached(key='heroes'))
+        self.assertEqual([i.level for i in adventurers], [1])
+
+
+@skipIf(django.VERSION < (1, 6), 'Requires atomic blocks.')
+class CachedTransactionSuite(TransactionTestCase):
+    """Test suite for caching QuerySet results around transactions."""
+    def setUp(self):
+        create_adventurers(count=3)
+        get_query_cache().clear()
+        stats.reset()
+
+    def test_rollback(self):
+        """Establish that results cached within a transaction are
+        invalidated if it is rolled back.
+        """
+        qs = Adventurer.objects.order_by('level').cached()
+        try:
+            with transaction.atomic():
+                Adventurer.objects.filter(level=0).update(name='Bilbo')
+                self.assertEqual(list(qs)[0].name, 'Bilbo')
+                raise DatabaseError
+        except DatabaseError:
+            pass
+        self.assertEqual(list(qs)[0].name, 'Adventurer 0')
+        self.assertEqual(stats.misses, 2)
+
+    def test_commit(self):
+        """Establish that results cached after a write but before the
+        transaction is committed (as other connections would cache the
+        data from before the write) are invalidated once it is.
+        """
+        qs = Adventurer.objects.order_by('level').cached()
+        with transaction.atomic():
+            adventurer = Adventurer.objects.get(level=0)
+            adventurer.name = 'Bilbo'
+            adventurer.save()
+            list(qs)
+            with self.assertNumQueries(0):
+                list(qs)
+        self.assertEqual(list(qs)[0].name, 'Bilbo')
+        self.assertEqual((stats.hits, stats.misses), (1, 2))
+
+
+@override_settings(DJANGOPG_READ_REPLICAS=['replica'],
+                   DJANGOPG_READ_YOUR_WRITES=60)
+class ReplicaSuite(TransactionTestCase):
+    """Test suite for sending reads to read replicas."""
+    def setUp(self):
+        create_adventurers(count=3)
+        Relic.objects.create(code='ring', keywords=[], data={},
+                             keeper={'title': 'King', 'name': 'Thror'})
+        routing.clear_writes()
+
+    def tearDown(self):
+        routing.clear_writes()
+
+    def test_reads(self):
+        """Establish that reads are sent to the replica, and that the
+        objects read belong to the primary database.
+        """
+        with self.assertNumQueries(0, using='default'):
+            with self.assertNumQueries(2, using='replica'):
+                adventurers = list(Adventurer.objects.all())
+                self.assertEqual(Adventurer.objects.count(), 3)
+        self.assertEqual(adventurers[0]._state.db, 'default')
+
+    def test_read_your_writes(self):
+        """Establish that reads are sent to the primary database after
+        this thread writes to it.
+        """
+        Adventurer.objects.filter(level=0).update(name='Bilbo')
+        with self.assertNumQueries(0, using='replica'):
+            self.assertEqual(Adventurer.objects.get(level=0).name, 'Bilbo')
+
+    def test_save(self):
+        """Establish that saving an object read from the replica writes
+        it to the primary database.
+        """
+        adventurer = Adventurer.objects.get(level=1)
+        with self.assertNumQueries(0, using='replica'):
+            adventurer.name = 'Frodo'
+            adventurer.save()
+        self.assertEqual(routing.read_alias('default'), 'default')
+
+    def test_primary(self):
+        """Establish that `primary` and `use_primary` send reads to the
+        primary database.
+        """
+        with self.assertNumQueries(0, using='replica'):
+            list(Adventurer.objects.primary())
+            list(Adventurer.objects.primary().filter(level=1))
+            with routing.use_primary():
+                list(Adventurer.objects.all())
+
+    def test_delete(self):
+        """Establish that deleting objects finds the objects which cascade
+        from them on the primary database.
+        """
+        with self.assertNumQueries(0, using='replica'):
+            Adventurer.objects.filter(level=0).delete()
+        self.assertEqual(Quest.objects.primary().count(), 2)
+        self.assertEqual(Adventurer.objects.primary().count(), 2)
+
+    def test_stream(self):
+        """Establish that streamed results are read from the replica,
+        unless they must come from the primary database.
+        """
+        with self.assertNumQueries(0, using='default'):
+            adventurers = list(Adventurer.objects.order_by('level').stream())
+        self.assertEqual([a.level for a in adventurers], [0, 1, 2])
+        self.assertEqual(adventurers[0]._state.db, 'default')
+        with self.assertNumQueries(0, using='replica'):
+            list(Adventurer.objects.primary().stream())
+
+    @skipIf(django.VERSION < (1, 6), 'Django 1.6+ only')
+    def test_transaction(self):
+        """Establish that reads within a transaction are sent to the
+        primary database.
+        """
+        with self.assertNumQueries(0, using='replica'):
+            with transaction.atomic():
+                list(Adventurer.objects.all())
+
+    def test_composite(self):
+        """Establish that composite values read from the replica are
+        converted.
+        """
+        with self.assertNumQueries(1, using='replica'):
+            relic = Relic.objects.get(code='ring')
+        self.assertEqual(relic.keeper.name, 'Thror')
+        self.assertEqual(relic.keeper.suffix, 0)
+
+    def test_round_robin(self):
+        """Establish that replicas are chosen in turn."""
+        with override_settings(DJANGOPG_READ_REPLICAS={'default': ['a', 'b']}):
+            chosen = set([routing.select_replica('default') for i in (1, 2)])
+        self.assertEqual(chosen, set(['a', 'b']))
+
+    def test_least_lag(self):
+        """Establish that the replica which is least behind may
+        be chosen.
+        """
+        lags = {'a': 3.0, 'b': 0.5, 'c': 10.0}
+        with override_settings(DJANGOPG_READ_REPLICAS=['a', 'b', 'c'],
+                               DJANGOPG_REPLICA_SELECTION='least_lag'):
+            with mock.patch.object(routing, 'replica_lag',
+                                   side_effect=lags.get):
+                self.assertEqual(routing.select_replica('default'), 'b')
+
+
+class EstimatedCountSuite(TestCase):
+    """Test suite for estimating the number of objects in a QuerySet."""
+    def setUp(self):
+        create_adventurers(count=5)
+        connection.cursor().execute('ANALYZE queries_adventurer')
+
+    def test_unfiltered(self):
+        """Establish that the table's statistics are used for an unfiltered
+        QuerySet.
+        """
+        with self.assertNumQueries(1):
+            self.assertEqual(Adventurer.objects.estimated_count(), 5)
+
+    def test_filtered(self):
+        """Establish that the planner's estimate is used for a filtered
+        QuerySet.
+        """
+        with self.assertNumQueries(1):
+            estimate = Adventurer.objects.filter(level=2).estimated_count()
+        self.assertEqual(estimate, 1)
+        empty = Adventurer.objects.filter(pk__in=[])
+        self.assertEqual(empty.estimated_count(), 0)
+
+    def test_grouped(self):
+        """Establish that the planner's estimate is used for a grouped or
+        distinct QuerySet, rather than the number of rows in the table.
+        """
+        grouped = Adventurer.objects.values('skills').annotate(n=Count('pk'))
+        self.assertEqual(grouped.estimated_count(), 1)
+        distinct = Adventurer.objects.values('skills').distinct()
+        self.assertEqual(distinct.estimated_count(), 1)
+
+    def test_paginator(self):
+        """Establish that the paginator only uses the estimate above
+        its threshold.
+        """
+        qs = Adventurer.objects.order_by('level')
+        with mock.patch.object(type(qs), 'estimated_count',
+                               return_value=1000000):
+            self.assertEqual(EstimatedCountPaginator(qs, 10).count, 1000000)
+            paginator = EstimatedCountPaginator(qs, 10,
+                                                estimate_threshold=10000000)
+            self.assertEqual(paginator.count, 5)
+        page = EstimatedCountPaginator(qs, 2).page(2)
+        self.assertEqual([i.level for i in page], [2, 3])
+
+
+def create_jobs(count=5):
+    """Create the given number of pending jobs."""
+    for i in range(0, count):
+        Job.objects.create(name='Job %d' % i, priority=count - i)
+
+
+class ClaimSuite(TestCase):
+    """Test suite for claiming objects from a queue."""
+    def setUp(self):
+        create_jobs()
+
+    def test_claim(self):
+        """Establish that objects are claimed in the QuerySet's ordering,
+        and that the given values are set on them.
+        """
+        pending = Job.objects.filter(status='pending').order_by('priority')
+        with self.assertNumQueries(1):
+            jobs = pending.claim(2, status='running', worker='w1')
+        self.assertEqual(sorted([j.name for j in jobs]), ['Job 3', 'Job 4'])
+        self.assertEqual(set([j.status for j in jobs]), set(['running']))
+        self.assertEqual(jobs[0].worker, 'w1')
+        self.assertEqual(pending.count(), 3)
+
+    def test_claim_empty(self):
+        """Establish that claiming from an empty queue returns nothing."""
+        self.assertEqual(Job.objects.filter(pk__in=[]).claim(
+            status='running'), [])
+        self.assertEqual(Job.objects.filter(status='done').claim(
+            status='running'), [])
+
+    def test_lock(self):
+        """Establish that objects may be locked without updating them."""
+        jobs = Job.objects.order_by('-priority').claim(1)
+        self.assertEqual([j.name for j in jobs], ['Job 0'])
+        self.assertEqual(jobs[0].status, 'pending')
+
+    def test_proxy(self):
+        """Establish that objects of proxy models may be claimed."""
+        errands = Errand.objects.order_by('-priority').claim(1,
+                                                             worker='w1')
+        self.assertEqual([e.name for e in errands], ['Job 0'])
+        self.assertIsInstance(errands[0], Errand)
+        self.assertEqual(Job.objects.get(name='Job 0').worker, 'w1')
+
+    def test_consume(self):
+        """Establish that every object is claimed, in batches."""
+        pending = Job.objects.filter(status='pending').order_by('priority')
+        with self.assertNumQueries(4):
+            names = [j.name for j in pending.consume(batch_size=2,
+                                                     status='done')]
+        self.assertEqual(sorted(names), ['Job %d' % i for i in range(0, 5)])
+        self.assertEqual(Job.objects.filter(status='done').count(), 5)
+
+    def test_consume_unexcluded(self):
+        """Establish that consuming stops if claimed objects are not
+        excluded from the QuerySet.
+        """
+        jobs = list(Job.objects.order_by('priority').consume(batch_size=2,
+                                                             worker='w1'))
+        self.assertEqual(len(jobs), 2)
+
+
+@skipIf(django.VERSION < (1, 6), 'Django 1.6+ only')
+class ClaimLockingSuite(TransactionTestCase):
+    """Test suite for claiming objects which another transaction
+    has locked.
+    """
+    def setUp(self):
+        create_jobs()
+
+    def test_skip_locked(self):
+        """Establish that locked objects are skipped, or raise an error
+        if `nowait` is set.
+        """
+        other = Job.objects.using('replica').filter(status='pending')
+        with transaction.atomic():
+            locked = Job.objects.filter(name='Job 0').claim(1)
+            jobs = other.claim(5, status='running')
+            self.assertEqual(len(jobs), 4)
+            self.assertNotIn(locked[0].pk, [j.pk for j in jobs])
+            with self.assertRaises(DatabaseError):
+                Job.objects.using('replica').claim(5, nowait=True,
+                                                   status='running')
+
+    def test_lock_outside_transaction(self):
+        """Establish that objects may not be locked without updating them
+        outside of a transaction.
+        """
+        with self.assertRaises(TransactionManagementError):
+            Job.objects.claim(1)
+
+
+class PreparedSuite(TestCase):
+    """Test suite for sending QuerySets as prepared statements."""
+    def setUp(self):
+        create_adventurers(count=3)
+        Relic.objects.create(code='ring', keywords=['gold'], data={},
+                             keeper={'title': 'King', 'name': 'Thror'})
+        deallocate_prepared(connection)
+        connection._djangopg_prepared = None
+
+    def prepared_count(self):
+        cursor = connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM pg_prepared_statements "
+                       "WHERE name LIKE 'django_pg_%%'")
+        return cursor.fetchone()[0]
+
+    def test_prepared(self):
+        """Establish that a query is prepared once, and executed with
+        different parameters.
+        """
+        qs = Adventurer.objects.prepared()
+        self.assertEqual(qs.get(level=1).name, 'Adventurer 1')
+        self.assertEqual(qs.get(level=2).name, 'Adventurer 2')
+        self.assertEqual(qs.get(level=2).skills, ['swords', 'spells'])
+        self.assertEqual(self.prepared_count(), 1)
+
+    def test_lookups(self):
+        """Establish that array and composite lookups may be prepared."""
+        self.assertEqual(Adventurer.objects.prepared().filter(
+            skills__contains=['spells'],
+        ).count(), 3)
+        relic = Relic.objects.prepared().get(keeper__name='Thror')
+        self.assertEqual(relic.keywords, ['gold'])
+        self.assertEqual(relic.keeper.title, 'King')
+        self.assertEqual(Relic.objects.prepared().filter(
+            keywords__contains=['silver'],
+        ).count(), 0)
+        self.assertEqual(self.prepared_count(), 3)
+
+    def test_least_recently_used(self):
+        """Establish that no more than the configured number of statements
+        are prepared on a connection.
+        """
+        with override_settings(DJANGOPG_PREPARED_STATEMENTS=2):
+            qs = Adventurer.objects.prepared()
+            list(qs.filter(level=1))
+            list(qs.filter(name='Adventurer 1'))
+            list(qs.filter(level=1))
+            list(qs.filter(level__gt=0))
+        self.assertEqual(self.prepared_count(), 2)
+        statements = list(connection._djangopg_prepared.statements)
+        self.assertEqual(len(statements), 2)
+        self.assertIn('"level" > ', statements[1])
+
+    def test_deallocate(self):
+        """Establish that prepared statements may be discarded."""
+        list(Adventurer.objects.prepared().filter(level=1))
+        deallocate_prepared(connection)
+        self.assertEqual(self.prepared_count(), 0)
+        self.assertEqual(
+            Adventurer.objects.prepared().filter(level=1).count(), 1,
+        )
+
+    @skipIf(django.VERSION < (1, 6), 'Requires atomic blocks.')
+    def test_missing(self):
+        """Establish that statements which were deallocated elsewhere are
+        prepared again, after the query that discovers this fails.
+        """
+        qs = Adventurer.objects.prepared().filter(level=1)
+        self.assertEqual(qs.count(), 1)
+        connection.cursor().execute('DEALLOCATE ALL')
+        with self.assertRaises(DatabaseError):
+            with transaction.atomic():
+                qs.count()
+        self.assertEqual(qs.count(), 1)
+        self.assertEqual(qs.count(), 1)
+        self.assertEqual(self.prepared_count(), 1)
+
+
+class WithSettingsSuite(TestCase):
+    """Test suite for changing PostgreSQL settings for a single query."""
+    def setUp(self):
+        create_adventurers(count=2)
+
+    def current_setting(self, name):
+        cursor = connection.cursor()
+        cursor.execute('SELECT current_setting(%s)', [name])
+        return cursor.fetchone()[0]
+
+    def test_with_settings(self):
+        """Establish that settings are changed while the query runs, and
+        restored afterward.
+        """
+        work_mem = self.current_setting('work_mem')
+        qs = Adventurer.objects.with_settings(work_mem='12MB',
+                                              enable_nestloop=False)
+        qs = qs.extra(select={
+            'work_mem': "current_setting('work_mem')",
+            'nestloop': "current_setting('enable_nestloop')",
+        })
+        adventurers = list(qs.filter(level__gte=0))
+        self.assertEqual(len(adventurers), 2)
+        self.assertEqual(adventurers[0].work_mem, '12MB')
+        self.assertEqual(adventurers[0].nestloop, 'off')
+        self.assertEqual(self.current_setting('work_mem'), work_mem)
+        self.assertEqual(self.current_setting('enable_nestloop'), 'on')
+
+    def test_combined(self):
+        """Establish that settings may be combined with prepared
+        statements, and added to.
+        """
+        qs = Adventurer.objects.prepared().with_settings(work_mem='12MB')
+        qs = qs.with_settings(statement_timeout='10s')
+        self.assertEqual(qs.query.pg_settings,
+                         {'work_mem': '12MB', 'statement_timeout': '10s'})
+        self.assertEqual(qs.get(level=1).name, 'Adventurer 1')
+
+    def test_stream(self):
+        """Establish that settings remain changed while rows are fetched
+        from a server-side cursor.
+        """
+        qs = Adventurer.objects.with_settings(work_mem='12MB')
+        for adventurer in qs.stream(chunk_size=1):
+            self.assertEqual(self.current_setting('work_mem'), '12MB')
+
+    @skipIf(django.VERSION < (1, 6), 'Django 1.6+ only')
+    def test_statement_timeout(self):
+        """Establish that a statement timeout cancels the query."""
+        timeout = self.current_setting('statement_timeout')
+        qs = Adventurer.objects.with_settings(statement_timeout=10).extra(
+            where=['pg_sleep(0.5) IS NOT NULL'],
+        )
+        with self.assertRaises(DatabaseError):
+            with transaction.atomic():
+                list(qs)
+        self.assertEqual(self.current_setting('statement_timeout'), timeout)
+
+
+class ExplainSuite(TestCase):
+    """Test suite for retrieving query plans, and logging the plans of
+    slow queries.
+    """
+    def setUp(self):
+        create_adventurers(count=2)
+        explain._logged.clear()
+
+    def test_explain(self):
+        """Establish that the plan is returned, parsed from JSON."""
+        plan = Adventurer.objects.filter(level=1).explain()
+        self.assertIn('Node Type', plan[0]['Plan'])
+        self.assertNotIn('Actual Rows', plan[0]['Plan'])
+
+    def test_analyze(self):
+        """Establish that the query may be analyzed, including its
+        buffer usage.
+        """
+        plan = Adventurer.objects.all().explain(analyze=True, buffers=True)
+        self.assertEqual(plan[0]['Plan']['Actual Rows'], 2)
+        self.assertIn('Shared Hit Blocks', plan[0]['Plan'])
+
+    def test_text(self):
+        """Establish that plans in other formats are returned as text."""
+        plan = Adventurer.objects.filter(level=1).explain(format='text')
+        self.assertIn('queries_adventurer', plan)
+        plan = Adventurer.objects.filter(level=1).explain(format='YAML')
+        self.assertIn('Node Type', plan)
+
+    def test_invalid_format(self):
+        """Establish that unrecognized formats are rejected."""
+        with self.assertRaises(ValueError):
+            Adventurer.objects.all().explain(format='json) SELECT 1; --')
+
+    def test_empty(self):
+        """Establish that QuerySets which can not match any rows have
+        no plan.
+        """
+        self.assertIsNone(Adventurer.objects.filter(pk__in=[]).explain())
+
+    def test_prepared(self):
+        """Establish that QuerySets sent as prepared statements
+        may be explained.
+        """
+        plan = Adventurer.objects.prepared().filter(level=1).explain()
+        self.assertIn('Node Type', plan[0]['Plan'])
+
+    def test_slow_query_log(self):
+        """Establish that the plans of slow queries are logged, with their
+        SQL and call site.
+        """
+        with override_settings(DJANGOPG_SLOW_QUERY_THRESHOLD=0):
+            with mock.patch.object(explain.logger, 'warning') as warning:
+                list(Adventurer.objects.filter(level=1))
+        self.assertEqual(warning.call_count, 1)
+        args, kwargs = warning.call_args
+        self.assertIn('in test_slow_query_log', args[2])
+        self.assertIn('"level" = 1', args[3])
+        self.assertIn('Node Type', kwargs['extra']['plan'][0]['Plan'])
+
+    def test_slow_query_log_failure(self):
+        """Establish that failing to log the plan of a slow query is
+        logged, and does not affect the query.
+        """
+        with override_settings(DJANGOPG_SLOW_QUERY_THRESHOLD=0):
+            with mock.patch.object(explain.logger, 'exception') as exception:
+                with mock.patch('django_pg.utils.cursors.log_slow_query',
+                                side_effect=DatabaseError):
+                    adventurers = list(Adventurer.objects.filter(level=1))
+        self.assertEqual(len(adventurers), 1)
+        self.assertEqual(exception.call_count, 1)
+        self.assertEqual(Adventurer.objects.count(), 2)
+
+    def test_fast_queries(self):
+        """Establish that queries faster than the threshold are not
+        logged.
+        """
+        with override_settings(DJANGOPG_SLOW_QUERY_THRESHOLD=60000):
+            with mock.patch.object(explain.logger, 'warning') as warning:
+                list(Adventurer.objects.all())
+        self.assertEqual(warning.call_count, 0)
+
+    def test_sampling(self):
+        """Establish that only a sample of slow queries are logged, and no
+        more than the limit each minute.
+        """
+        with mock.patch.object(explain.logger, 'warning') as warning:
+            with override_settings(DJANGOPG_SLOW_QUERY_THRESHOLD=0,
+                                   DJANGOPG_SLOW_QUERY_SAMPLE_RATE=0.0):
+                list(Adventurer.objects.all())
+            self.assertEqual(warning.call_count, 0)
+            with override_settings(DJANGOPG_SLOW_QUERY_THRESHOLD=0,
+                                   DJANGOPG_SLOW_QUERY_LIMIT=2):
+                for i in range(0, 3):
+                    list(Adventurer.objects.all())
+            self.assertEqual(warning.call_count, 2)
+
+
+class MetaDeferSuite(TestCase):
+    """Test suite for deferring fields using the `defer` and `only`
+    Meta options.
+    """
+    def setUp(self):
+        Chronicle.objects.create(title='The Red Book',
+                                 payload={'author': 'Bilbo'},
+                                 history=['There', 'Back Again'])
+        Ledger.objects.create(title='Accounts', entries=[1, 2, 3])
+
+    def test_defer(self):
+        """Establish that fields listed in `Meta.defer` are deferred, and
+        are loaded when they are accessed.
+        """
+        chronicle = Chronicle.objects.get(title='The Red Book')
+        self.assertNotIn('payload', chronicle.__dict__)
+        self.assertNotIn('history', chronicle.__dict__)
+        self.assertEqual(chronicle.payload, {'author': 'Bilbo'})
+
+    def test_only(self):
+        """Establish that only the fields listed in `Meta.only` (and the
+        primary key) are loaded.
+        """
+        ledger = Ledger.objects.get(title='Accounts')
+        self.assertNotIn('entries', ledger.__dict__)
+        self.assertEqual(ledger.entries, [1, 2, 3])
+
+    def test_with_heavy(self):
+        """Establish that `with_heavy` loads every field."""
+        chronicle = Chronicle.objects.with_heavy().get()
+        self.assertIn('history', chronicle.__dict__)
+        self.assertEqual(chronicle.history, ['There', 'Back Again'])
+        ledger = Ledger.objects.filter(title='Accounts').with_heavy()[0]
+        self.assertIn('entries', ledger.__dict__)
+        self.assertEqual(ledger.entries, [1, 2, 3])
+
+    def test_explicit_only(self):
+        """Establish that fields explicitly loaded using `only` are
+        not deferred.
+        """
+        chronicle = Chronicle.objects.only('title', 'payload').get()
+        self.assertIn('payload', chronicle.__dict__)
+        self.assertNotIn('history', chronicle.__dict__)
+        ledger = Ledger.objects.defer('title').get()
+        self.assertIn('entries', ledger.__dict__)
+
+    def test_values(self):
+        """Establish that `values` is unaffected."""
+        self.assertEqual(list(Chronicle.objects.values_list('history',
+                                                            flat=True)),
+                         [['There', 'Back Again']])
+
+    def test_save(self):
+        """Establish that saving an object with deferred fields leaves
+        those fields alone.
+        """
+        chronicle = Chronicle.objects.get()
+        chronicle.title = 'There and Back Again'
+        chronicle.save()
+        chronicle = Chronicle.objects.with_heavy().get()
+        self.assertEqual(chronicle.title, 'There and Back Again')
+        self.assertEqual(chronicle.payload, {'author': 'Bilbo'})
+
+
+class ToColumnsSuite(TestCase):
+    """Test suite for retrieving QuerySet results as columns."""
+    def setUp(self):
+        create_adventurers(count=3)
+
+    def test_numeric(self):
+        """Establish that numeric columns are returned as arrays, and
+        other columns as lists, in the order that was asked for.
+        """
+        columns = Adventurer.objects.order_by('level').to_columns(
+            'level', 'name', 'pk', chunk_size=2, use_numpy=False,
+        )
+        self.assertEqual(list(columns), ['level', 'name', 'pk'])
+        self.assertIsInstance(columns['level'], array)
+        self.assertEqual(columns['level'].tolist(), [0, 1, 2])
+        self.assertEqual(columns['name'],
+                         ['Adventurer 0', 'Adventurer 1', 'Adventurer 2'])
+        self.assertEqual(columns['pk'].tolist(), list(
+            Adventurer.objects.order_by('level').values_list('pk', flat=True),
+        ))
+
+    def test_json(self):
+        """Establish that JSON is decoded, unless it is asked for raw."""
+        qs = Adventurer.objects.filter(level=1)
+        self.assertEqual(qs.to_columns('data')['data'], [{'index': 1}])
+        raw = qs.to_columns('data', raw_json=True)['data']
+        self.assertEqual(json.loads(raw[0]), {'index': 1})
+
+    def test_uuid_and_timestamp(self):
+        """Establish that UUIDs are returned as bytes, and timestamps as
+        microseconds since the epoch.
+        """
+        written = timezone.now().replace(microsecond=123456)
+        scroll = Scroll.objects.create(title='Red Book', written=written)
+        columns = Scroll.objects.to_columns('id', 'written', use_numpy=False)
+        self.assertEqual(columns['id'], [scroll.id.bytes])
+        epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+        delta = written - epoch
+        self.assertEqual(columns['written'].tolist(), [
+            (delta.days * 86400 + delta.seconds) * 1000000 +
+            delta.microseconds,
+        ])
+
+    def test_nulls(self):
+        """Establish that columns containing NULL are returned as lists."""
+        Job.objects.create(name='Forge', priority=1)
+        columns = Job.objects.to_columns('priority', 'worker',
+                                         use_numpy=False)
+        self.assertIsInstance(columns['priority'], array)
+        self.assertEqual(columns['worker'], [None])
+
+    def test_converted_nulls(self):
+        """Establish that timestamps, dates, and booleans in columns
+        containing NULL are returned as Python objects, including those
+        fetched before the NULL was.
+        """
+        claimed = timezone.now().replace(microsecond=123456)
+        Job.objects.create(name='Forge', priority=1, claimed=claimed,
+                           due=date(2014, 6, 18), urgent=True)
+        Job.objects.create(name='Quench', priority=2, urgent=False)
+        Job.objects.create(name='Temper', priority=3)
+        Job.objects.create(name='Sharpen', priority=4, claimed=claimed,
+                           due=date(2014, 6, 19), urgent=True)
+        columns = Job.objects.order_by('priority').to_columns(
+            'claimed', 'due', 'urgent', chunk_size=1, use_numpy=False,
+        )
+        self.assertEqual(columns['claimed'], [claimed, None, None, claimed])
+        self.assertEqual(columns['due'], [date(2014, 6, 18), None, None,
+                                          date(2014, 6, 19)])
+        self.assertEqual(columns['urgent'], [True, False, None, True])
+        self.assertIs(columns['urgent'][1], False)
+
+    def test_empty(self):
+        """Establish that an empty QuerySet returns empty columns."""
+        columns = Adventurer.objects.filter(pk__in=[]).to_columns(
+            'level', use_numpy=False,
+        )
+        self.assertEqual(len(columns['level']), 0)
+
+    @skipIf(numpy is None, 'NumPy is not installed.')
+    def test_numpy(self):
+        """Establish that NumPy arrays are returned if NumPy is
+        installed.
+        """
+        Scroll.objects.create(title='Red Book', written=timezone.now())
+        columns = Adventurer.objects.order_by('level').to_columns('level')
+        self.assertEqual(columns['level'].dtype, numpy.int64)
+        self.assertEqual(columns['level'].tolist(), [0, 1, 2])
+        columns = Scroll.objects.to_columns('id', 'written')
+        self.assertEqual(columns['id'].dtype, numpy.dtype('S16'))
+        self.assertEqual(columns['written'].dtype,
+                         numpy.dtype('datetime64[us]'))
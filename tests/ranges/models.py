@@ -0,0 +1,18 @@
+from __future__ import absolute_import, unicode_literals
+from django_pg import models
+
+
+class Reservation(models.Model):
+    room = models.CharField(max_length=20)
+    during = models.DateTimeRangeField(db_index=True)
+
+    class Meta:
+        exclusion_constraints = (
+            (('during', '&&'),),
+        )
+
+
+class Shipment(models.Model):
+    weight = models.NumericRangeField(null=True)
+    days = models.DateRangeField(null=True)
+    quantity = models.IntegerRangeField(null=True)
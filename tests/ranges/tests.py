@@ -0,0 +1,207 @@
+from __future__ import absolute_import, unicode_literals
+from datetime import date, datetime
+from decimal import Decimal
+from django.db import connection, IntegrityError, transaction
+from django.test import TestCase
+from django.utils.unittest import skipIf
+from django_pg import models
+from django_pg.management import exclusion_constraints_sql
+from django_pg.utils.indexes import constraint_exists, index_exists
+from django_pg.utils.south import south_installed
+from psycopg2.extras import DateRange, DateTimeTZRange, NumericRange
+from tests.ranges.models import Reservation, Shipment
+import django
+import pytz
+
+
+class RangeFieldSuite(TestCase):
+    """Test suite for saving and loading range fields."""
+
+    def test_to_python_string(self):
+        """Establish that string representations of ranges are
+        converted to the appropriate range class.
+        """
+        field = models.IntegerRangeField()
+        self.assertEqual(field.to_python('[1,5)'), NumericRange(1, 5, '[)'))
+        self.assertEqual(field.to_python('(,5]'),
+                         NumericRange(None, 5, '(]'))
+        self.assertEqual(field.to_python('empty'),
+                         NumericRange(empty=True))
+
+    def test_to_python_tuple(self):
+        """Establish that tuples of bounds are converted to the
+        appropriate range class, with their bounds coerced.
+        """
+        field = models.DateRangeField()
+        self.assertEqual(
+            field.to_python(('2014-01-01', '2014-02-01')),
+            DateRange(date(2014, 1, 1), date(2014, 2, 1)),
+        )
+
+    def test_to_python_invalid(self):
+        """Establish that values which cannot be ranges raise
+        appropriate errors.
+        """
+        field = models.IntegerRangeField()
+        with self.assertRaises(ValueError):
+            field.to_python('1 to 5')
+        with self.assertRaises(TypeError):
+            field.to_python(5)
+
+    def test_round_trip(self):
+        """Establish that ranges are saved to and loaded from
+        the database.
+        """
+        Shipment.objects.create(
+            weight=(Decimal('1.5'), Decimal('2.5')),
+            days='[2014-01-01,2014-01-08)',
+        )
+        shipment = Shipment.objects.get()
+        self.assertEqual(shipment.weight,
+                         NumericRange(Decimal('1.5'), Decimal('2.5')))
+        self.assertEqual(shipment.days,
+                         DateRange(date(2014, 1, 1), date(2014, 1, 8)))
+        self.assertEqual(shipment.quantity, None)
+
+
+class RangeLookupSuite(TestCase):
+    """Test suite for range lookups."""
+
+    def setUp(self):
+        Shipment.objects.create(quantity=(1, 10))
+        Shipment.objects.create(quantity=(10, 20))
+        Shipment.objects.create(quantity=(50, 100))
+
+    def _quantities(self, **kwargs):
+        return sorted([i.quantity.lower
+                       for i in Shipment.objects.filter(**kwargs)])
+
+    def test_exact(self):
+        """Test that exact lookups compare ranges."""
+        self.assertEqual(self._quantities(quantity=(10, 20)), [10])
+
+    def test_overlap(self):
+        """Test that overlap lookups find overlapping ranges."""
+        self.assertEqual(self._quantities(quantity__overlap=(5, 15)), [1, 10])
+
+    def test_contains_value(self):
+        """Test that contains lookups against a single value find
+        ranges including that value.
+        """
+        self.assertEqual(self._quantities(quantity__contains=10), [10])
+
+    def test_contains_range(self):
+        """Test that contains lookups against a range find
+        ranges which include that entire range.
+        """
+        self.assertEqual(self._quantities(quantity__contains=(60, 70)), [50])
+
+    def test_contained_by(self):
+        """Test that contained_by lookups find ranges which are
+        within the given range.
+        """
+        self.assertEqual(self._quantities(quantity__contained_by=(0, 25)),
+                         [1, 10])
+
+    def test_adjacent(self):
+        """Test that adjacent lookups find ranges which border on
+        the given range.
+        """
+        self.assertEqual(self._quantities(quantity__adjacent=(20, 50)),
+                         [10, 50])
+
+    def test_unsupported_lookup(self):
+        """Test that lookups which do not make sense for ranges
+        are rejected.
+        """
+        with self.assertRaises(TypeError):
+            list(Shipment.objects.filter(quantity__startswith=1))
+
+
+class RangeIndexSuite(TestCase):
+    """Test suite for GiST indexes and exclusion constraints on
+    range fields.
+    """
+    def test_index_method(self):
+        """Establish that indexed range fields use GiST indexes by
+        default, which Django does not create itself.
+        """
+        field = Reservation._meta.get_field('during')
+        self.assertEqual(field.db_index_method, 'gist')
+        self.assertFalse(field.db_index)
+        self.assertTrue(index_exists(connection,
+                                     'ranges_reservation_during_gist'))
+
+    def test_index_sql(self):
+        """Establish that the index SQL uses the requested method and
+        storage parameters.
+        """
+        field = models.IntegerRangeField(db_index_method='spgist',
+                                         db_index_options={'fillfactor': 70})
+        field.set_attributes_from_name('quantity')
+        field.model = Shipment
+        self.assertEqual(
+            field.create_index_sql(connection),
+            'CREATE INDEX "ranges_shipment_quantity_spgist" ON '
+            '"ranges_shipment" USING spgist (("quantity")) '
+            'WITH (fillfactor = 70)\n;',
+        )
+
+    def test_btree_index_method(self):
+        """Establish that btree indexes are left for Django to create."""
+        field = models.IntegerRangeField(db_index_method='btree')
+        self.assertTrue(field.db_index)
+        self.assertEqual(field.create_index_sql(connection), '')
+
+    @skipIf(django.VERSION < (1, 7), 'Django 1.7+ only')
+    def test_deconstruct(self):
+        """Establish that the index method and options are preserved
+        in migrations.
+        """
+        field = models.IntegerRangeField(db_index_method='spgist',
+                                         db_index_options={'fillfactor': 70})
+        kwargs = field.deconstruct()[3]
+        self.assertEqual(kwargs['db_index_method'], 'spgist')
+        self.assertEqual(kwargs['db_index_options'], {'fillfactor': 70})
+        self.assertNotIn('db_index', kwargs)
+
+    @skipIf(not south_installed, 'South is not installed.')
+    def test_south_introspection(self):
+        """Establish that South preserves the index method and options
+        in migrations.
+        """
+        from south.modelsinspector import introspector
+        kwargs = introspector(Reservation._meta.get_field('during'))[1]
+        self.assertEqual(kwargs['db_index_method'], repr('gist'))
+        self.assertNotIn('db_index_options', kwargs)
+
+    def test_exclusion_constraint_sql(self):
+        """Establish that exclusion constraints declared in `Meta` are
+        sent as the appropriate SQL.
+        """
+        self.assertEqual(exclusion_constraints_sql(Reservation, connection), [
+            'ALTER TABLE "ranges_reservation" ADD CONSTRAINT '
+            '"ranges_reservation_during_excl" EXCLUDE USING gist '
+            '("during" WITH &&)\n;',
+        ])
+        self.assertTrue(constraint_exists(connection,
+                                          'ranges_reservation_during_excl'))
+        self.assertEqual(exclusion_constraints_sql(Reservation, connection,
+                                                   only_if_not_exists=True),
+                         [])
+
+    @skipIf(django.VERSION < (1, 6), 'Requires atomic blocks.')
+    def test_exclusion_constraint(self):
+        """Establish that overlapping reservations are rejected by
+        the database.
+        """
+        Reservation.objects.create(room='Ballroom', during=DateTimeTZRange(
+            datetime(2014, 6, 1, 12, tzinfo=pytz.UTC),
+            datetime(2014, 6, 1, 15, tzinfo=pytz.UTC),
+        ))
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Reservation.objects.create(room='Ballroom', during=(
+                    datetime(2014, 6, 1, 14, tzinfo=pytz.UTC),
+                    datetime(2014, 6, 1, 16, tzinfo=pytz.UTC),
+                ))
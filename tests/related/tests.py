@@ -1,19 +1,31 @@
 from __future__ import absolute_import, unicode_literals
-from tests.related.models import Moogle, Letter
+from tests.related.models import Game, Moogle, Letter
+from django.http import HttpRequest, HttpResponse
 from django.test import TestCase
+from django_pg.middleware import QueryBudgetMiddleware
+from django_pg.utils import budget
+from django_pg.utils.budget import QueryBudget, QueryBudgetExceeded
+import mock
 
 
 class SelectRelatedTests(TestCase):
     """Establish that the `select_related` Meta option works as expected,
-    and that `get_queryset` correctly returns a queryset with the
-    appropriate `select_related` call made.
+    and that querysets returned by `get_queryset` apply it whenever they
+    fetch model instances.
     """
+    def setUp(self):
+        game = Game.objects.create(label='Final Fantasy', number=6)
+        moogle = Moogle.objects.create(game=game, label='Mog', sex='m')
+        Letter.objects.create(game=game, moogle=moogle, body='Kupo!',
+                              addressee='Terra', sender='Mog')
+
     def test_selrel_str(self):
         """Establish that when a single `select_related` is specified
         in `Meta` as a string, that we do the right thing.
         """
         qs = Moogle.objects.all()
-        self.assertIn('game', qs.query.select_related)        
+        list(qs)
+        self.assertIn('game', qs.query.select_related)
 
     def test_selrel_iterable(self):
         """Establish that when a `select_related` is specified as an
@@ -21,5 +33,166 @@ class SelectRelatedTests(TestCase):
         call is made.
         """
         qs = Letter.objects.all()
+        list(qs)
         for rel_field in ('game', 'moogle'):
             self.assertIn(rel_field, qs.query.select_related)
+
+    def test_selrel_instances(self):
+        """Establish that related objects are loaded along with the
+        model instances.
+        """
+        with QueryBudget(max_queries=1):
+            letter = Letter.objects.get(sender='Mog')
+            self.assertEqual(letter.moogle.label, 'Mog')
+            self.assertEqual(letter.game.number, 6)
+
+    def test_selrel_not_applied(self):
+        """Establish that `select_related` is not applied to queries
+        which do not fetch model instances.
+        """
+        with QueryBudget() as b:
+            Letter.objects.count()
+            Letter.objects.filter(sender='Mog').exists()
+            list(Letter.objects.values('sender'))
+        self.assertEqual(len(b.queries), 3)
+        for query in b.queries:
+            self.assertNotIn('JOIN', query['sql'])
+
+    def test_without_meta_related(self):
+        """Establish that `without_meta_related` prevents `select_related`
+        from being applied.
+        """
+        qs = Letter.objects.without_meta_related()
+        list(qs)
+        self.assertFalse(qs.query.select_related)
+
+    def test_selrel_explicit(self):
+        """Establish that an explicit `select_related` is combined with
+        the one in `Meta`.
+        """
+        qs = Letter.objects.select_related('moogle__game')
+        list(qs)
+        self.assertIn('game', qs.query.select_related)
+        self.assertIn('game', qs.query.select_related['moogle'])
+
+
+class QueryBudgetTests(TestCase):
+    """Establish that query budgets count queries, and report repeated
+    lazy loads of related objects.
+    """
+    def setUp(self):
+        for i in range(0, 3):
+            game = Game.objects.create(label='Final Fantasy', number=i + 1)
+            moogle = Moogle.objects.create(game=game, label='Mog', sex='m')
+            Letter.objects.create(game=game, moogle=moogle, body='Kupo!',
+                                  addressee='Cloud', sender='Mog')
+
+    def test_within_budget(self):
+        """Establish that a block within its budget is left alone, and
+        that its queries are recorded.
+        """
+        with QueryBudget(max_queries=1, max_repeats=1) as b:
+            list(Letter.objects.all())
+        self.assertEqual(len(b.queries), 1)
+        self.assertIsNone(b.queries[0]['attribute'])
+        self.assertFalse(budget.active())
+
+    def test_max_queries(self):
+        """Establish that making more queries than the budget allows
+        raises an exception.
+        """
+        with self.assertRaises(QueryBudgetExceeded) as context:
+            with QueryBudget(max_queries=1):
+                list(Game.objects.all())
+                list(Moogle.objects.all())
+        self.assertIn('2 queries were made (the budget is 1)',
+                      str(context.exception))
+
+    def test_forward_lazy_load(self):
+        """Establish that repeated lazy loads of a foreign key are
+        reported with the attribute and the call site.
+        """
+        with self.assertRaises(QueryBudgetExceeded) as context:
+            with QueryBudget(max_repeats=2):
+                for letter in Letter.objects.all():
+                    letter.moogle.game
+        message = str(context.exception)
+        self.assertIn('3 queries of the same shape', message)
+        self.assertIn('loading Moogle.game', message)
+        self.assertIn('in test_forward_lazy_load', message)
+
+    def test_reverse_lazy_load(self):
+        """Establish that repeated lazy loads of the "many" side of a
+        foreign key are reported with the attribute.
+        """
+        with self.assertRaises(QueryBudgetExceeded) as context:
+            with QueryBudget(max_repeats=2):
+                for game in Game.objects.all():
+                    list(game.moogle_set.all())
+        self.assertIn('loading Game.moogle_set', str(context.exception))
+
+    def test_log(self):
+        """Establish that a budget may log, rather than raise, when it
+        is exceeded.
+        """
+        with mock.patch.object(budget.logger, 'warning') as warning:
+            with QueryBudget(max_queries=0, action='log'):
+                list(Game.objects.all())
+        self.assertEqual(warning.call_count, 1)
+        self.assertIn('1 queries were made', warning.call_args[0][0])
+
+    def test_decorator(self):
+        """Establish that a query budget may be used as a decorator."""
+        @QueryBudget(max_queries=0)
+        def load_games():
+            return list(Game.objects.all())
+        self.assertRaises(QueryBudgetExceeded, load_games)
+
+    def test_middleware_stale_budget(self):
+        """Establish that the middleware discards a budget left open by
+        a request whose response was never processed.
+        """
+        middleware = QueryBudgetMiddleware()
+        stale = HttpRequest()
+        middleware.process_request(stale)
+        request = HttpRequest()
+        middleware.process_request(request)
+        self.assertEqual(budget._local.budgets, [request._query_budget])
+        list(Game.objects.all())
+        self.assertEqual(len(request._query_budget.queries), 1)
+        self.assertEqual(len(stale._query_budget.queries), 0)
+        middleware.process_response(request, HttpResponse())
+        self.assertFalse(budget.active())
+
+
+class ManagerProxyTests(TestCase):
+    """Establish that django_pg's QuerySet methods, called on a manager,
+    honor the manager's own queryset.
+    """
+    def setUp(self):
+        for number in (1, 2):
+            game = Game.objects.create(label='Final Fantasy', number=number)
+            Moogle.objects.create(game=game, label='Mog %d' % number,
+                                  sex='m')
+
+    def test_manager_name(self):
+        """Establish that the manager classes keep their names."""
+        from django_pg.models import Manager
+        self.assertEqual(Manager.__name__, 'Manager')
+
+    def test_related_manager(self):
+        """Establish that methods called on a related manager only
+        affect the related objects.
+        """
+        game = Game.objects.get(number=1)
+        self.assertEqual([i.label for i in game.moogle_set.stream()],
+                         ['Mog 1'])
+        self.assertEqual(game.moogle_set.to_columns('label')['label'],
+                         ['Mog 1'])
+        moogle = game.moogle_set.get()
+        moogle.label = 'Mog the Moogle'
+        game.moogle_set.bulk_update([moogle], ['label'])
+        self.assertEqual(
+            sorted(Moogle.objects.values_list('label', flat=True)),
+            ['Mog 2', 'Mog the Moogle'],
+        )
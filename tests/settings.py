@@ -18,7 +18,19 @@ DATABASES = {
         'PASSWORD': '',
         'HOST': 'localhost',
         'PORT': 5432,
-    }
+    },
+
+    # A read replica of the default database, which (during tests) is
+    # simply another connection to it.
+    'replica': {
+        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'NAME': 'django_pg',
+        'USER': '',
+        'PASSWORD': '',
+        'HOST': 'localhost',
+        'PORT': 5432,
+        'TEST_MIRROR': 'default',
+    },
 }
 
 
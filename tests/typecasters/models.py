@@ -0,0 +1 @@
+# Intentionally empty; we just need tests.py to run.
@@ -0,0 +1,86 @@
+from __future__ import absolute_import, unicode_literals
+from datetime import date, datetime
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from django_pg.utils import typecasters
+from django_pg.utils.typecasters import (cast_date, cast_timestamp,
+                                         cast_timestamptz,
+                                         register_typecasters)
+from psycopg2.tz import FixedOffsetTimezone
+import mock
+
+
+class TypecasterSuite(TestCase):
+    """Test suite for the fast date and timestamp typecasters."""
+
+    def setUp(self):
+        self.cursor = mock.Mock(tzinfo_factory=None)
+
+    def test_date(self):
+        """Establish that dates are parsed."""
+        self.assertEqual(cast_date('2014-06-18', self.cursor),
+                         date(2014, 6, 18))
+        self.assertEqual(cast_date(None, self.cursor), None)
+
+    def test_timestamp(self):
+        """Establish that naive timestamps are parsed, with or without
+        fractional seconds.
+        """
+        self.assertEqual(cast_timestamp('2014-06-18 12:30:15', self.cursor),
+                         datetime(2014, 6, 18, 12, 30, 15))
+        self.assertEqual(cast_timestamp('2014-06-18 12:30:15.25', self.cursor),
+                         datetime(2014, 6, 18, 12, 30, 15, 250000))
+
+    def test_timestamptz(self):
+        """Establish that timestamps with time zones are parsed, and
+        given the appropriate offset.
+        """
+        answer = cast_timestamptz('2014-06-18 12:30:15.123456+05:30',
+                                  self.cursor)
+        self.assertEqual(answer, datetime(2014, 6, 18, 12, 30, 15, 123456,
+            tzinfo=FixedOffsetTimezone(offset=330)))
+        self.assertEqual(answer.utcoffset().total_seconds(), 19800)
+        answer = cast_timestamptz('2014-06-18 12:30:15-05', self.cursor)
+        self.assertEqual(answer.utcoffset().total_seconds(), -18000)
+
+    def test_tzinfo_cached(self):
+        """Establish that the same tzinfo object is used for every value
+        with the same offset, and that the cursor's tzinfo factory is used
+        to create it.
+        """
+        self.cursor.tzinfo_factory = mock.Mock(return_value=timezone.utc)
+        with mock.patch.dict(typecasters._tzinfo_cache, clear=True):
+            first = cast_timestamptz('2014-06-18 12:30:15+00', self.cursor)
+            second = cast_timestamptz('2014-06-19 12:30:15+00', self.cursor)
+        self.assertIs(first.tzinfo, timezone.utc)
+        self.assertIs(second.tzinfo, timezone.utc)
+        self.cursor.tzinfo_factory.assert_called_once_with(0)
+
+    def test_fallback(self):
+        """Establish that values the fast typecasters do not understand
+        are sent to psycopg2's typecasters.
+        """
+        with mock.patch.object(typecasters, 'DATETIME') as dt:
+            cast_timestamptz('infinity', self.cursor)
+            dt.assert_called_once_with('infinity', self.cursor)
+        with mock.patch.object(typecasters, 'DATE') as d:
+            cast_date('0044-03-15 BC', self.cursor)
+            d.assert_called_once_with('0044-03-15 BC', self.cursor)
+
+    def test_registered(self):
+        """Establish that the typecasters are used by a cursor they
+        are registered on, and return the same values as psycopg2's.
+        """
+        cursor = connection.cursor()
+        sql = """SELECT '2014-06-18 12:30:15.5+00'::timestamptz,
+                        '2014-06-18 12:30:15'::timestamp,
+                        '2014-06-18'::date,
+                        ARRAY['2014-06-18'::date],
+                        'infinity'::timestamp"""
+        cursor.execute(sql)
+        expected = cursor.fetchone()
+        fast_cursor = connection.cursor()
+        register_typecasters(fast_cursor.cursor)
+        fast_cursor.execute(sql)
+        self.assertEqual(fast_cursor.fetchone(), expected)